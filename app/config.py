@@ -15,9 +15,25 @@ class Settings(BaseSettings):
 
     KICK_CHANNEL: str = ""  # Legacy; use the streams DB for multi-stream
     KICK_WEBSOCKET_URL: str = "wss://ws-us2.pusher.com/app/32cbd69e4b950bf97679"
+    KICK_API_URL: str = "https://kick.com/api/v2"  # the load-test harness points this at a local stand-in
 
     # --- Piper (default, local, no cost) ---
-    PIPER_MODEL: str = "models/es_ES-davefx-medium.onnx"
+    PIPER_MODEL: str = "models/es_ES-davefx-medium.onnx"  # default voice
+    PIPER_VOICES_DIR: Path = Path("models")  # a stream's piper_voice 'name' loads <dir>/name.onnx
+    PIPER_VOICE_MEMORY_MB: int = 0  # RAM budget for loaded voices per worker, LRU-evicted (0 = unlimited)
+    PIPER_PRELOAD_VOICES: int = 2  # voices used by the most streams, loaded at warm-up
+    # Micro-batching: sentences from concurrent jobs share one padded ONNX run (0 or 1 = off)
+    PIPER_BATCH_MAX_SIZE: int = 0
+    PIPER_BATCH_WAIT_MS: float = 5.0  # how long the first sentence waits for others to join
+    # ONNX Runtime session; with several uvicorn workers keep intra-op threads * workers <= cores
+    PIPER_ORT_INTRA_OP_THREADS: int = 0  # 0 = onnxruntime default (one per core)
+    PIPER_ORT_INTER_OP_THREADS: int = 0  # only used in parallel execution mode
+    PIPER_ORT_EXECUTION_MODE: str = "sequential"  # sequential | parallel
+    PIPER_ORT_GRAPH_OPTIMIZATION: str = "all"  # disable | basic | extended | all
+    PIPER_ORT_CPU_MEM_ARENA: bool = True
+    PIPER_ORT_MEM_PATTERN: bool = True
+    PIPER_ORT_OPTIMIZED_MODEL_DIR: str = ""  # cache the optimized graph here ("" = off)
+    PIPER_BENCHMARK_RUNS: int = 3  # real-time factor check after warm-up (0 = skip)
 
     # --- ElevenLabs (optional, per-stream) ---
     ELEVEN_LABS_API_KEY: str = ""
@@ -27,11 +43,61 @@ class Settings(BaseSettings):
     ELEVEN_LABS_SIMILARITY_BOOST: float = 0.82
     ELEVEN_LABS_STYLE: float = 0.58
     ELEVEN_LABS_SPEED: float = 0.88
+    # mp3_* is passed through as-is; pcm_<rate> is post-processed and stored as WAV
+    ELEVEN_LABS_OUTPUT_FORMAT: str = "mp3_44100_128"
+    # Shared per-API-key limits (cluster-wide when ENABLE_REDIS_CACHE is on)
+    ELEVEN_LABS_RATE_PER_SECOND: float = 2.0
+    ELEVEN_LABS_BURST: int = 4
+    ELEVEN_LABS_MAX_CONCURRENCY: int = 2
+    ELEVEN_LABS_QUEUE_TIMEOUT_SECONDS: float = 10.0  # wait this long for a slot before failing
+
+    # --- Backend circuit breaker (FallbackTTS) ---
+    TTS_BREAKER_FAILURE_THRESHOLD: int = 3  # consecutive failures before opening
+    TTS_BREAKER_SLOW_CALL_MS: float = 8000  # slower successful calls count as failures (0 = off)
+    TTS_BREAKER_RESET_SECONDS: float = 60  # open -> half-open probe delay
+    # Hedging: start Piper too if the primary hasn't answered within this budget (0 = off)
+    TTS_HEDGE_AFTER_MS: float = 0
+    TTS_HEDGE_KEEP_LATE_PRIMARY: bool = True  # cache primary audio that lost the race
+    TTS_HEDGE_WORKERS: int = 8  # threads for primary calls, and as many for the Piper hedges
+
+    # --- Synthetic backend (benchmarks / capacity planning, no model or API needed) ---
+    SYNTHETIC_TTS_LATENCY_MS: float = 300  # median simulated synthesis time
+    SYNTHETIC_TTS_LATENCY_SIGMA: float = 0.5  # log-normal spread around the median (0 = fixed)
+    SYNTHETIC_TTS_MS_PER_CHAR: float = 0  # extra latency per character of text
+    SYNTHETIC_TTS_FAILURE_RATE: float = 0.0  # share of calls that raise
+    SYNTHETIC_TTS_MAX_CONCURRENCY: int = 0  # simultaneous syntheses per process (0 = unlimited)
+    SYNTHETIC_TTS_SEED: int = 1
+
+    # --- Post-processing of synthesized PCM before caching (Piper, ElevenLabs pcm_*) ---
+    AUDIO_POSTPROCESS: bool = True
+    AUDIO_SILENCE_DB: float = -45.0  # 10 ms frames quieter than this (dBFS) count as silence
+    AUDIO_SILENCE_PAD_MS: float = 60  # silence kept before the first and after the last word
+    AUDIO_MAX_PAUSE_MS: float = 0  # shorten pauses inside a clip to this (0 = keep them)
+    AUDIO_TARGET_LUFS: float = -18.0  # loudness target (0 = no normalization)
 
     AUDIO_OUTPUT_DIR: Path = Path("static/audio")
     SOUNDS_DIR: Path = Path("static/sounds")
     STICKERS_DIR: Path = Path("static/stickers")
     CACHE_DIR: Path = Path("static/cache")
+    TTS_CACHE_MAX_MB: int = 0  # evict least recently used cached clips above this size (0 = unlimited)
+    TTS_CACHE_SCAN_SECONDS: float = 300.0
+
+    # Logging: file rotates by size, or by time when LOG_ROTATE_WHEN is set (e.g. "midnight")
+    LOG_DIR: Path = Path("logs")
+    LOG_LEVEL: str = "INFO"  # console
+    LOG_FILE_LEVEL: str = "DEBUG"
+    LOG_MAX_MB: float = 10
+    LOG_BACKUP_COUNT: int = 5
+    LOG_ROTATE_WHEN: str = ""
+    LOG_CHAT_SAMPLE_RATE: float = 1.0  # share of chat lines logged
+    LOG_CHAT_MAX_PER_SECOND: float = 20  # cap on chat lines per second (0 = no cap)
+    LOG_TTS_MAX_PER_SECOND: float = 10  # cap on per-call TTS lines per second (0 = no cap)
+
+    # Raw Pusher frame recording per stream, for bench/replay.py
+    RECORD_FRAMES: bool = False
+    RECORD_DIR: Path = Path("data/recordings")
+    RECORD_ROTATE_MB: float = 50  # uncompressed frame bytes per file
+    RECORD_KEEP_FILES: int = 20  # newest files kept per stream (0 = keep all)
     AUDIO_FORMAT: str = "wav"
 
     # SQLite streams DB: use data/streams.db locally; in Docker set to /app/data/streams.db
@@ -46,11 +112,29 @@ class Settings(BaseSettings):
     MIN_MESSAGE_LENGTH: int = 2
     MAX_MESSAGE_LENGTH: int = 200
     TTS_MAX_CHARS: int = 0
+    # Canonicalization before synthesis and cache keying, in this order ("" = off)
+    TTS_NORMALIZE: str = "emotes,urls,unicode,emoji,numbers,repeats,case,whitespace"
+    TTS_NORMALIZE_MAX_REPEATS: int = 3  # "jajajajaja" -> "jajaja", "nooooo" -> "nooo"
+    TTS_NORMALIZE_MAX_DIGITS: int = 9  # longer digit runs are cut (0 = keep)
+    TTS_NUMBERS_LANG: str = "es"  # spell whole numbers out in this language ("" = keep digits; only "es")
+    TTS_URL_TEXT: str = "link"  # spoken in place of a URL ("" = drop it)
     TTS_PREFIX: str = "{username} dice: "
     TTS_SKIP_DUPLICATE_SECONDS: int = 60
+    TTS_DUPLICATE_WINDOW_SIZE: int = 256  # max recent texts remembered for duplicate checks
     TTS_COMMAND: str = "!s"
     TTS_FOLLOWERS_ONLY: bool = False
     TTS_ALLOWED_BADGES: str = "follower,subscriber,broadcaster,moderator,mod,og,vip"
+    # Per-stream TTS queue: lower number = served first; unlisted badges get 9
+    TTS_BADGE_PRIORITY: str = "broadcaster:0,moderator:1,mod:1,vip:2,og:3,founder:3,subscriber:3"
+    TTS_QUEUE_MAX_AGE_SECONDS: float = 30.0  # drop jobs that waited longer (0 = never)
+    TTS_QUEUE_MAX_SECONDS: float = 60.0  # cap on queued + unplayed audio (0 = no cap)
+    TTS_CHARS_PER_SECOND: float = 14.0  # used to estimate clip length before synthesis
+    # Pre-synthesize a stream's most frequent !s phrases while TTS is idle (0 = off)
+    TTS_PRERENDER_TOP_K: int = 20
+    TTS_PRERENDER_MIN_COUNT: int = 3  # times a phrase must be requested before it is pre-rendered
+    TTS_PRERENDER_IDLE_SECONDS: float = 5.0  # idle time before pre-rendering starts
+    TTS_PRERENDER_HALF_LIFE_SECONDS: float = 1800  # phrase counts halve this often (0 = never)
+    TTS_PRERENDER_PAID: bool = False  # also pre-render on ElevenLabs streams (spends credits)
     COOLDOWN_SECONDS: int = 1
     IGNORE_COMMANDS: bool = True
     ENABLE_TTS: bool = True
@@ -61,6 +145,9 @@ class Settings(BaseSettings):
     WIDGET_SHOW_MESSAGES: bool = True
     WIDGET_MESSAGE_DURATION: int = 5000
     WIDGET_MAX_MESSAGES: int = 3
+    # Widgets opened with ?inline_audio=true get TTS clips up to this size as binary
+    # websocket frames instead of a URL to fetch (0 = always URLs)
+    WS_INLINE_AUDIO_MAX_KB: int = 256
 
 
 settings = Settings()
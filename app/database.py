@@ -1,63 +1,176 @@
+"""
+SQLite streams DB.
+
+A single long-lived aiosqlite connection is opened by init_db() (from the app
+lifespan) and closed by close_db() on shutdown, so requests don't pay for a
+new thread + file open each time. The connection runs in WAL mode, and the
+queries below are fixed strings so sqlite3's per-connection statement cache
+reuses their prepared statements.
+
+Schema changes go through MIGRATIONS; applied versions are recorded in
+schema_migrations so each one runs exactly once per database file. Every
+gunicorn worker runs them on startup, so they run inside one BEGIN IMMEDIATE
+transaction: the first worker applies them, the rest wait on the write lock
+and then find nothing pending. Steps are idempotent anyway (columns are
+checked before ALTER, versions recorded with INSERT OR IGNORE).
+"""
+import asyncio
 import aiosqlite
 from pathlib import Path
 from typing import Optional
 
 from app.config import settings
+from app.logger import logger
+
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",  # safe with WAL; fsync only at checkpoints
+    "PRAGMA busy_timeout=5000",  # other gunicorn workers may hold the write lock
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-2000",  # ~2 MB page cache
+)
+
+_STREAM_COLUMNS = "stream_id, channel, tts_backend, elevenlabs_voice_id, piper_voice, tts_enabled, created_at"
+_SELECT_ALL_STREAMS = f"SELECT {_STREAM_COLUMNS} FROM streams ORDER BY created_at"
+_SELECT_STREAM = f"SELECT {_STREAM_COLUMNS} FROM streams WHERE stream_id = ?"
+_INSERT_STREAM = (
+    "INSERT INTO streams (stream_id, channel, tts_backend, elevenlabs_voice_id, piper_voice, tts_enabled) "
+    "VALUES (?, ?, ?, ?, ?, 1)"
+)
+_DELETE_STREAM = "DELETE FROM streams WHERE stream_id = ?"
+
+_conn: aiosqlite.Connection | None = None
+# Serializes write + commit pairs on the shared connection
+_write_lock = asyncio.Lock()
 
 
 def _db_path() -> Path:
     return Path(settings.DATABASE_PATH)
 
 
-async def init_db():
-    path = _db_path()
-    path.parent.mkdir(parents=True, exist_ok=True)
-    async with aiosqlite.connect(path) as db:
+def _db() -> aiosqlite.Connection:
+    if _conn is None:
+        raise RuntimeError("Database is not open; call init_db() first")
+    return _conn
+
+
+# --- migrations ---
+
+async def _column_names(db: aiosqlite.Connection, table: str) -> set[str]:
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1] for row in await cursor.fetchall()}
+
+
+async def _migrate_create_streams(db: aiosqlite.Connection):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS streams (
+            stream_id           TEXT PRIMARY KEY,
+            channel             TEXT NOT NULL,
+            tts_backend         TEXT NOT NULL DEFAULT 'elevenlabs',
+            elevenlabs_voice_id TEXT,
+            created_at          TEXT DEFAULT (datetime('now'))
+        )
+    """)
+
+
+async def _migrate_voice_columns(db: aiosqlite.Connection):
+    # Databases created before versioning may already have some of these
+    existing = await _column_names(db, "streams")
+    for col, definition in [
+        ("tts_backend", "TEXT NOT NULL DEFAULT 'elevenlabs'"),
+        ("elevenlabs_voice_id", "TEXT"),
+        ("tts_enabled", "INTEGER NOT NULL DEFAULT 1"),
+    ]:
+        if col not in existing:
+            await db.execute(f"ALTER TABLE streams ADD COLUMN {col} {definition}")
+
+
+async def _migrate_piper_voice(db: aiosqlite.Connection):
+    if "piper_voice" not in await _column_names(db, "streams"):
+        await db.execute("ALTER TABLE streams ADD COLUMN piper_voice TEXT")
+
+
+# (version, description, migration) — append only, never renumber
+MIGRATIONS = [
+    (1, "create streams table", _migrate_create_streams),
+    (2, "add voice and tts_enabled columns", _migrate_voice_columns),
+    (3, "add piper_voice column", _migrate_piper_voice),
+]
+
+
+async def _run_migrations(db: aiosqlite.Connection):
+    # Take the write lock before reading what's applied, so workers starting
+    # together can't both decide the same version is pending
+    await db.execute("BEGIN IMMEDIATE")
+    try:
         await db.execute("""
-            CREATE TABLE IF NOT EXISTS streams (
-                stream_id           TEXT PRIMARY KEY,
-                channel             TEXT NOT NULL,
-                tts_backend         TEXT NOT NULL DEFAULT 'elevenlabs',
-                elevenlabs_voice_id TEXT,
-                created_at          TEXT DEFAULT (datetime('now'))
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version     INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at  TEXT DEFAULT (datetime('now'))
             )
         """)
+        async with db.execute("SELECT version FROM schema_migrations") as cursor:
+            applied = {row[0] for row in await cursor.fetchall()}
+
+        done = []
+        for version, description, migrate in MIGRATIONS:
+            if version in applied:
+                continue
+            await migrate(db)
+            await db.execute(
+                "INSERT OR IGNORE INTO schema_migrations (version, description) VALUES (?, ?)",
+                (version, description),
+            )
+            done.append((version, description))
         await db.commit()
+    except BaseException:
+        await db.rollback()
+        raise
+    for version, description in done:
+        logger.info(f"Applied DB migration {version}: {description}")
+
+
+async def init_db():
+    """Open the shared connection, apply pragmas and run pending migrations."""
+    global _conn
+    if _conn is not None:
+        return
+    path = _db_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = await aiosqlite.connect(path, cached_statements=64)
+    conn.row_factory = aiosqlite.Row
+    for pragma in _PRAGMAS:
+        await conn.execute(pragma)
+    async with _write_lock:
+        await _run_migrations(conn)
+    _conn = conn
 
-        # Migrate existing DBs that don't have the voice columns yet
-        for col, definition in [
-            ("tts_backend", "TEXT NOT NULL DEFAULT 'elevenlabs'"),
-            ("elevenlabs_voice_id", "TEXT"),
-            ("tts_enabled", "INTEGER NOT NULL DEFAULT 1"),
-        ]:
-            try:
-                await db.execute(f"ALTER TABLE streams ADD COLUMN {col} {definition}")
-                await db.commit()
-            except Exception:
-                pass  # Column already exists
 
+def is_open() -> bool:
+    return _conn is not None
+
+
+async def close_db():
+    global _conn
+    if _conn is None:
+        return
+    conn, _conn = _conn, None
+    await conn.close()
+
+
+# --- queries ---
 
 async def get_all_streams() -> list[dict]:
-    async with aiosqlite.connect(_db_path()) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT stream_id, channel, tts_backend, elevenlabs_voice_id, tts_enabled, created_at "
-            "FROM streams ORDER BY created_at"
-        ) as cursor:
-            rows = await cursor.fetchall()
-            return [dict(row) for row in rows]
+    async with _db().execute(_SELECT_ALL_STREAMS) as cursor:
+        rows = await cursor.fetchall()
+        return [dict(row) for row in rows]
 
 
 async def get_stream(stream_id: str) -> Optional[dict]:
-    async with aiosqlite.connect(_db_path()) as db:
-        db.row_factory = aiosqlite.Row
-        async with db.execute(
-            "SELECT stream_id, channel, tts_backend, elevenlabs_voice_id, tts_enabled, created_at "
-            "FROM streams WHERE stream_id = ?",
-            (stream_id,),
-        ) as cursor:
-            row = await cursor.fetchone()
-            return dict(row) if row else None
+    async with _db().execute(_SELECT_STREAM, (stream_id,)) as cursor:
+        row = await cursor.fetchone()
+        return dict(row) if row else None
 
 
 async def add_stream(
@@ -65,13 +178,11 @@ async def add_stream(
     channel: str,
     tts_backend: str = "elevenlabs",
     elevenlabs_voice_id: str | None = None,
+    piper_voice: str | None = None,
 ):
-    async with aiosqlite.connect(_db_path()) as db:
-        await db.execute(
-            """INSERT INTO streams (stream_id, channel, tts_backend, elevenlabs_voice_id, tts_enabled)
-               VALUES (?, ?, ?, ?, 1)""",
-            (stream_id, channel, tts_backend, elevenlabs_voice_id),
-        )
+    db = _db()
+    async with _write_lock:
+        await db.execute(_INSERT_STREAM, (stream_id, channel, tts_backend, elevenlabs_voice_id, piper_voice))
         await db.commit()
 
 
@@ -80,6 +191,7 @@ async def update_stream(
     channel: str | None = None,
     tts_backend: str | None = None,
     elevenlabs_voice_id: str | None = None,
+    piper_voice: str | None = None,
     tts_enabled: bool | None = None,
 ) -> bool:
     """Update any combination of fields on a stream row."""
@@ -94,6 +206,10 @@ async def update_stream(
     if elevenlabs_voice_id is not None:
         fields.append("elevenlabs_voice_id = ?")
         values.append(elevenlabs_voice_id)
+    if piper_voice is not None:
+        # "" clears the override (back to PIPER_MODEL)
+        fields.append("piper_voice = ?")
+        values.append(piper_voice or None)
     if tts_enabled is not None:
         fields.append("tts_enabled = ?")
         values.append(1 if tts_enabled else 0)
@@ -102,7 +218,8 @@ async def update_stream(
         return True
 
     values.append(stream_id)
-    async with aiosqlite.connect(_db_path()) as db:
+    db = _db()
+    async with _write_lock:
         cursor = await db.execute(
             f"UPDATE streams SET {', '.join(fields)} WHERE stream_id = ?",
             values,
@@ -112,9 +229,8 @@ async def update_stream(
 
 
 async def delete_stream(stream_id: str) -> bool:
-    async with aiosqlite.connect(_db_path()) as db:
-        cursor = await db.execute(
-            "DELETE FROM streams WHERE stream_id = ?", (stream_id,)
-        )
+    db = _db()
+    async with _write_lock:
+        cursor = await db.execute(_DELETE_STREAM, (stream_id,))
         await db.commit()
         return cursor.rowcount > 0
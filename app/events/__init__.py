@@ -1,16 +1,19 @@
+import time
+
 from app.events.chat import ChatEventHandler
 from app.events.subscription import SubscriptionEventHandler
 from app.events.follow import FollowEventHandler
+from app.metrics import EVENT_HANDLING_SECONDS
 
 
-def make_handlers(tts, tts_enabled: bool) -> dict:
+def make_handlers(scheduler, tts_enabled: bool) -> dict:
     """
     Build a fresh set of event handlers for one stream.
-    Each KickListener calls this so ChatEventHandler gets its own TTS instance
-    and per-stream TTS enabled flag.
+    Each KickListener calls this so ChatEventHandler gets the stream's own TTS
+    scheduler and per-stream TTS enabled flag.
     """
     return {
-        'App\\Events\\ChatMessageEvent': ChatEventHandler(tts=tts, tts_enabled=tts_enabled),
+        'App\\Events\\ChatMessageEvent': ChatEventHandler(scheduler=scheduler, tts_enabled=tts_enabled),
         'App\\Events\\ChannelSubscriptionEvent': SubscriptionEventHandler(),
         'App\\Events\\FollowEvent': FollowEventHandler(),
     }
@@ -20,4 +23,9 @@ async def handle_event(event_type: str, event_data: dict, stream_id: str, handle
     """Route an event to the appropriate handler."""
     handler = handlers.get(event_type)
     if handler:
-        await handler.handle(event_data, stream_id)
+        started = time.perf_counter()
+        try:
+            await handler.handle(event_data, stream_id)
+        finally:
+            event_name = event_type.rsplit("\\", 1)[-1]
+            EVENT_HANDLING_SECONDS.labels(stream_id, event_name).observe(time.perf_counter() - started)
@@ -1,26 +1,41 @@
 import re
-import time
 from typing import Dict, Any
 from pathlib import Path
 
-# Kick emotes: [emote:37226:KEKW] — skip TTS when message contains them
-EMOTE_PATTERN = re.compile(r"\[emote:\d+:[^\]]+\]", re.IGNORECASE)
 STICKER_NAME_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$", re.IGNORECASE)
 
 
 from app.config import settings
 from app.routes.websocket import broadcast_to_stream
-from app.logger import logger
+from app.logger import chat_logger, logger
 from app.events.base import EventHandler
+from app.services import text_normalize
+from app.services.chat_state import CooldownTracker, RecentTextWindow
+from app.services.text_normalize import EMOTE_PATTERN
+from app.events.commands import BadgePolicy, CommandContext, CommandRouter, plugin_commands
+from app.services.tts_scheduler import DEFAULT_PRIORITY
 
 
 class ChatEventHandler(EventHandler):
-    def __init__(self, tts, tts_enabled: bool):
-        self.tts = tts
+    def __init__(self, scheduler, tts_enabled: bool):
+        self.scheduler = scheduler
         self.tts_enabled = tts_enabled
-        self.last_message_time = {}
-        self._last_spoken_text: str | None = None
-        self._last_spoken_time: float = 0
+        self.badges = BadgePolicy.from_settings()
+        self.router = self._build_router()
+        self._cooldowns = CooldownTracker(settings.COOLDOWN_SECONDS)
+        self._recent_texts = RecentTextWindow(
+            settings.TTS_SKIP_DUPLICATE_SECONDS, settings.TTS_DUPLICATE_WINDOW_SIZE
+        )
+
+    def _build_router(self) -> CommandRouter:
+        router = CommandRouter(fallback=self._handle_sound_command if settings.ENABLE_SOUNDS else None)
+        if settings.ENABLE_STICKERS:
+            router.register("sticker", self._handle_sticker_command)
+        if settings.ENABLE_TTS:
+            router.register(settings.TTS_COMMAND, self._handle_tts_command)
+        for name, handler in plugin_commands().items():
+            router.register(name, handler)
+        return router
 
     def should_process(self, event_data: Dict[str, Any]) -> bool:
         sender = event_data.get("sender", {})
@@ -31,34 +46,6 @@ class ChatEventHandler(EventHandler):
 
         return True
 
-    def _check_cooldown(self, username: str) -> bool:
-        now = time.time()
-        last_time = self.last_message_time.get(username, 0)
-
-        if now - last_time < settings.COOLDOWN_SECONDS:
-            return False
-
-        self.last_message_time[username] = now
-        return True
-
-    def _is_follower(self, event_data: Dict[str, Any]) -> bool:
-        """
-        Returns True if the sender has a qualifying badge.
-        Kick includes sender.identity.badges in every chat message — no extra API call needed.
-        The allowed badge types are controlled by TTS_ALLOWED_BADGES in config / .env.
-        """
-        allowed = {b.strip().lower() for b in settings.TTS_ALLOWED_BADGES.split(",") if b.strip()}
-
-        sender = event_data.get("sender", {})
-        identity = sender.get("identity", {})
-        badges = identity.get("badges", [])
-
-        for badge in badges:
-            if badge.get("type", "").lower() in allowed:
-                return True
-
-        return False
-
     async def handle(self, event_data: Dict[str, Any], stream_id: str):
         if not self.should_process(event_data):
             return
@@ -67,51 +54,51 @@ class ChatEventHandler(EventHandler):
         sender = event_data.get("sender", {})
         username = sender.get("username", "unknown")
 
-        logger.info(f"{username}: {content}")
+        chat_logger.info("%s: %s", username, content)
 
-        if not self._check_cooldown(username):
+        if not self._cooldowns.allow(username):
             return
 
-        # !sticker must be checked before the generic !s TTS command
-        if settings.ENABLE_STICKERS and content.strip().lower().startswith("!sticker"):
-            handled = await self._handle_sticker_command(content, username, stream_id)
-            if handled:
-                return
-
-        # TTS command: !s <text>
-        tts_prefix = settings.TTS_COMMAND + " "
-        if settings.ENABLE_TTS and self.tts_enabled and content.startswith(tts_prefix):
-            if self.tts is None:
-                logger.debug("TTS disabled or backend not available for this stream")
-                return
-            tts_text = content[len(tts_prefix):].strip()
-
-            if not tts_text:
-                return
-
-            if settings.TTS_FOLLOWERS_ONLY and not self._is_follower(event_data):
-                logger.debug(f"TTS denied for '{username}': not a follower")
-                return
+        route = self.router.resolve(content.strip())
+        if route is None:
+            return
+        handler, name, args = route
+        await handler(CommandContext(
+            name=name,
+            args=args,
+            content=content,
+            username=username,
+            stream_id=stream_id,
+            event_data=event_data,
+        ))
+
+    async def _handle_tts_command(self, ctx: CommandContext):
+        """!s <text>"""
+        if not self.tts_enabled or self.scheduler.tts is None:
+            logger.debug("TTS disabled or backend not available for this stream")
+            return
+        if not ctx.args:
+            return
 
-            await self._handle_tts_message(tts_text, username, stream_id)
+        badges = BadgePolicy.badge_types(ctx.event_data)
+        if not self.badges.permits_tts(badges):
+            logger.debug("TTS denied for '%s': not a follower", ctx.username)
             return
 
-        # Sound commands (!anything other than the TTS command)
-        if content.startswith("!") and settings.ENABLE_SOUNDS:
-            await self._handle_sound_command(content, username, stream_id)
+        await self._handle_tts_message(ctx.args, ctx.username, self.badges.priority_for(badges))
 
-    async def _handle_sound_command(self, content: str, username: str, stream_id: str):
-        sound_name = content[1:].split()[0]
+    async def _handle_sound_command(self, ctx: CommandContext):
+        sound_name = ctx.name
         sound_path = settings.SOUNDS_DIR / f"{sound_name}.mp3"
 
         if sound_path.exists():
-            logger.info(f"Playing sound: {sound_name} (requested by {username})")
+            logger.info("Playing sound: %s (requested by %s)", sound_name, ctx.username)
 
-            await broadcast_to_stream(stream_id, {
+            await broadcast_to_stream(ctx.stream_id, {
                 'type': 'sound_effect',
                 'sound_name': sound_name,
                 'audio_url': f"/static/sounds/{sound_name}.mp3",
-                'username': username,
+                'username': ctx.username,
             })
         else:
             logger.warning(f"Sound not found: {sound_name}")
@@ -143,27 +130,28 @@ class ChatEventHandler(EventHandler):
 
         return gif_path, sound_path
 
-    async def _handle_sticker_command(self, content: str, username: str, stream_id: str) -> bool:
-        parts = content.strip().split()
-        if len(parts) < 2:
+    async def _handle_sticker_command(self, ctx: CommandContext):
+        """!sticker <name>"""
+        username = ctx.username
+        if not ctx.args:
             logger.warning(f"Sticker command missing name (requested by {username})")
-            return True
+            return
 
-        sticker_name = parts[1].strip()
+        sticker_name = ctx.args.split()[0]
         if not STICKER_NAME_PATTERN.match(sticker_name):
             logger.warning(f"Invalid sticker name: {sticker_name!r} (requested by {username})")
-            return True
+            return
 
         gif_path, sound_path = self._find_sticker_assets(sticker_name)
         if gif_path is None:
             logger.warning(f"Sticker not found: {sticker_name}")
-            return True
+            return
 
         audio_url = None
         if sound_path is not None:
             audio_url = f"/static/stickers/{sticker_name}/{sound_path.name}"
 
-        await broadcast_to_stream(stream_id, {
+        await broadcast_to_stream(ctx.stream_id, {
             "type": "sticker",
             "sticker_name": sticker_name,
             "gif_url": f"/static/stickers/{sticker_name}/{gif_path.name}",
@@ -171,7 +159,6 @@ class ChatEventHandler(EventHandler):
             "duration_ms": settings.STICKER_DURATION_MS,
             "username": username,
         })
-        return True
 
     def _build_text_to_speak(self, content: str, username: str) -> str:
         prefix = (settings.TTS_PREFIX or "").replace("{username}", username)
@@ -180,47 +167,38 @@ class ChatEventHandler(EventHandler):
             text = text[: settings.TTS_MAX_CHARS]
         return text
 
-    async def _handle_tts_message(self, content: str, username: str, stream_id: str):
-        if len(content) < settings.MIN_MESSAGE_LENGTH:
-            logger.debug(f"Message too short ({len(content)} chars), skipping")
+    async def _handle_tts_message(self, content: str, username: str, priority: int = DEFAULT_PRIORITY):
+        if not text_normalize.enabled("emotes") and EMOTE_PATTERN.search(content):
+            logger.debug("Message contains emote, skipping TTS: %.50s...", content)
             return
 
-        if EMOTE_PATTERN.search(content):
-            logger.debug(f"Message contains emote, skipping TTS: {content[:50]}...")
+        raw_content = content
+        content = text_normalize.for_backend(content, self.scheduler.tts)
+        if len(content) < settings.MIN_MESSAGE_LENGTH:
+            logger.debug("Message too short (%d chars), skipping", len(content))
             return
 
         if len(content) > settings.MAX_MESSAGE_LENGTH:
             content = content[: settings.MAX_MESSAGE_LENGTH]
 
         normalized = content.strip().lower()
-        if settings.TTS_SKIP_DUPLICATE_SECONDS > 0 and normalized:
-            now = time.time()
-            if (
-                self._last_spoken_text == normalized
-                and (now - self._last_spoken_time) < settings.TTS_SKIP_DUPLICATE_SECONDS
-            ):
-                logger.debug(f"Duplicate text in last {settings.TTS_SKIP_DUPLICATE_SECONDS}s, skipping TTS")
-                return
-
         text_to_speak = self._build_text_to_speak(content, username)
-        try:
-            logger.info(f"Generating TTS for {username}: {content[:50]}...")
-            audio_url, cached, gen_time = self.tts.generate(text_to_speak, username)
-
-            if settings.TTS_SKIP_DUPLICATE_SECONDS > 0 and normalized:
-                self._last_spoken_text = normalized
-                self._last_spoken_time = time.time()
-
-            await broadcast_to_stream(stream_id, {
-                'type': 'tts_message',
-                'username': username,
-                'text': content,
-                'audio_url': audio_url,
-                'cached': cached,
-                'generation_time_ms': gen_time,
-            })
+        if normalized:
+            # Counted before duplicate suppression: repeats are exactly the demand to pre-render for.
+            # The phrase is kept without the per-user prefix, so its pre-render serves every sender
+            self.scheduler.phrases.add(normalized, content)
+        if normalized and self._recent_texts.contains(normalized):
+            logger.debug("Duplicate text in last %ss, skipping TTS", settings.TTS_SKIP_DUPLICATE_SECONDS)
+            return
 
-            logger.info(f"TTS generated: {audio_url} ({gen_time:.0f}ms, cached={cached})")
+        # The widget shows what was typed, minus emote tokens
+        shown = " ".join(EMOTE_PATTERN.sub(" ", raw_content).split())[: settings.MAX_MESSAGE_LENGTH]
+        raw_text = self._build_text_to_speak(raw_content, username)
+        if not self.scheduler.submit(
+            text_to_speak, shown, username, priority, raw_text=raw_text, phrase=content
+        ):
+            return
 
-        except Exception as e:
-            logger.error(f"TTS generation error: {e}", exc_info=True)
+        # Remember at enqueue time so copies arriving while this one waits are skipped too
+        if normalized:
+            self._recent_texts.add(normalized)
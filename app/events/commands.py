@@ -0,0 +1,97 @@
+"""
+Chat command routing.
+
+Each ChatEventHandler compiles a CommandRouter once, from settings, when its
+stream starts: a dict from command name to handler. Per message the work is a
+single split of the text plus one dict lookup. Names that aren't registered go
+to the fallback handler (sound effects), if any.
+
+Extra commands can be plugged in with register_command(); they are picked up
+by every router built afterwards (i.e. on the next stream start).
+"""
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from app.config import settings
+from app.logger import logger
+from app.services.tts_scheduler import DEFAULT_PRIORITY, parse_badge_priority
+
+
+@dataclass(frozen=True)
+class CommandContext:
+    name: str  # command token as typed, without the '!' (case preserved)
+    args: str  # everything after the command token, stripped
+    content: str
+    username: str
+    stream_id: str
+    event_data: Dict[str, Any]
+
+
+CommandHandler = Callable[[CommandContext], Awaitable[None]]
+
+_plugin_commands: dict[str, CommandHandler] = {}
+
+
+def register_command(name: str, handler: CommandHandler):
+    """Add a chat command (e.g. 'dado' for !dado) to routers built from now on."""
+    _plugin_commands[name.lstrip("!").lower()] = handler
+
+
+def plugin_commands() -> dict[str, CommandHandler]:
+    return dict(_plugin_commands)
+
+
+class CommandRouter:
+    def __init__(self, fallback: CommandHandler | None = None):
+        self._routes: dict[str, CommandHandler] = {}
+        self._fallback = fallback
+
+    def register(self, name: str, handler: CommandHandler):
+        key = name.lstrip("!").lower()
+        if key in self._routes:
+            logger.warning(f"Chat command !{key} registered twice; keeping the last handler")
+        self._routes[key] = handler
+
+    @property
+    def commands(self) -> list[str]:
+        return sorted(self._routes)
+
+    def resolve(self, content: str) -> tuple[CommandHandler, str, str] | None:
+        """Return (handler, name, args) for a '!command ...' message, else None."""
+        if not content.startswith("!"):
+            return None
+        parts = content[1:].split(None, 1)
+        if not parts:
+            return None
+        name = parts[0]
+        args = parts[1].strip() if len(parts) > 1 else ""
+        handler = self._routes.get(name.lower(), self._fallback)
+        if handler is None:
+            return None
+        return handler, name, args
+
+
+class BadgePolicy:
+    """Badge rules for one stream, parsed once from settings."""
+
+    def __init__(self, allowed: frozenset[str], priority: dict[str, int], followers_only: bool):
+        self.allowed = allowed
+        self.priority = priority
+        self.followers_only = followers_only
+
+    @classmethod
+    def from_settings(cls) -> "BadgePolicy":
+        allowed = frozenset(b.strip().lower() for b in settings.TTS_ALLOWED_BADGES.split(",") if b.strip())
+        return cls(allowed, parse_badge_priority(settings.TTS_BADGE_PRIORITY), settings.TTS_FOLLOWERS_ONLY)
+
+    @staticmethod
+    def badge_types(event_data: Dict[str, Any]) -> frozenset[str]:
+        badges = event_data.get("sender", {}).get("identity", {}).get("badges", [])
+        return frozenset(badge.get("type", "").lower() for badge in badges)
+
+    def permits_tts(self, badges: frozenset[str]) -> bool:
+        return not self.followers_only or not self.allowed.isdisjoint(badges)
+
+    def priority_for(self, badges: frozenset[str]) -> int:
+        ranks = [self.priority[b] for b in badges if b in self.priority]
+        return min(ranks, default=DEFAULT_PRIORITY)
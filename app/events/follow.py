@@ -23,7 +23,7 @@ class FollowEventHandler(EventHandler):
 
         followed_name = event_data.get("followed", {}).get("username", "")
 
-        logger.info(f"New follower: {username} → {followed_name}")
+        logger.info("New follower: %s → %s", username, followed_name)
 
         await broadcast_to_stream(stream_id, {
             'type': 'follow',
@@ -1,9 +1,11 @@
 from typing import Dict, Any
+import time
 import aiohttp
 
 from app.config import settings
 from app.routes.websocket import broadcast_to_stream
 from app.logger import logger
+from app.metrics import KICK_REST_SECONDS
 from app.events.base import EventHandler
 
 
@@ -21,14 +23,14 @@ class SubscriptionEventHandler(EventHandler):
             logger.warning("Subscription event with no user_ids")
             return
 
-        logger.info(f"New subscription(s): {len(user_ids)} user(s)")
+        logger.info("New subscription(s): %d user(s)", len(user_ids))
 
         for user_id in user_ids:
             try:
                 username = await self._get_username(user_id)
 
                 if username:
-                    logger.info(f"New subscriber: {username} (ID: {user_id})")
+                    logger.info("New subscriber: %s (ID: %s)", username, user_id)
 
                     await broadcast_to_stream(stream_id, {
                         'type': 'subscription',
@@ -49,9 +51,11 @@ class SubscriptionEventHandler(EventHandler):
             }
 
             async with aiohttp.ClientSession(headers=headers) as session:
-                url = f"https://kick.com/api/v2/users/{user_id}"
+                url = f"{settings.KICK_API_URL}/users/{user_id}"
 
+                started = time.perf_counter()
                 async with session.get(url) as response:
+                    KICK_REST_SECONDS.labels("user", response.status).observe(time.perf_counter() - started)
                     if response.status == 200:
                         data = await response.json()
                         return data.get('username', f'User_{user_id}')
@@ -1,46 +1,135 @@
+"""
+Logging pipeline.
+
+Callers only put records on a queue (QueueHandler); a QueueListener thread does
+the formatting and the file/console I/O, so a slow disk or terminal never
+stalls the event loop. The log file rotates by size (LOG_MAX_MB) or, with
+LOG_ROTATE_WHEN set, by time, and is appended to across restarts.
+
+High-volume categories get their own child loggers with sampling and a
+per-second cap: `chat_logger` for every chat line, `tts_logger` for per-call
+TTS lines. Suppressed lines are counted and reported on the next line that
+gets through. Use %-style arguments (logger.info("%s: %s", a, b)) on hot
+paths so nothing is formatted for records that are filtered out.
+"""
+import atexit
 import logging
-from pathlib import Path
-from datetime import datetime
-
-def setup_logger(name: str = "kick_tts"):
-    """Setup logger with file and console output"""
-    
-    # Create logs directory
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
-    
-    # Remove existing handlers
-    logger.handlers.clear()
-    
-    # Single file handler (overwrites on each restart)
-    file_handler = logging.FileHandler(
-        log_dir / "kick_tts.log",
-        mode='w',  # Overwrite mode
-        encoding='utf-8'
-    )
-    file_handler.setLevel(logging.DEBUG)
-    
-    # Console handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    
-    # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
+import logging.handlers
+import queue
+import random
+import threading
+import time
+
+from app.config import settings
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class _DeferredFormatQueueHandler(logging.handlers.QueueHandler):
+    """Resolve the message on the caller's thread but leave formatting to the listener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Tracebacks reference frames that may be gone by the time the listener runs
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a `sample_rate` share of records and at most `max_per_second` of them."""
+
+    def __init__(self, sample_rate: float = 1.0, max_per_second: float = 0):
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._tokens = max(max_per_second, 1.0)
+        self._refilled_at = time.monotonic()
+        self._suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        with self._lock:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                self._suppressed += 1
+                return False
+            if self.max_per_second > 0:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.max_per_second, self._tokens + (now - self._refilled_at) * self.max_per_second
+                )
+                self._refilled_at = now
+                if self._tokens < 1:
+                    self._suppressed += 1
+                    return False
+                self._tokens -= 1
+            suppressed, self._suppressed = self._suppressed, 0
+        if suppressed and isinstance(record.args, tuple):
+            msg = str(record.msg) if record.args else str(record.msg).replace("%", "%%")
+            record.msg = msg + " [+%d similar lines suppressed]"
+            record.args = (*record.args, suppressed)
+        return True
+
+
+def _file_handler() -> logging.Handler:
+    settings.LOG_DIR.mkdir(parents=True, exist_ok=True)
+    path = settings.LOG_DIR / "kick_tts.log"
+    if settings.LOG_ROTATE_WHEN:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    return logging.handlers.RotatingFileHandler(
+        path,
+        maxBytes=int(settings.LOG_MAX_MB * 1024 * 1024),
+        backupCount=settings.LOG_BACKUP_COUNT,
+        encoding='utf-8',
     )
-    
+
+
+def setup_logger(name: str = "kick_tts") -> tuple[logging.Logger, logging.handlers.QueueListener]:
+    """Logger whose handlers run on a background QueueListener thread."""
+    formatter = logging.Formatter(FORMAT, datefmt=DATE_FORMAT)
+
+    file_handler = _file_handler()
+    file_handler.setLevel(settings.LOG_FILE_LEVEL.upper())
     file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(settings.LOG_LEVEL.upper())
     console_handler.setFormatter(formatter)
-    
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    return logger
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)
+
+    logger = logging.getLogger(name)
+    # Records below both handler levels are dropped before they are even queued
+    logger.setLevel(min(file_handler.level, console_handler.level))
+    logger.handlers.clear()
+    logger.addHandler(_DeferredFormatQueueHandler(log_queue))
+    logger.propagate = False
+
+    return logger, listener
+
+
+def category_logger(name: str, sample_rate: float = 1.0, max_per_second: float = 0) -> logging.Logger:
+    """Child logger for a high-volume category, sampled and rate limited."""
+    child = logging.getLogger(f"{logger.name}.{name}")
+    child.filters.clear()
+    if sample_rate < 1.0 or max_per_second > 0:
+        child.addFilter(SamplingFilter(sample_rate, max_per_second))
+    return child
+
 
 # Create global logger
-logger = setup_logger()
+logger, log_listener = setup_logger()
+chat_logger = category_logger("chat", settings.LOG_CHAT_SAMPLE_RATE, settings.LOG_CHAT_MAX_PER_SECOND)
+tts_logger = category_logger("tts", max_per_second=settings.LOG_TTS_MAX_PER_SECOND)
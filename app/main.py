@@ -1,33 +1,65 @@
+import time
+
+_imports_started = time.perf_counter()
+
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import asyncio
 
 from app.config import settings
-from app.database import init_db, get_all_streams, get_stream
+from app.logger import logger
+from app.database import init_db, close_db, is_open as db_is_open
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render_metrics
 from app.routes import api, websocket
 from app.routes import streams as streams_router
+from app.services.audio_cache import audio_cache_janitor
 from app.services.stream_manager import stream_manager
+from app.services.stream_registry import stream_registry
+from app.services.circuit_breaker import breaker_snapshot
+from app.services.tts import hedge_snapshot
+from app.services.rate_limiter import limiter_snapshot
+from app.services.piper_batcher import batch_snapshot
+from app.services.text_normalize import normalization_snapshot
+from app.services.warmup import model_warmup, startup_timer
+
+startup_timer.record("imports", (time.perf_counter() - _imports_started) * 1000)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    print("Starting Kick TTS Bot...")
-
-    await init_db()
-
-    all_streams = await get_all_streams()
-    if all_streams:
-        await stream_manager.start_all(all_streams)
-        print(f"Loaded {len(all_streams)} stream(s) from database.")
-    else:
-        print("No streams in database. Add one via POST /api/streams")
-
+    logger.info("Starting Kick TTS Bot...")
+    app.state.ready = False
+
+    with startup_timer.phase("init_db"):
+        await init_db()
+    with startup_timer.phase("load_streams"):
+        await stream_registry.load()
+    stream_registry.start_sync()
+
+    # Model load + first inference run in a thread; requests are served meanwhile
+    model_warmup.start()
+    audio_cache_janitor.start()
+
+    all_streams = stream_registry.all()
+    with startup_timer.phase("start_listeners"):
+        if all_streams:
+            await stream_manager.start_all(all_streams)
+            logger.info("Loaded %d stream(s) from database.", len(all_streams))
+        else:
+            logger.info("No streams in database. Add one via POST /api/streams")
+
+    startup_timer.log_summary("Startup", ["imports", "init_db", "load_streams", "start_listeners"])
+    app.state.ready = True
     yield
 
-    print("Shutting down Kick TTS Bot...")
+    app.state.ready = False
+    logger.info("Shutting down Kick TTS Bot...")
+    await audio_cache_janitor.stop()
+    await stream_registry.stop_sync()
+    await close_db()
 
 
 app = FastAPI(
@@ -51,10 +83,70 @@ async def index(request: Request):
     return templates.TemplateResponse(request, "index.html")
 
 
+@app.get("/livez")
+async def livez():
+    """Liveness probe: constant time, touches nothing but the event loop."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz(request: Request):
+    """
+    Readiness + diagnostics from in-memory counters (no DB queries).
+    Returns 503 until startup has finished and the database is open.
+    """
+    checks = {
+        "startup_complete": getattr(request.app.state, "ready", False),
+        "database": db_is_open(),
+        "models_warm": model_warmup.done,
+    }
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "checks": checks,
+            "warmup": model_warmup.snapshot(),
+            "startup_phases_ms": startup_timer.phases,
+            "streams": stream_manager.diagnostics(),
+            "tts_backends": breaker_snapshot(),
+            "tts_hedging": hedge_snapshot(),
+            "rate_limits": limiter_snapshot(),
+            "piper_batching": batch_snapshot(),
+            "text_normalization": normalization_snapshot(),
+        },
+    )
+
+
+@app.get("/health")
+async def health():
+    """Health check. Declared before /{stream_id} so it isn't captured as a stream id."""
+    streams = stream_registry.all()
+    running = stream_manager.get_running_streams()
+    return {
+        "status": "ok",
+        "streams": [
+            {"stream_id": s["stream_id"], "channel": s["channel"], "running": s["stream_id"] in running}
+            for s in streams
+        ],
+        "tts_backends": breaker_snapshot(),
+        "tts_hedging": hedge_snapshot(),
+        "rate_limits": limiter_snapshot(),
+        "piper_batching": batch_snapshot(),
+        "text_normalization": normalization_snapshot(),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text exposition of the in-process counters and histograms."""
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/{stream_id}", response_class=HTMLResponse)
 async def stream_widget(request: Request, stream_id: str):
     """Widget page scoped to a specific stream."""
-    stream = await get_stream(stream_id)
+    stream = stream_registry.get(stream_id)
     if stream is None:
         return JSONResponse(
             status_code=404,
@@ -73,20 +165,6 @@ async def stream_widget_explicit(request: Request, stream_id: str):
     return await stream_widget(request, stream_id)
 
 
-@app.get("/health")
-async def health():
-    """Health check"""
-    streams = await get_all_streams()
-    running = stream_manager.get_running_streams()
-    return {
-        "status": "ok",
-        "streams": [
-            {"stream_id": s["stream_id"], "channel": s["channel"], "running": s["stream_id"] in running}
-            for s in streams
-        ],
-    }
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,226 @@
+"""
+Minimal in-process metrics with Prometheus text exposition (GET /metrics).
+
+Counters, gauges and histograms keep their values in plain dicts keyed by label
+values; a child is created once per label combination and cached, so the hot
+path is one dict lookup plus a locked add. Callback gauges are evaluated only
+when /metrics is scraped.
+"""
+import bisect
+import threading
+from typing import Callable, Iterable
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def value(self, *labelvalues) -> float:
+        child = self._children.get(tuple(str(v) for v in labelvalues))
+        return child.value if child else 0.0
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+
+class CallbackGauge(_Metric):
+    """Gauge whose samples come from fn() -> {label_values_tuple: value} at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str], fn: Callable[[], dict]):
+        super().__init__(name, documentation, labelnames)
+        self._fn = fn
+
+    def _samples(self):
+        try:
+            values = self._fn()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+            if value is not None
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _samples(self):
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# --- pipeline metrics ---
+
+KICK_FRAMES = Counter("kick_frames_total", "Pusher frames received", ["stream"])
+KICK_REST_SECONDS = Histogram(
+    "kick_rest_request_seconds", "Kick REST API call latency", ["endpoint", "status"]
+)
+EVENT_HANDLING_SECONDS = Histogram(
+    "event_handling_seconds", "Time spent in an event handler", ["stream", "event"]
+)
+TTS_SECONDS = Histogram(
+    "tts_generate_seconds",
+    "TTS generate() latency per backend, split by cache hit/miss",
+    ["backend", "cache"],
+    buckets=(0.001, 0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0),
+)
+TTS_QUEUE_DROPS = Counter("tts_queue_dropped_total", "TTS jobs dropped by the scheduler", ["stream", "reason"])
+TTS_CACHE_LOOKUPS = Counter(
+    "tts_cache_lookups_total", "TTS cache lookups keyed on normalized text, and as raw-text keys would have gone",
+    ["key", "result"],
+)
+TTS_PRERENDERS = Counter("tts_prerendered_total", "Frequent phrases synthesized ahead of demand", ["stream"])
+TTS_HEDGES = Counter("tts_hedge_events_total", "Hedged TTS calls and their outcome", ["event"])
+CACHE_EVICTIONS = Counter("tts_cache_evictions_total", "Cached clips deleted to stay under TTS_CACHE_MAX_MB")
+RATE_LIMIT_WAITS = Counter("tts_rate_limit_waits_total", "Requests that had to wait for a rate-limit slot", ["api"])
+RATE_LIMIT_WAIT_SECONDS = Counter("tts_rate_limit_wait_seconds_total", "Time spent waiting for a rate-limit slot", ["api"])
+RATE_LIMIT_REJECTIONS = Counter("tts_rate_limit_rejections_total", "Requests that timed out waiting for a slot", ["api"])
+RATE_LIMIT_THROTTLED = Counter("tts_rate_limit_throttled_total", "429 responses received", ["api"])
+PIPER_BATCH_SIZE = Histogram(
+    "piper_batch_size", "Sentences per batched Piper inference", buckets=(1, 2, 4, 8, 16, 32)
+)
+PIPER_BATCH_SECONDS = Histogram("piper_batch_inference_seconds", "Time spent in one batched Piper inference")
+PIPER_BATCH_WAIT_SECONDS = Histogram(
+    "piper_batch_wait_seconds", "Time a sentence waited for its Piper batch to start",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+PIPER_BATCH_AUDIO_SECONDS = Counter("piper_batch_audio_seconds_total", "Audio produced by batched Piper inference")
+PIPER_REALTIME_FACTOR = Gauge(
+    "piper_realtime_factor", "Synthesis time / audio duration from the startup benchmark (lower is faster)"
+)
+WS_BROADCAST_SECONDS = Histogram(
+    "ws_broadcast_seconds", "Time to fan a message out to a stream's widgets", ["stream"]
+)
+WS_INLINE_AUDIO = Counter("ws_inline_audio_total", "TTS clips sent to widgets as binary frames", ["stream"])
+WS_DROPPED_WIDGETS = Counter("ws_dropped_widgets_total", "Widget sockets dropped after a failed send", ["stream"])
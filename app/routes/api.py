@@ -5,10 +5,11 @@ import re
 from pathlib import Path
 
 from app.models import TTSRequest, TTSResponse, SoundEffectRequest
+from app.services import text_normalize
 from app.services.tts import build_tts
 from app.services.sound_service import get_sound_service
 from app.routes.websocket import broadcast_to_widgets, broadcast_to_stream
-from app.database import get_stream
+from app.services.stream_registry import stream_registry
 from app.config import settings
 
 router = APIRouter()
@@ -61,21 +62,24 @@ async def generate_tts(request: TTSRequest):
     """
     try:
         username = request.username or "api"
-        text_to_speak = f"{username} dice: {request.text}"
 
         # Resolve TTS backend from stream config if stream_id provided
         if request.stream_id:
-            stream = await get_stream(request.stream_id)
+            stream = stream_registry.get(request.stream_id)
             if not stream:
                 raise HTTPException(status_code=404, detail=f"Stream '{request.stream_id}' not found")
             tts = build_tts(
                 backend=stream["tts_backend"],
                 elevenlabs_voice_id=stream["elevenlabs_voice_id"],
+                piper_voice=stream.get("piper_voice"),
             )
         else:
             tts = build_tts()
 
+        text_to_speak = f"{username} dice: {text_normalize.for_backend(request.text, tts)}"
         audio_url, cached, gen_time = tts.generate(text_to_speak, username, request.use_cache)
+        if request.use_cache:
+            text_normalize.record_lookup(f"{username} dice: {request.text}", cached)
 
         message = {
             'type': 'tts_message',
@@ -137,6 +141,13 @@ async def list_elevenlabs_voices():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/piper/voices")
+async def list_piper_voices():
+    """Piper voices in PIPER_VOICES_DIR (usable as a stream's piper_voice) and which are loaded."""
+    from app.services.piper_voices import available_voices, piper_voices
+    return {"voices": available_voices(), "default": Path(settings.PIPER_MODEL).stem, **piper_voices.snapshot()}
+
+
 @router.get("/sounds", response_model=List[str])
 async def list_sounds():
     """List available sound effects"""
@@ -1,18 +1,36 @@
+import asyncio
+
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 
-from app.database import get_all_streams, get_stream, add_stream, update_stream, delete_stream
+from app.logger import logger
+from app.services.piper_voices import voice_exists
 from app.services.stream_manager import stream_manager
+from app.services.stream_registry import stream_registry
+from app.services.tracing import forget_stream, stream_latency
 
 router = APIRouter()
 
+TTS_BACKENDS = ("piper", "elevenlabs", "synthetic")
+# How long add/update wait for the listener's TTS backend (model load) before answering
+TTS_BUILD_WAIT_SECONDS = 30
+
+# One per stream: an update persists the row and then applies it to the
+# listener, and two updates must not interleave between those steps
+_update_locks: dict[str, asyncio.Lock] = {}
+
+
+def _update_lock(stream_id: str) -> asyncio.Lock:
+    return _update_locks.setdefault(stream_id, asyncio.Lock())
+
 
 class StreamCreateRequest(BaseModel):
     stream_id: str
     channel: str
     tts_backend: str = "elevenlabs"
     elevenlabs_voice_id: Optional[str] = None  # uses global ELEVEN_LABS_VOICE_ID if omitted
+    piper_voice: Optional[str] = None  # voice name in PIPER_VOICES_DIR; uses PIPER_MODEL if omitted
     tts_enabled: bool = True
 
 
@@ -20,87 +38,127 @@ class StreamUpdateRequest(BaseModel):
     channel: Optional[str] = None
     tts_backend: Optional[str] = None
     elevenlabs_voice_id: Optional[str] = None
+    piper_voice: Optional[str] = None  # "" resets to PIPER_MODEL
     tts_enabled: Optional[bool] = None
 
 
+def _check_piper_voice(piper_voice: Optional[str]):
+    if piper_voice and not voice_exists(piper_voice):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Piper voice '{piper_voice}' is not a voice in PIPER_VOICES_DIR (see GET /api/piper/voices)",
+        )
+
+
 @router.get("/streams")
 async def list_streams():
     """List all configured streams with their running status."""
-    streams = await get_all_streams()
+    streams = stream_registry.all()
     running = stream_manager.get_running_streams()
     for s in streams:
         s["running"] = s["stream_id"] in running
+        s.update(stream_manager.tts_status(s["stream_id"]))
     return {"streams": streams}
 
 
 @router.post("/streams", status_code=201)
 async def create_stream(req: StreamCreateRequest):
     """Add a new stream and start its listener."""
-    if req.tts_backend not in ("piper", "elevenlabs"):
-        raise HTTPException(status_code=400, detail="tts_backend must be 'piper' or 'elevenlabs'")
+    if req.tts_backend not in TTS_BACKENDS:
+        raise HTTPException(status_code=400, detail="tts_backend must be 'piper', 'elevenlabs' or 'synthetic'")
 
-    if await get_stream(req.stream_id):
+    if req.stream_id in stream_registry:
         raise HTTPException(status_code=409, detail="stream_id already exists")
+    _check_piper_voice(req.piper_voice)
 
-    await add_stream(
+    await stream_registry.add(
         req.stream_id,
         req.channel,
         tts_backend=req.tts_backend,
         elevenlabs_voice_id=req.elevenlabs_voice_id,
+        piper_voice=req.piper_voice,
     )
     await stream_manager.start_stream(
         req.stream_id,
         req.channel,
         tts_backend=req.tts_backend,
         elevenlabs_voice_id=req.elevenlabs_voice_id,
+        piper_voice=req.piper_voice,
         tts_enabled=req.tts_enabled,
     )
+    # The stream is saved either way; tts_status/tts_error tell the caller if TTS came up
+    tts = await stream_manager.wait_for_tts(req.stream_id, TTS_BUILD_WAIT_SECONDS)
 
     return {
         "stream_id": req.stream_id,
         "channel": req.channel,
         "tts_backend": req.tts_backend,
         "elevenlabs_voice_id": req.elevenlabs_voice_id,
+        "piper_voice": req.piper_voice,
         "tts_enabled": req.tts_enabled,
+        **tts,
     }
 
 
 @router.put("/streams/{stream_id}")
 async def update_stream_route(stream_id: str, req: StreamUpdateRequest):
-    """Update channel and/or voice config for a stream, then restart its listener."""
-    stream = await get_stream(stream_id)
-    if not stream:
-        raise HTTPException(status_code=404, detail="stream not found")
-
-    if req.tts_backend and req.tts_backend not in ("piper", "elevenlabs"):
-        raise HTTPException(status_code=400, detail="tts_backend must be 'piper' or 'elevenlabs'")
-
-    await update_stream(
-        stream_id,
-        channel=req.channel,
-        tts_backend=req.tts_backend,
-        elevenlabs_voice_id=req.elevenlabs_voice_id,
-        tts_enabled=req.tts_enabled,
-    )
-
-    updated = await get_stream(stream_id)
-
-    await stream_manager.stop_stream(stream_id)
-    await stream_manager.start_stream(
-        stream_id,
-        updated["channel"],
-        tts_backend=updated["tts_backend"],
-        elevenlabs_voice_id=updated["elevenlabs_voice_id"],
-        tts_enabled=updated.get("tts_enabled", 1) == 1,
-    )
-
-    return updated
+    """
+    Update channel and/or voice config for a stream.
+    The row is saved first and the running listener then follows it: TTS-only
+    changes are applied in place, changing the channel reconnects it.
+    """
+    if req.tts_backend and req.tts_backend not in TTS_BACKENDS:
+        raise HTTPException(status_code=400, detail="tts_backend must be 'piper', 'elevenlabs' or 'synthetic'")
+    _check_piper_voice(req.piper_voice)
+
+    async with _update_lock(stream_id):
+        current = stream_registry.get(stream_id)
+        if not current:
+            raise HTTPException(status_code=404, detail="stream not found")
+
+        updated = await stream_registry.update(
+            stream_id,
+            channel=req.channel,
+            tts_backend=req.tts_backend,
+            elevenlabs_voice_id=req.elevenlabs_voice_id,
+            piper_voice=req.piper_voice,
+            tts_enabled=req.tts_enabled,
+        )
+        if updated is None:
+            raise HTTPException(status_code=404, detail="stream not found")
+
+        reconfigured = False
+        if updated["channel"] == current["channel"]:
+            try:
+                reconfigured = await stream_manager.reconfigure_stream(
+                    stream_id,
+                    tts_backend=updated["tts_backend"],
+                    elevenlabs_voice_id=updated["elevenlabs_voice_id"],
+                    piper_voice=updated.get("piper_voice"),
+                    tts_enabled=updated.get("tts_enabled", 1) == 1,
+                )
+            except Exception as e:
+                # The saved row is the truth: restart the listener from it
+                logger.warning(f"Could not apply TTS config to stream '{stream_id}' in place: {e}")
+
+        if not reconfigured:
+            await stream_manager.stop_stream(stream_id)
+            await stream_manager.start_stream(
+                stream_id,
+                updated["channel"],
+                tts_backend=updated["tts_backend"],
+                elevenlabs_voice_id=updated["elevenlabs_voice_id"],
+                piper_voice=updated.get("piper_voice"),
+                tts_enabled=updated.get("tts_enabled", 1) == 1,
+            )
+
+    return {**updated, **await stream_manager.wait_for_tts(stream_id, TTS_BUILD_WAIT_SECONDS)}
 
 
 @router.post("/streams/{stream_id}/refresh")
 async def refresh_stream(stream_id: str):
     """Restart a stream listener without changing its configuration."""
-    stream = await get_stream(stream_id)
+    stream = stream_registry.get(stream_id)
     if not stream:
         raise HTTPException(status_code=404, detail="stream not found")
 
@@ -110,6 +168,7 @@ async def refresh_stream(stream_id: str):
         stream["channel"],
         tts_backend=stream.get("tts_backend", "elevenlabs"),
         elevenlabs_voice_id=stream.get("elevenlabs_voice_id"),
+        piper_voice=stream.get("piper_voice"),
         tts_enabled=stream.get("tts_enabled", 1) == 1,
     )
 
@@ -120,12 +179,22 @@ async def refresh_stream(stream_id: str):
     }
 
 
+@router.get("/streams/{stream_id}/latency")
+async def stream_latency_view(stream_id: str):
+    """Rolling per-stage latency percentiles (ms), Kick frame to widget playback."""
+    if stream_id not in stream_registry:
+        raise HTTPException(status_code=404, detail="stream not found")
+    return {"stream_id": stream_id, **stream_latency(stream_id).snapshot()}
+
+
 @router.delete("/streams/{stream_id}")
 async def remove_stream(stream_id: str):
     """Remove a stream and stop its listener."""
-    if not await delete_stream(stream_id):
+    if not await stream_registry.delete(stream_id):
         raise HTTPException(status_code=404, detail="stream not found")
 
     await stream_manager.stop_stream(stream_id)
+    forget_stream(stream_id)
+    _update_locks.pop(stream_id, None)
 
     return {"status": "deleted", "stream_id": stream_id}
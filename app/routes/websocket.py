@@ -1,25 +1,97 @@
+"""
+Widget websockets.
+
+Inline audio: a widget can send {"type": "hello", "inline_audio_max_bytes": N}
+(N null = whatever the server allows). The server answers with the agreed limit,
+min(N, WS_INLINE_AUDIO_MAX_KB). Clips within that limit are then sent as a
+binary frame right before their JSON message, which carries the frame's
+`audio_id`. The frame is one byte with the id's length, the id (ASCII), and
+the audio file bytes. Widgets that never send a hello only ever get URLs.
+"""
+import itertools
+import json
+import time
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from typing import Dict, List
 
+from app.config import settings
+from app.logger import logger
+from app.metrics import CallbackGauge, WS_BROADCAST_SECONDS, WS_DROPPED_WIDGETS, WS_INLINE_AUDIO
+from app.services.tracing import Trace, current_trace, stream_latency
+
 router = APIRouter()
 
 # Per-stream connections: { stream_id: [WebSocket, ...] }
 _connections: Dict[str, List[WebSocket]] = {}
+# Inline audio limit (bytes) agreed with each widget that asked for it
+_inline_limits: Dict[WebSocket, int] = {}
+_audio_ids = itertools.count(1)
+
+CallbackGauge(
+    "ws_connected_widgets", "Widget sockets currently connected", ["stream"],
+    lambda: {(sid,): len(conns) for sid, conns in _connections.items()},
+)
+
 
+def inline_audio_limit(stream_id: str) -> int:
+    """Largest inline clip any widget on the stream accepts (0 = none opted in)."""
+    return max((_inline_limits.get(ws, 0) for ws in _connections.get(stream_id, [])), default=0)
 
-async def broadcast_to_stream(stream_id: str, message: dict):
-    """Send a message to all widgets connected to a specific stream."""
+
+async def broadcast_to_stream(
+    stream_id: str,
+    message: dict,
+    trace: Trace | None = None,
+    audio: bytes | None = None,
+    audio_type: str | None = None,
+):
+    """
+    Send a message to all widgets connected to a specific stream.
+    The message carries `trace_id` of the given (or current) trace so widgets can ack it.
+    With `audio`, widgets whose inline limit fits it get the clip as a binary
+    frame first; the others fetch `audio_url` as usual.
+    """
     connections = _connections.get(stream_id, [])
+    if not connections:
+        return
+    if trace is None:
+        trace = current_trace()
+    if trace is not None and trace.stream_id == stream_id:
+        message = {**message, "trace_id": trace.trace_id}
+    else:
+        trace = None
+    inline_message = frame = None
+    if audio is not None:
+        audio_id = f"{next(_audio_ids):x}"
+        frame = bytes([len(audio_id)]) + audio_id.encode() + audio
+        inline_message = {**message, "audio_id": audio_id, "audio_type": audio_type}
     disconnected = []
+    inlined = 0
+    started = time.perf_counter()
 
     for ws in connections:
         try:
-            await ws.send_json(message)
+            if frame is not None and len(audio) <= _inline_limits.get(ws, 0):
+                await ws.send_bytes(frame)
+                await ws.send_json(inline_message)
+                inlined += 1
+            else:
+                await ws.send_json(message)
         except Exception:
             disconnected.append(ws)
 
     for ws in disconnected:
         connections.remove(ws)
+        _inline_limits.pop(ws, None)
+
+    WS_BROADCAST_SECONDS.labels(stream_id).observe(time.perf_counter() - started)
+    if trace is not None:
+        stream_latency(stream_id).broadcast(trace, message.get("type", "unknown"))
+    if disconnected:
+        WS_DROPPED_WIDGETS.labels(stream_id).inc(len(disconnected))
+    if inlined:
+        WS_INLINE_AUDIO.labels(stream_id).inc(inlined)
 
 
 async def broadcast_to_widgets(message: dict):
@@ -28,6 +100,31 @@ async def broadcast_to_widgets(message: dict):
         await broadcast_to_stream(stream_id, message)
 
 
+async def _handle_widget_message(websocket: WebSocket, stream_id: str, raw: str):
+    """
+    Widgets ack traced messages: {"type": "ack", "trace_id": ..., "stage": "received" | "playback"},
+    and may negotiate inline audio with a hello.
+    """
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return
+    if not isinstance(data, dict):
+        return
+    if data.get("type") == "ack":
+        stream_latency(stream_id).ack(str(data.get("trace_id")), data.get("stage"))
+    elif data.get("type") == "hello":
+        limit = settings.WS_INLINE_AUDIO_MAX_KB * 1024
+        requested = data.get("inline_audio_max_bytes")
+        if isinstance(requested, int) and not isinstance(requested, bool) and requested >= 0:
+            limit = min(limit, requested)
+        if limit > 0:
+            _inline_limits[websocket] = limit
+        else:
+            _inline_limits.pop(websocket, None)
+        await websocket.send_json({"type": "hello", "inline_audio_max_bytes": limit})
+
+
 @router.websocket("/{stream_id}/events")
 async def websocket_endpoint(websocket: WebSocket, stream_id: str):
     """WebSocket endpoint scoped to a single stream."""
@@ -38,15 +135,16 @@ async def websocket_endpoint(websocket: WebSocket, stream_id: str):
     _connections[stream_id].append(websocket)
 
     total = sum(len(v) for v in _connections.values())
-    print(f"Widget connected to stream '{stream_id}'. Total connections: {total}")
+    logger.info("Widget connected to stream '%s'. Total connections: %d", stream_id, total)
 
     try:
         while True:
-            await websocket.receive_text()
+            await _handle_widget_message(websocket, stream_id, await websocket.receive_text())
     except WebSocketDisconnect:
+        _inline_limits.pop(websocket, None)
         if stream_id in _connections:
             try:
                 _connections[stream_id].remove(websocket)
             except ValueError:
                 pass
-        print(f"Widget disconnected from stream '{stream_id}'.")
+        logger.info("Widget disconnected from stream '%s'.", stream_id)
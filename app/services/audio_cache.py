@@ -0,0 +1,96 @@
+"""
+Size accounting and eviction for the on-disk TTS clip cache (CACHE_DIR).
+
+A background task rescans the directory every TTS_CACHE_SCAN_SECONDS and keeps
+the file count / byte total that /metrics exports. With TTS_CACHE_MAX_MB set it
+also deletes the least recently used clips until the cache fits the budget.
+Backends look clips up through cached_url(), which bumps the file's mtime on
+every hit, so mtime order is use order. Only audio files are counted or
+evicted; anything else in the directory (.gitkeep) is left alone.
+"""
+import asyncio
+import os
+from pathlib import Path
+
+from app.config import settings
+from app.logger import logger
+from app.metrics import CACHE_EVICTIONS, CallbackGauge
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".ogg")
+
+
+def cached_url(path: Path) -> str | None:
+    """URL of a cached clip, marking it as just used; None if it isn't cached."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except OSError:
+        pass  # read-only cache: still a hit, it just won't count for eviction order
+    return f"/static/cache/{path.name}"
+
+
+class AudioCacheJanitor:
+    def __init__(self):
+        self.files = 0
+        self.bytes = 0
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audio-cache-janitor")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.scan)
+            except Exception as e:
+                logger.warning(f"Audio cache scan failed: {e}")
+            await asyncio.sleep(settings.TTS_CACHE_SCAN_SECONDS)
+
+    def scan(self):
+        """Refresh size counters and evict the least recently used clips over TTS_CACHE_MAX_MB."""
+        entries = []
+        with os.scandir(settings.CACHE_DIR) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.lower().endswith(AUDIO_EXTENSIONS):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+
+        budget = settings.TTS_CACHE_MAX_MB * 1024 * 1024
+        evicted = 0
+        if budget > 0 and total > budget:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= budget:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                evicted += 1
+            CACHE_EVICTIONS.inc(evicted)
+            logger.info(f"Audio cache over {settings.TTS_CACHE_MAX_MB}MB, evicted {evicted} clip(s)")
+
+        self.files = len(entries) - evicted
+        self.bytes = total
+
+
+audio_cache_janitor = AudioCacheJanitor()
+
+CallbackGauge("tts_cache_files", "Clips in the TTS audio cache (as of the last scan)", [],
+              lambda: {(): audio_cache_janitor.files})
+CallbackGauge("tts_cache_bytes", "Size of the TTS audio cache in bytes (as of the last scan)", [],
+              lambda: {(): audio_cache_janitor.bytes})
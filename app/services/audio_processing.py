@@ -0,0 +1,156 @@
+"""
+Post-processing for synthesized 16-bit mono PCM, applied before a clip is cached.
+
+- Silence trim: leading/trailing audio quieter than AUDIO_SILENCE_DB is cut,
+  keeping AUDIO_SILENCE_PAD_MS so words aren't clipped.
+- Pause compression (AUDIO_MAX_PAUSE_MS > 0): silences inside the clip are
+  shortened to that length.
+- Loudness normalization (AUDIO_TARGET_LUFS != 0): gain towards the target,
+  limited so peaks stay under -1 dBFS.
+
+Everything works on 10 ms frame energies computed from views of the input, so
+a trim-only pass copies nothing and normalization makes one float32 buffer.
+Loudness follows BS.1770 gating (400 ms blocks, -70 LUFS absolute and -10 LU
+relative gates) without the K-weighting filter, which is close enough to keep
+speech clips from one voice at a consistent level.
+"""
+import io
+import wave
+
+import numpy as np
+
+from app.config import settings
+
+FRAME_MS = 10
+BLOCK_FRAMES = 40  # 400 ms gating blocks
+BLOCK_STEP_FRAMES = 10  # 75% overlap
+PEAK_CEILING = 10 ** (-1 / 20) * 32767
+_EPS = 1e-12
+
+
+def enabled() -> bool:
+    return settings.AUDIO_POSTPROCESS
+
+
+def cache_tag() -> str:
+    """Part of the cache key, so clips cached with other settings aren't reused."""
+    if not settings.AUDIO_POSTPROCESS:
+        return ""
+    return (
+        f"pp:{settings.AUDIO_SILENCE_DB:g}/{settings.AUDIO_SILENCE_PAD_MS:g}/"
+        f"{settings.AUDIO_MAX_PAUSE_MS:g}/{settings.AUDIO_TARGET_LUFS:g}"
+    )
+
+
+def process(pcm: np.ndarray, sample_rate: int) -> np.ndarray:
+    """Trim, compress pauses and normalize int16 mono samples; returns int16 samples."""
+    frame = max(1, sample_rate * FRAME_MS // 1000)
+    n_frames = len(pcm) // frame
+    if n_frames == 0:
+        return pcm
+
+    frames = pcm[: n_frames * frame].reshape(n_frames, frame)
+    energy = np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / (frame * 32768.0 ** 2)
+    loud = 10 * np.log10(energy + _EPS) > settings.AUDIO_SILENCE_DB
+    if not loud.any():
+        return pcm  # all silence (or a very quiet voice): leave it alone
+
+    voiced = np.flatnonzero(loud)
+    pad = int(settings.AUDIO_SILENCE_PAD_MS // FRAME_MS)
+    first = max(0, voiced[0] - pad)
+    last = min(n_frames, voiced[-1] + 1 + pad)
+    end = len(pcm) if last == n_frames else last * frame
+
+    max_pause = int(settings.AUDIO_MAX_PAUSE_MS // FRAME_MS)
+    if max_pause > 0:
+        keep = _pause_mask(loud[first:last], max_pause)
+        if keep.all():
+            out = pcm[first * frame:end]
+            kept_energy = energy[first:last]
+        else:
+            sample_mask = np.repeat(keep, frame)
+            if end > last * frame:
+                sample_mask = np.concatenate([sample_mask, np.ones(end - last * frame, dtype=bool)])
+            out = pcm[first * frame:end][sample_mask]
+            kept_energy = energy[first:last][keep]
+    else:
+        out = pcm[first * frame:end]
+        kept_energy = energy[first:last]
+
+    if settings.AUDIO_TARGET_LUFS:
+        out = _normalize(out, kept_energy)
+    return out
+
+
+def to_wav(pcm: np.ndarray, sample_rate: int) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(np.ascontiguousarray(pcm, dtype="<i2"))
+    return buf.getvalue()
+
+
+def concat_wav(clips: list[bytes], gap_ms: float = 0) -> bytes | None:
+    """Join WAV clips with gap_ms of silence between them; None if their formats differ."""
+    params = None
+    frames = []
+    for clip in clips:
+        with wave.open(io.BytesIO(clip), "rb") as wav_file:
+            clip_params = (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+            if params is not None and clip_params != params:
+                return None
+            params = clip_params
+            frames.append(wav_file.readframes(wav_file.getnframes()))
+    if params is None:
+        return None
+    channels, width, rate = params
+    gap = b"\0" * (int(rate * gap_ms / 1000) * channels * width)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav_file:
+        wav_file.setnchannels(channels)
+        wav_file.setsampwidth(width)
+        wav_file.setframerate(rate)
+        wav_file.writeframes(gap.join(frames))
+    return buf.getvalue()
+
+
+def _pause_mask(loud: np.ndarray, max_pause: int) -> np.ndarray:
+    """Frames to keep: every loud frame and the first max_pause frames of each silence."""
+    idx = np.arange(len(loud))
+    run_start = np.maximum.accumulate(np.where(loud, idx + 1, 0))
+    return loud | (idx - run_start < max_pause)
+
+
+def _normalize(pcm: np.ndarray, energy: np.ndarray) -> np.ndarray:
+    loudness = _gated_loudness(energy)
+    if loudness is None:
+        return pcm
+    gain = 10 ** ((settings.AUDIO_TARGET_LUFS - loudness) / 20)
+    peak = max(int(pcm.max()), -int(pcm.min()), 1)
+    gain = min(gain, PEAK_CEILING / peak)
+    if abs(20 * np.log10(gain)) < 0.5:
+        return pcm  # inaudible change, skip the copy
+    out = np.multiply(pcm, gain, dtype=np.float32)
+    np.rint(out, out=out)
+    np.clip(out, -32768, 32767, out=out)
+    return out.astype(np.int16)
+
+
+def _gated_loudness(energy: np.ndarray) -> float | None:
+    """Approximate integrated loudness (LUFS) from 10 ms frame mean-square energies."""
+    if len(energy) < BLOCK_FRAMES:
+        blocks = np.array([energy.mean()])
+    else:
+        sums = np.concatenate([[0.0], np.cumsum(energy)])
+        starts = np.arange(0, len(energy) - BLOCK_FRAMES + 1, BLOCK_STEP_FRAMES)
+        blocks = (sums[starts + BLOCK_FRAMES] - sums[starts]) / BLOCK_FRAMES
+
+    block_lufs = -0.691 + 10 * np.log10(blocks + _EPS)
+    gated = blocks[block_lufs > -70]
+    if not len(gated):
+        return None
+    relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10
+    gated = gated[-0.691 + 10 * np.log10(gated + _EPS) > relative_gate]
+    return float(-0.691 + 10 * np.log10(gated.mean()))
@@ -1,6 +1,7 @@
 from typing import Optional
 import redis
 from app.config import settings
+from app.logger import logger
 
 
 class CacheService:
@@ -17,9 +18,9 @@ class CacheService:
                     decode_responses=True
                 )
                 self.redis_client.ping()
-                print("Redis cache connected")
+                logger.info("Redis cache connected")
             except Exception as e:
-                print(f"Redis connection failed: {e}")
+                logger.warning(f"Redis connection failed: {e}")
                 self.enabled = False
     
     def get(self, key: str) -> Optional[str]:
@@ -30,7 +31,7 @@ class CacheService:
         try:
             return self.redis_client.get(key)
         except Exception as e:
-            print(f"Redis get error: {e}")
+            logger.warning(f"Redis get error: {e}")
             return None
     
     def set(self, key: str, value: str, ttl: int = 3600):
@@ -42,7 +43,7 @@ class CacheService:
             self.redis_client.setex(key, ttl, value)
             return True
         except Exception as e:
-            print(f"Redis set error: {e}")
+            logger.warning(f"Redis set error: {e}")
             return False
     
     def delete(self, key: str):
@@ -54,7 +55,7 @@ class CacheService:
             self.redis_client.delete(key)
             return True
         except Exception as e:
-            print(f"Redis delete error: {e}")
+            logger.warning(f"Redis delete error: {e}")
             return False
 
 
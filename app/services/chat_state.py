@@ -0,0 +1,168 @@
+"""
+Bounded-memory chat state for per-user cooldowns, duplicate suppression and
+phrase frequencies.
+
+All structures forget entries on their own, so memory stays flat on channels
+that run 24/7 instead of growing with every username or message ever seen.
+"""
+import hashlib
+import heapq
+import time
+from collections import deque
+
+
+class CooldownTracker:
+    """
+    Per-user cooldown with two rotating time buckets.
+
+    Users are recorded in the current bucket; when a bucket is older than the
+    TTL it becomes the previous one and the old previous bucket is dropped
+    wholesale. Only users seen in the last 2×TTL are ever kept.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl = ttl_seconds
+        self._current: dict[str, float] = {}
+        self._previous: dict[str, float] = {}
+        self._bucket_start = time.monotonic()
+
+    def _rotate(self, now: float):
+        elapsed = now - self._bucket_start
+        if elapsed < self.ttl:
+            return
+        self._previous = self._current if elapsed < 2 * self.ttl else {}
+        self._current = {}
+        self._bucket_start = now
+
+    def allow(self, username: str) -> bool:
+        """True (and starts a new cooldown) if username is not cooling down."""
+        if self.ttl <= 0:
+            return True
+        now = time.monotonic()
+        self._rotate(now)
+        last = self._current.get(username)
+        if last is None:
+            last = self._previous.get(username)
+        if last is not None and now - last < self.ttl:
+            return False
+        self._current[username] = now
+        return True
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+
+class RecentTextWindow:
+    """
+    Hashes of texts seen in the last `window_seconds`, capped at `max_items`.
+
+    A ring buffer of (time, hash) plus a hash -> count map, so lookups are O(1)
+    and a copypasta is caught even when other messages arrive in between.
+    """
+
+    def __init__(self, window_seconds: float, max_items: int):
+        self.window = window_seconds
+        self._ring: deque[tuple[float, int]] = deque()
+        self._max_items = max(1, max_items)
+        self._counts: dict[int, int] = {}
+
+    def _evict_one(self):
+        _, h = self._ring.popleft()
+        remaining = self._counts[h] - 1
+        if remaining:
+            self._counts[h] = remaining
+        else:
+            del self._counts[h]
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        while self._ring and self._ring[0][0] <= cutoff:
+            self._evict_one()
+
+    def contains(self, text: str) -> bool:
+        if self.window <= 0:
+            return False
+        self._expire(time.monotonic())
+        return hash(text) in self._counts
+
+    def add(self, text: str):
+        if self.window <= 0:
+            return
+        now = time.monotonic()
+        self._expire(now)
+        if len(self._ring) >= self._max_items:
+            self._evict_one()
+        h = hash(text)
+        self._ring.append((now, h))
+        self._counts[h] = self._counts.get(h, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._ring)
+
+
+class HeavyHitters:
+    """
+    Approximate most frequent texts: a Count-Min Sketch plus a top-k table.
+
+    The sketch estimates any text's count in `depth` x `width` counters
+    (conservative update, so estimates only overshoot on hash collisions).
+    The table keeps the `k` texts with the highest estimates, each with the
+    last payload recorded for it. With `half_life_seconds` set, all counts are
+    halved that often so phrases that fall out of use fade away.
+    """
+
+    def __init__(self, k: int, width: int = 2048, depth: int = 4, half_life_seconds: float = 0):
+        self.k = k
+        self.width = width
+        self.depth = depth
+        self.half_life = half_life_seconds
+        self._rows = [[0] * width for _ in range(depth)]
+        self._top: dict[str, tuple[int, object]] = {}
+        self._decayed_at = time.monotonic()
+
+    def _indexes(self, text: str) -> list[int]:
+        digest = hashlib.blake2b(text.encode(), digest_size=4 * self.depth).digest()
+        return [int.from_bytes(digest[i:i + 4], "little") % self.width for i in range(0, 4 * self.depth, 4)]
+
+    def _decay(self, now: float):
+        if self.half_life <= 0:
+            return
+        halvings = int((now - self._decayed_at) // self.half_life)
+        if halvings <= 0:
+            return
+        self._decayed_at += halvings * self.half_life
+        self._rows = [[count >> halvings for count in row] for row in self._rows]
+        self._top = {
+            text: (count >> halvings, payload)
+            for text, (count, payload) in self._top.items()
+            if count >> halvings
+        }
+
+    def add(self, text: str, payload=None) -> int:
+        """Count one occurrence of text; returns its estimated count."""
+        if self.k <= 0:
+            return 0
+        self._decay(time.monotonic())
+        indexes = self._indexes(text)
+        estimate = min(row[i] for row, i in zip(self._rows, indexes)) + 1
+        for row, i in zip(self._rows, indexes):
+            if row[i] < estimate:
+                row[i] = estimate
+
+        if text in self._top or len(self._top) < self.k:
+            self._top[text] = (estimate, payload)
+        else:
+            weakest = min(self._top, key=lambda t: self._top[t][0])
+            if estimate > self._top[weakest][0]:
+                del self._top[weakest]
+                self._top[text] = (estimate, payload)
+        return estimate
+
+    def top(self, n: int | None = None) -> list[tuple[str, int, object]]:
+        """(text, estimated count, payload) for the most frequent texts, highest first."""
+        self._decay(time.monotonic())
+        items = ((text, count, payload) for text, (count, payload) in self._top.items())
+        return heapq.nlargest(n or self.k, items, key=lambda item: item[1])
+
+    def __len__(self) -> int:
+        return len(self._top)
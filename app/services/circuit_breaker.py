@@ -0,0 +1,178 @@
+"""
+Circuit breaker and rolling latency stats for TTS backends.
+
+A breaker starts CLOSED. After TTS_BREAKER_FAILURE_THRESHOLD consecutive
+failures (a call slower than TTS_BREAKER_SLOW_CALL_MS counts as a failure) it
+OPENS and callers skip the backend. After TTS_BREAKER_RESET_SECONDS it goes
+HALF_OPEN and lets a single probe call through: success closes it again,
+failure re-opens it.
+
+Backends are synthesized from worker threads, so everything here is guarded by
+a threading.Lock rather than asyncio primitives.
+"""
+import threading
+import time
+from collections import deque
+
+from app.config import settings
+from app.metrics import CallbackGauge
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class LatencyHistogram:
+    """Rolling window of the last N latency samples (ms) with percentile lookup."""
+
+    def __init__(self, size: int = 200):
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, ms: float):
+        with self._lock:
+            self._samples.append(ms)
+
+    def samples(self) -> list[float]:
+        with self._lock:
+            return list(self._samples)
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count = len(self._samples)
+        return {
+            "samples": count,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+        }
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int | None = None,
+        slow_call_ms: float | None = None,
+        reset_seconds: float | None = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.TTS_BREAKER_FAILURE_THRESHOLD
+        self.slow_call_ms = slow_call_ms if slow_call_ms is not None else settings.TTS_BREAKER_SLOW_CALL_MS
+        self.reset_seconds = reset_seconds if reset_seconds is not None else settings.TTS_BREAKER_RESET_SECONDS
+        self.latency = LatencyHistogram()
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_error: str | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """True if a call may go to this backend right now."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def release_probe(self):
+        """The call allowed through made no backend request (cache hit); let the next one probe."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self, elapsed_ms: float):
+        self.latency.record(elapsed_ms)
+        if self.slow_call_ms > 0 and elapsed_ms > self.slow_call_ms:
+            self._on_failure(f"slow call ({elapsed_ms:.0f}ms)")
+            return
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Exception, elapsed_ms: float | None = None):
+        if elapsed_ms is not None:
+            self.latency.record(elapsed_ms)
+        self._on_failure(str(error))
+
+    def _on_failure(self, reason: str):
+        with self._lock:
+            self._failures += 1
+            self._last_error = reason
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        state = self.state
+        with self._lock:
+            retry_in = None
+            if state == OPEN:
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at))
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "last_error": self._last_error,
+                "retry_in_seconds": retry_in,
+                "latency": self.latency.snapshot(),
+            }
+
+
+# One breaker per backend name, shared by every stream in the process
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(name)
+            _breakers[name] = breaker
+        return breaker
+
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def _breaker_states() -> dict:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {(b.name,): _STATE_VALUES[b.state] for b in breakers}
+
+
+CallbackGauge(
+    "tts_breaker_state", "Circuit breaker state per backend (0=closed, 1=half-open, 2=open)",
+    ["backend"], _breaker_states,
+)
+
+
+def breaker_snapshot() -> dict:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.snapshot() for b in breakers}
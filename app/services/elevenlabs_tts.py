@@ -1,19 +1,31 @@
 import hashlib
+import shutil
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
 from elevenlabs.client import ElevenLabs
 
 from app.config import settings
-from app.logger import logger
+from app.logger import logger, tts_logger
+from app.metrics import TTS_SECONDS
+from app.services import audio_cache, audio_processing
+from app.services.rate_limiter import get_elevenlabs_limiter
+
+# Used when a 429 carries no (or an unparsable) Retry-After header
+DEFAULT_RETRY_AFTER_SECONDS = 1.0
 
 
 class ElevenLabsTTS:
     """TTS using the official ElevenLabs SDK. voice_id can be overridden per-stream."""
 
+    BACKEND_NAME = "elevenlabs"
     OUTPUT_EXT = "mp3"
+    CASE_SENSITIVE = True  # capitals change emphasis
     OUTPUT_FORMAT = "mp3_44100_128"
+    PCM_PREFIX = "pcm_"  # pcm_<sample rate>: raw 16-bit mono little-endian samples
 
     def __init__(self, voice_id: str | None = None):
         self.api_key = settings.ELEVEN_LABS_API_KEY
@@ -25,6 +37,9 @@ class ElevenLabsTTS:
         self.model_id = settings.ELEVEN_LABS_MODEL_ID
         self.cache_dir = settings.CACHE_DIR
         self.output_dir = settings.AUDIO_OUTPUT_DIR
+        self.OUTPUT_FORMAT = settings.ELEVEN_LABS_OUTPUT_FORMAT
+        if self.OUTPUT_FORMAT.startswith(self.PCM_PREFIX):
+            self.OUTPUT_EXT = "wav"
         self._voice_settings = {
             "stability": settings.ELEVEN_LABS_STABILITY,
             "similarity_boost": settings.ELEVEN_LABS_SIMILARITY_BOOST,
@@ -33,6 +48,9 @@ class ElevenLabsTTS:
         }
 
         self._client = ElevenLabs(api_key=self.api_key)
+        self._limiter = get_elevenlabs_limiter(self.api_key)
+        # Per-thread time spent in the API itself, for the circuit breaker
+        self._timing = threading.local()
         logger.info(f"ElevenLabs TTS initialized (voice_id={self.voice_id})")
 
     def generate(
@@ -48,45 +66,104 @@ class ElevenLabsTTS:
             (audio_url, was_cached, generation_time_ms)
         """
         start_time = time.time()
+        self._timing.api_ms = None
 
         if use_cache:
-            cache_key = self._get_cache_key(text)
-            cached_path = self.cache_dir / f"{cache_key}.{self.OUTPUT_EXT}"
-            if cached_path.exists():
+            cached_url = self.cached_url(text)
+            if cached_url:
                 elapsed = (time.time() - start_time) * 1000
-                return f"/static/cache/{cache_key}.{self.OUTPUT_EXT}", True, elapsed
+                TTS_SECONDS.labels(self.BACKEND_NAME, "hit").observe(elapsed / 1000)
+                return cached_url, True, elapsed
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"tts_{username or 'user'}_{timestamp}.{self.OUTPUT_EXT}"
         out_path = self.output_dir / filename
 
-        try:
-            audio = self._client.text_to_speech.convert(
-                voice_id=self.voice_id,
-                text=text,
-                model_id=self.model_id,
-                output_format=self.OUTPUT_FORMAT,
-                voice_settings=self._voice_settings,
-            )
-        except Exception as e:
-            detail = str(e)
-            if hasattr(e, "body") and e.body:
-                detail = getattr(e.body, "message", e.body) or detail
-            raise RuntimeError(f"ElevenLabs API error: {detail}") from e
-
-        content = audio if isinstance(audio, bytes) else b"".join(audio)
+        content = self._convert(text)
+        if self.OUTPUT_FORMAT.startswith(self.PCM_PREFIX):
+            content = self._pcm_to_wav(content)
         out_path.write_bytes(content)
 
         if use_cache:
-            cache_key = self._get_cache_key(text)
-            (self.cache_dir / f"{cache_key}.{self.OUTPUT_EXT}").write_bytes(content)
+            self._cache_path(text).write_bytes(content)
 
         elapsed = (time.time() - start_time) * 1000
-        logger.info(f"ElevenLabs TTS generated in {elapsed:.0f}ms: {filename}")
+        TTS_SECONDS.labels(self.BACKEND_NAME, "miss").observe(elapsed / 1000)
+        tts_logger.info("ElevenLabs TTS generated in %.0fms: %s", elapsed, filename)
 
         return f"/static/audio/{filename}", False, elapsed
 
+    def _convert(self, text: str) -> bytes:
+        """
+        Call the API through the shared per-key limiter.
+        A 429 pauses every stream on this key for Retry-After and, if that still
+        fits in the queue timeout, this request is retried once the pause ends.
+        """
+        deadline = time.monotonic() + settings.ELEVEN_LABS_QUEUE_TIMEOUT_SECONDS
+        self._timing.api_ms = 0.0
+        while True:
+            with self._limiter.acquire(deadline - time.monotonic()):
+                started = time.perf_counter()
+                try:
+                    audio = self._client.text_to_speech.convert(
+                        voice_id=self.voice_id,
+                        text=text,
+                        model_id=self.model_id,
+                        output_format=self.OUTPUT_FORMAT,
+                        voice_settings=self._voice_settings,
+                    )
+                    # The SDK streams the body; read it while holding the slot
+                    return audio if isinstance(audio, bytes) else b"".join(audio)
+                except Exception as e:
+                    error = e
+                finally:
+                    self._timing.api_ms += (time.perf_counter() - started) * 1000
+
+            if getattr(error, "status_code", None) == 429:
+                retry_after = _retry_after_seconds(error)
+                self._limiter.note_retry_after(retry_after)
+                if time.monotonic() + retry_after < deadline:
+                    continue
+
+            detail = str(error)
+            if hasattr(error, "body") and error.body:
+                detail = getattr(error.body, "message", error.body) or detail
+            raise RuntimeError(f"ElevenLabs API error: {detail}") from error
+
+    def api_ms(self) -> float | None:
+        """Time this thread's last generate() spent in API calls, without limiter queueing."""
+        return getattr(self._timing, "api_ms", None)
+
+    def _pcm_to_wav(self, content: bytes) -> bytes:
+        sample_rate = int(self.OUTPUT_FORMAT[len(self.PCM_PREFIX):])
+        pcm = np.frombuffer(content, dtype="<i2", count=len(content) // 2)
+        if audio_processing.enabled():
+            pcm = audio_processing.process(pcm, sample_rate)
+        return audio_processing.to_wav(pcm, sample_rate)
+
+    def cached_url(self, text: str) -> str | None:
+        """URL of the cached clip for text, or None if it hasn't been synthesized yet."""
+        return audio_cache.cached_url(self._cache_path(text))
+
+    def cache_result(self, text: str, audio_url: str):
+        """Copy a clip produced with use_cache=False into the cache."""
+        shutil.copyfile(self.output_dir / Path(audio_url).name, self._cache_path(text))
+
+    def _cache_path(self, text: str) -> Path:
+        return self.cache_dir / f"{self._get_cache_key(text)}.{self.OUTPUT_EXT}"
+
     def _get_cache_key(self, text: str) -> str:
         settings_suffix = "_".join(f"{k}={v}" for k, v in sorted(self._voice_settings.items()))
         content = f"elevenlabs:{self.voice_id}:{settings_suffix}:{text}"
+        if self.OUTPUT_EXT == "wav" and audio_processing.cache_tag():
+            content = f"{audio_processing.cache_tag()}:{content}"
         return hashlib.md5(content.encode()).hexdigest()
+
+
+def _retry_after_seconds(error: Exception) -> float:
+    headers = getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER_SECONDS
@@ -1,12 +1,21 @@
 import asyncio
+import time
 import websockets
 import json
 from typing import Optional
 
 from app.config import settings
 from app.logger import logger
+from app.metrics import KICK_FRAMES, KICK_REST_SECONDS
 from app.events import make_handlers, handle_event
 from app.services.tts import build_tts
+from app.services.tts_scheduler import TTSScheduler
+from app.services.tracing import start_trace
+from app.services.recorder import FrameRecorder
+
+# Backoff between Pusher reconnect attempts (doubles up to the max)
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
 
 
 class KickListener:
@@ -16,6 +25,7 @@ class KickListener:
         stream_id: str,
         tts_backend: str = "piper",
         elevenlabs_voice_id: str | None = None,
+        piper_voice: str | None = None,
         tts_enabled: bool = True,
     ):
         self.channel = channel
@@ -24,16 +34,143 @@ class KickListener:
         self.chatroom_id = None
 
         self.tts_enabled = tts_enabled
-        tts = build_tts(tts_backend, elevenlabs_voice_id) if tts_enabled else None
-        self._handlers = make_handlers(tts, tts_enabled=tts_enabled)
+        self.tts_backend = tts_backend
+        self.elevenlabs_voice_id = elevenlabs_voice_id
+        self.piper_voice = piper_voice
+        # The backend is built in start() so model loading never blocks the event loop
+        self.scheduler = TTSScheduler(stream_id, None)
+        self._handlers = make_handlers(self.scheduler, tts_enabled=tts_enabled)
+        # Bumped by reconfigure() so a slow initial build can't overwrite newer config
+        self._config_version = 0
+        # Why the last backend build failed; the stream keeps running without TTS
+        self.tts_error: str | None = None
+        self._tts_built = asyncio.Event()
+
+        # In-memory counters for /readyz
+        self.connected = False
+        self.frames = 0
+        self.last_frame_at: float | None = None
+        self.reconnects = 0
+        self._frames_metric = KICK_FRAMES.labels(stream_id)
+        self.recorder = FrameRecorder(stream_id) if settings.RECORD_FRAMES else None
 
     async def start(self):
         logger.info(
             f"Connecting to Kick channel: {self.channel} "
             f"(stream_id={self.stream_id})"
         )
-        await self._get_chatroom_id()
-        await self._connect_websocket()
+        if self.recorder is not None:
+            self.recorder.start()
+        try:
+            await self._build_tts()
+            await self._get_chatroom_id()
+            await self._run_websocket()
+        finally:
+            self.connected = False
+            await self.scheduler.stop()
+            if self.recorder is not None:
+                await self.recorder.stop()
+
+    async def _build_tts(self):
+        if not self.tts_enabled:
+            self._tts_built.set()
+            return
+        version = self._config_version
+        try:
+            tts = await asyncio.to_thread(build_tts, self.tts_backend, self.elevenlabs_voice_id, self.piper_voice)
+        except Exception as e:
+            # Keep listening: sounds and stickers still work without a TTS backend
+            logger.error(f"TTS backend unavailable for stream '{self.stream_id}': {e}")
+            if version == self._config_version:
+                self.tts_error = str(e)
+            return
+        finally:
+            self._tts_built.set()
+        if version == self._config_version:
+            self.scheduler.tts = tts
+            self.tts_error = None
+
+    @property
+    def tts_status(self) -> str:
+        """'disabled', 'loading' (backend still being built), 'ready' or 'error' (see tts_error)."""
+        if not self.tts_enabled:
+            return "disabled"
+        if self.scheduler.tts is not None:
+            return "ready"
+        return "error" if self.tts_error else "loading"
+
+    async def wait_for_tts(self, timeout: float):
+        """Wait until the first backend build has finished (or timeout seconds)."""
+        try:
+            await asyncio.wait_for(self._tts_built.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def reconfigure(
+        self,
+        tts_backend: str,
+        elevenlabs_voice_id: str | None,
+        tts_enabled: bool,
+        piper_voice: str | None = None,
+    ):
+        """
+        Swap the TTS backend and flags in place, keeping the Pusher connection.
+        The new backend is built first; if that fails the old config stays active.
+        """
+        tts = None
+        if tts_enabled:
+            tts = await asyncio.to_thread(build_tts, tts_backend, elevenlabs_voice_id, piper_voice)
+
+        # No awaits below: the loop sees either the old config or the new one
+        self._config_version += 1
+        self.tts_backend = tts_backend
+        self.elevenlabs_voice_id = elevenlabs_voice_id
+        self.piper_voice = piper_voice
+        self.tts_enabled = tts_enabled
+        self.scheduler.tts = tts
+        self.tts_error = None
+        self._tts_built.set()
+        self._handlers['App\\Events\\ChatMessageEvent'].tts_enabled = tts_enabled
+        logger.info(
+            f"Reconfigured stream '{self.stream_id}' in place "
+            f"(tts={tts_backend}, enabled={tts_enabled})"
+        )
+
+    async def _run_websocket(self):
+        """Keep the Pusher connection up, reconnecting with exponential backoff when it drops."""
+        delay = RECONNECT_MIN_DELAY
+        while True:
+            connected_at = time.monotonic()
+            try:
+                await self._connect_websocket()
+                logger.warning(f"Kick WebSocket closed for stream '{self.stream_id}'")
+            except (websockets.WebSocketException, OSError, asyncio.TimeoutError) as e:
+                logger.warning(f"Kick WebSocket error for stream '{self.stream_id}': {e}")
+            finally:
+                self.connected = False
+
+            # A connection that stayed up for a while resets the backoff
+            if time.monotonic() - connected_at > RECONNECT_MAX_DELAY:
+                delay = RECONNECT_MIN_DELAY
+            self.reconnects += 1
+            logger.info(f"Reconnecting stream '{self.stream_id}' in {delay:.0f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def stats(self) -> dict:
+        last_frame_age = None
+        if self.last_frame_at is not None:
+            last_frame_age = round(time.monotonic() - self.last_frame_at, 1)
+        return {
+            "channel": self.channel,
+            "connected": self.connected,
+            "frames": self.frames,
+            "last_frame_age_seconds": last_frame_age,
+            "reconnects": self.reconnects,
+            "tts_status": self.tts_status,
+            "tts_error": self.tts_error,
+            "tts_queue": self.scheduler.stats(),
+        }
 
     async def _get_chatroom_id(self):
         import aiohttp
@@ -47,11 +184,13 @@ class KickListener:
         }
 
         async with aiohttp.ClientSession(headers=headers) as session:
-            url = f"https://kick.com/api/v2/channels/{self.channel}"
+            url = f"{settings.KICK_API_URL}/channels/{self.channel}"
             logger.info(f"Fetching channel info from: {url}")
 
+            started = time.perf_counter()
             async with session.get(url) as response:
                 status = response.status
+                KICK_REST_SECONDS.labels("channel", status).observe(time.perf_counter() - started)
                 logger.info(f"API Response Status: {status}")
 
                 if status == 200:
@@ -82,11 +221,17 @@ class KickListener:
             }
             await websocket.send(json.dumps(subscribe_msg))
             logger.info(f"Subscribed to chatrooms.{self.chatroom_id}.v2")
+            self.connected = True
 
             ping_task = asyncio.create_task(self._send_ping(websocket))
 
             try:
                 async for message in websocket:
+                    self.frames += 1
+                    self._frames_metric.inc()
+                    self.last_frame_at = time.monotonic()
+                    if self.recorder is not None:
+                        self.recorder.record(message)
                     try:
                         await self._process_message(message)
                     except Exception as e:
@@ -116,6 +261,8 @@ class KickListener:
         if not event_type.startswith("App\\Events\\"):
             return
 
+        # Current trace for everything this event triggers (see app.services.tracing)
+        start_trace(self.stream_id)
         try:
             event_data = json.loads(data["data"])
             await handle_event(event_type, event_data, self.stream_id, self._handlers)
@@ -0,0 +1,120 @@
+"""
+ONNX Runtime session setup for Piper voices.
+
+PiperVoice.load() always uses default SessionOptions, i.e. one intra-op thread
+per core in every uvicorn worker. Here the session is built from the PIPER_ORT_*
+settings instead and handed to PiperVoice directly.
+
+With PIPER_ORT_OPTIMIZED_MODEL_DIR set, the graph optimized on first load is
+saved there and later loads skip graph optimization. The file name includes
+the source model's size and mtime, the optimization level and the onnxruntime
+version, because an optimized graph is only valid for the runtime (and at the
+"all" level, the CPU) that produced it.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from app.config import settings
+from app.logger import logger
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+EXECUTION_MODES = {"sequential": "ORT_SEQUENTIAL", "parallel": "ORT_PARALLEL"}
+
+
+def session_options(optimize: bool = True):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = settings.PIPER_ORT_INTRA_OP_THREADS
+    options.inter_op_num_threads = settings.PIPER_ORT_INTER_OP_THREADS
+    options.enable_cpu_mem_arena = settings.PIPER_ORT_CPU_MEM_ARENA
+    options.enable_mem_pattern = settings.PIPER_ORT_MEM_PATTERN
+
+    mode = EXECUTION_MODES.get(settings.PIPER_ORT_EXECUTION_MODE.lower())
+    if mode is None:
+        logger.warning(f"Unknown PIPER_ORT_EXECUTION_MODE {settings.PIPER_ORT_EXECUTION_MODE!r}, using sequential")
+        mode = EXECUTION_MODES["sequential"]
+    options.execution_mode = getattr(onnxruntime.ExecutionMode, mode)
+
+    level = GRAPH_OPTIMIZATION_LEVELS["disable"] if not optimize else _optimization_level()
+    options.graph_optimization_level = getattr(onnxruntime.GraphOptimizationLevel, level)
+    return options
+
+
+def options_summary() -> dict:
+    return {
+        "intra_op_threads": settings.PIPER_ORT_INTRA_OP_THREADS or "default",
+        "inter_op_threads": settings.PIPER_ORT_INTER_OP_THREADS or "default",
+        "execution_mode": settings.PIPER_ORT_EXECUTION_MODE,
+        "graph_optimization": settings.PIPER_ORT_GRAPH_OPTIMIZATION,
+        "cpu_mem_arena": settings.PIPER_ORT_CPU_MEM_ARENA,
+        "mem_pattern": settings.PIPER_ORT_MEM_PATTERN,
+        "optimized_model_dir": settings.PIPER_ORT_OPTIMIZED_MODEL_DIR or None,
+    }
+
+
+def create_session(model_path: Path):
+    import onnxruntime
+
+    providers = ["CPUExecutionProvider"]
+    cached = _optimized_model_path(model_path)
+    if cached is None:
+        return onnxruntime.InferenceSession(str(model_path), sess_options=session_options(), providers=providers)
+
+    if cached.exists():
+        try:
+            session = onnxruntime.InferenceSession(
+                str(cached), sess_options=session_options(optimize=False), providers=providers
+            )
+            logger.info(f"Loaded pre-optimized Piper model: {cached.name}")
+            return session
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable optimized model {cached}: {e}")
+            cached.unlink(missing_ok=True)
+
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    options = session_options()
+    # Written next to the final name and renamed, so other workers never see a partial file
+    partial = cached.with_name(f".{cached.name}.{os.getpid()}.tmp")
+    options.optimized_model_filepath = str(partial)
+    session = onnxruntime.InferenceSession(str(model_path), sess_options=options, providers=providers)
+    if partial.exists():
+        os.replace(partial, cached)
+        logger.info(f"Saved optimized Piper model: {cached}")
+    return session
+
+
+def load_voice(model_path: Path):
+    """PiperVoice for model_path (config from <model>.json) using a configured session."""
+    from piper.config import PiperConfig
+    from piper.voice import PiperVoice
+
+    with open(f"{model_path}.json", "r", encoding="utf-8") as config_file:
+        config = PiperConfig.from_dict(json.load(config_file))
+    return PiperVoice(config=config, session=create_session(model_path))
+
+
+def _optimization_level() -> str:
+    level = GRAPH_OPTIMIZATION_LEVELS.get(settings.PIPER_ORT_GRAPH_OPTIMIZATION.lower())
+    if level is None:
+        logger.warning(f"Unknown PIPER_ORT_GRAPH_OPTIMIZATION {settings.PIPER_ORT_GRAPH_OPTIMIZATION!r}, using all")
+        level = GRAPH_OPTIMIZATION_LEVELS["all"]
+    return level
+
+
+def _optimized_model_path(model_path: Path) -> Path | None:
+    if not settings.PIPER_ORT_OPTIMIZED_MODEL_DIR or _optimization_level() == GRAPH_OPTIMIZATION_LEVELS["disable"]:
+        return None
+    import onnxruntime
+
+    stat = model_path.stat()
+    fingerprint = f"{model_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{_optimization_level()}:{onnxruntime.__version__}"
+    digest = hashlib.md5(fingerprint.encode()).hexdigest()[:12]
+    return Path(settings.PIPER_ORT_OPTIMIZED_MODEL_DIR) / f"{model_path.stem}.{digest}.onnx"
@@ -0,0 +1,178 @@
+"""
+Micro-batching in front of a Piper voice (PIPER_BATCH_MAX_SIZE > 1).
+
+Synthesis threads phonemize their text themselves and queue one item per
+sentence. A single batcher thread takes the first waiting sentence, collects
+more for up to PIPER_BATCH_WAIT_MS or until PIPER_BATCH_MAX_SIZE are waiting,
+pads the phoneme ids into one [batch, max_len] input and makes one ONNX
+session run for all of them. Each row of the output is cut to its own length,
+the sum of its phoneme durations (the model's second output) times the hop
+length, and handed back to its caller.
+
+Models exported without the duration output can't be cut exactly, so they
+aren't batched at all (see supports_batching).
+
+Rows are peak-normalized to int16 the same way piper's own synthesize() does,
+so batched and unbatched clips sound alike.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from app.config import settings
+from app.logger import logger
+from app.metrics import (
+    PIPER_BATCH_AUDIO_SECONDS,
+    PIPER_BATCH_SECONDS,
+    PIPER_BATCH_SIZE,
+    PIPER_BATCH_WAIT_SECONDS,
+)
+
+_STOP = object()
+
+
+def supports_batching(voice) -> bool:
+    """True if the voice's model reports per-phoneme durations, so padded rows can be cut exactly."""
+    return len(voice.session.get_outputs()) > 1
+
+
+@dataclass
+class _Sentence:
+    ids: list[int]
+    queued_at: float = field(default_factory=time.perf_counter)
+    future: Future = field(default_factory=Future)
+
+
+class PiperBatcher:
+    def __init__(self, voice, max_size: int | None = None, wait_ms: float | None = None):
+        self._voice = voice
+        self.max_size = max_size or settings.PIPER_BATCH_MAX_SIZE
+        self.wait = (settings.PIPER_BATCH_WAIT_MS if wait_ms is None else wait_ms) / 1000
+
+        config = voice.config
+        self.sample_rate = config.sample_rate
+        self._hop_length = getattr(config, "hop_length", 256)
+        self._pad_id = (getattr(config, "phoneme_id_map", None) or {}).get("_", [0])[0]
+        # piper-tts 1.2 calls it noise_w, later versions noise_w_scale
+        noise_w = getattr(config, "noise_w_scale", None) or getattr(config, "noise_w", 0.8)
+        self._scales = np.array([config.noise_scale, config.length_scale, noise_w], dtype=np.float32)
+        self._speaker_id = getattr(config, "default_speaker_id", 0) if config.num_speakers > 1 else None
+
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        # Held while queueing, so nothing lands behind the stop marker
+        self._queue_lock = threading.Lock()
+        self.closed = False
+        self._thread = threading.Thread(target=self._run, name="piper-batcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Piper micro-batching on (max {self.max_size} sentences, {self.wait * 1000:g}ms wait)")
+
+    def synthesize(self, text: str) -> np.ndarray | None:
+        """
+        int16 samples for text; blocks the calling thread until every sentence is done.
+        Returns None once the batcher is closed, so the caller synthesizes directly.
+        """
+        sentences = [
+            _Sentence(self._voice.phonemes_to_ids(phonemes))
+            for phonemes in self._voice.phonemize(text)
+            if phonemes
+        ]
+        with self._queue_lock:
+            if self.closed:
+                return None
+            for sentence in sentences:
+                self._queue.put(sentence)
+        chunks = [sentence.future.result() for sentence in sentences]
+        if not chunks:
+            return np.zeros(0, dtype=np.int16)
+        return chunks[0] if len(chunks) == 1 else np.concatenate(chunks)
+
+    def close(self):
+        """Finish what is already queued, then stop the thread."""
+        with self._queue_lock:
+            if not self.closed:
+                self.closed = True
+                self._queue.put(_STOP)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.wait
+            while len(batch) < self.max_size:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                for sentence in batch:
+                    if not sentence.future.done():
+                        sentence.future.set_exception(e)
+
+    def _run_batch(self, batch: list[_Sentence]):
+        started = time.perf_counter()
+        lengths = np.array([len(s.ids) for s in batch], dtype=np.int64)
+        ids = np.full((len(batch), int(lengths.max())), self._pad_id, dtype=np.int64)
+        for row, sentence in enumerate(batch):
+            ids[row, :len(sentence.ids)] = sentence.ids
+            PIPER_BATCH_WAIT_SECONDS.observe(started - sentence.queued_at)
+
+        args = {"input": ids, "input_lengths": lengths, "scales": self._scales}
+        if self._speaker_id is not None:
+            args["sid"] = np.full(len(batch), self._speaker_id, dtype=np.int64)
+        result = self._voice.session.run(None, args)
+
+        audio = result[0].reshape(len(batch), -1)
+        durations = result[1].reshape(len(batch), -1)
+        produced = 0
+        for row, sentence in enumerate(batch):
+            n = int(durations[row, :lengths[row]].sum() * self._hop_length)
+            pcm = _to_int16(audio[row, :n])
+            produced += len(pcm)
+            sentence.future.set_result(pcm)
+
+        PIPER_BATCH_SIZE.observe(len(batch))
+        PIPER_BATCH_SECONDS.observe(time.perf_counter() - started)
+        PIPER_BATCH_AUDIO_SECONDS.inc(produced / self.sample_rate)
+
+
+def _to_int16(audio: np.ndarray) -> np.ndarray:
+    peak = float(np.abs(audio).max()) if len(audio) else 0.0
+    if peak < 1e-8:
+        return np.zeros(len(audio), dtype=np.int16)
+    scaled = np.multiply(audio, 32767 / peak, dtype=np.float32)
+    np.clip(scaled, -32767, 32767, out=scaled)
+    return scaled.astype(np.int16)
+
+
+def batch_snapshot() -> dict:
+    """Batching counters: batch sizes, queueing delay and inference throughput."""
+    sizes = PIPER_BATCH_SIZE.labels()
+    inference = PIPER_BATCH_SECONDS.labels()
+    waits = PIPER_BATCH_WAIT_SECONDS.labels()
+    audio_seconds = PIPER_BATCH_AUDIO_SECONDS.value()
+    return {
+        "max_size": settings.PIPER_BATCH_MAX_SIZE,
+        "wait_ms": settings.PIPER_BATCH_WAIT_MS,
+        "batches": sizes.count,
+        "sentences": int(sizes.sum),
+        "mean_batch_size": round(sizes.sum / sizes.count, 2) if sizes.count else None,
+        "mean_wait_ms": round(waits.sum / waits.count * 1000, 2) if waits.count else None,
+        "mean_inference_ms": round(inference.sum / inference.count * 1000, 1) if inference.count else None,
+        "sentences_per_inference_second": round(sizes.sum / inference.sum, 1) if inference.sum else None,
+        # Seconds of audio per second of inference (inverse real-time factor)
+        "audio_speedup": round(audio_seconds / inference.sum, 1) if inference.sum else None,
+    }
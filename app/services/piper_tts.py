@@ -1,34 +1,65 @@
 import hashlib
-import io
+import itertools
+import shutil
+import threading
 import time
-import wave
 from datetime import datetime
 from pathlib import Path
 
+import numpy as np
+
 from app.config import settings
-from app.logger import logger
+from app.logger import logger, tts_logger
+from app.metrics import PIPER_REALTIME_FACTOR, TTS_SECONDS
+from app.services import audio_cache, audio_processing
+from app.services.onnx_session import load_voice, options_summary
+from app.services.piper_batcher import PiperBatcher, supports_batching
+
+# Keeps output names unique when one user's messages are synthesized concurrently
+_file_seq = itertools.count()
 
 
 class PiperTTS:
     """Local TTS using Piper — no API key, no cost, runs entirely on-device."""
 
+    BACKEND_NAME = "piper"
     OUTPUT_EXT = "wav"
+    CASE_SENSITIVE = False  # espeak phonemizes "HOLA" and "hola" alike
+    voice_name: str | None = None  # None for PIPER_MODEL; other voices get their own cache keys
 
-    def __init__(self):
-        from piper.voice import PiperVoice
-
-        model_path = Path(settings.PIPER_MODEL)
+    def __init__(self, model_path: Path | None = None, voice_name: str | None = None):
+        model_path = Path(model_path or settings.PIPER_MODEL)
         if not model_path.exists():
             raise FileNotFoundError(
                 f"Piper model not found: {model_path}. "
                 "Download it and set PIPER_MODEL in .env"
             )
 
-        self._voice = PiperVoice.load(str(model_path))
+        self.voice_name = voice_name
+        self.model_bytes = model_path.stat().st_size
+        self._voice = load_voice(model_path)
+        self._batcher = None
+        if settings.PIPER_BATCH_MAX_SIZE > 1:
+            if supports_batching(self._voice):
+                self._batcher = PiperBatcher(self._voice)
+            else:
+                logger.warning(f"{model_path.name} has no duration output, Piper micro-batching disabled for it")
         self.cache_dir = settings.CACHE_DIR
         self.output_dir = settings.AUDIO_OUTPUT_DIR
         logger.info(f"Piper TTS loaded: {model_path.name}")
 
+    @property
+    def concurrency(self) -> int:
+        """Jobs worth synthesizing at once: the batch size while batching, else 1."""
+        if self._batcher is None or self._batcher.closed:
+            return 1
+        return self._batcher.max_size
+
+    def close(self):
+        """Stop the batcher thread so an evicted voice can be freed."""
+        if self._batcher is not None:
+            self._batcher.close()
+
     def generate(
         self,
         text: str,
@@ -44,58 +75,123 @@ class PiperTTS:
         start_time = time.time()
 
         if use_cache:
-            cache_key = self._get_cache_key(text)
-            cached_path = self.cache_dir / f"{cache_key}.{self.OUTPUT_EXT}"
-            if cached_path.exists():
+            cached_url = self.cached_url(text)
+            if cached_url:
                 elapsed = (time.time() - start_time) * 1000
-                return f"/static/cache/{cache_key}.{self.OUTPUT_EXT}", True, elapsed
+                TTS_SECONDS.labels(self.BACKEND_NAME, "hit").observe(elapsed / 1000)
+                return cached_url, True, elapsed
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"tts_{username or 'user'}_{timestamp}.{self.OUTPUT_EXT}"
+        filename = f"tts_{username or 'user'}_{timestamp}_{next(_file_seq)}.{self.OUTPUT_EXT}"
         out_path = self.output_dir / filename
 
         audio_bytes = self._synthesize(text)
         out_path.write_bytes(audio_bytes)
 
         if use_cache:
-            cache_key = self._get_cache_key(text)
-            (self.cache_dir / f"{cache_key}.{self.OUTPUT_EXT}").write_bytes(audio_bytes)
+            self._cache_path(text).write_bytes(audio_bytes)
 
         elapsed = (time.time() - start_time) * 1000
-        logger.info(f"Piper TTS generated in {elapsed:.0f}ms: {filename}")
+        TTS_SECONDS.labels(self.BACKEND_NAME, "miss").observe(elapsed / 1000)
+        tts_logger.info("Piper TTS generated in %.0fms: %s", elapsed, filename)
 
         return f"/static/audio/{filename}", False, elapsed
 
+    def warm_up(self, text: str):
+        """Run one throwaway inference so ONNX Runtime's first-run graph optimization happens now."""
+        self._synthesize(text)
+
+    def benchmark(self, texts: list[str], runs: int) -> dict:
+        """Real-time factor (synthesis time / audio duration) over runs passes of texts."""
+        synthesis_seconds = 0.0
+        audio_seconds = 0.0
+        for _ in range(runs):
+            for text in texts:
+                started = time.perf_counter()
+                pcm, sample_rate = self._synthesize_pcm(text)
+                synthesis_seconds += time.perf_counter() - started
+                audio_seconds += len(pcm) / sample_rate
+        rtf = synthesis_seconds / audio_seconds if audio_seconds else None
+        if rtf is not None:
+            PIPER_REALTIME_FACTOR.set(rtf)
+        return {
+            "runs": runs,
+            "audio_seconds": round(audio_seconds, 2),
+            "synthesis_seconds": round(synthesis_seconds, 3),
+            "realtime_factor": round(rtf, 4) if rtf is not None else None,
+            "session": options_summary(),
+        }
+
     def _synthesize(self, text: str) -> bytes:
-        buf = io.BytesIO()
-        with wave.open(buf, "wb") as wav_file:
-            # Piper necesita que el header WAV tenga canales, sample width y sample rate
-            sample_rate = getattr(self._voice, "sample_rate", 22050)
-            sample_width = getattr(self._voice, "sample_width", 2)
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(sample_width)
-            wav_file.setframerate(sample_rate)
-            self._voice.synthesize(text, wav_file)
-        return buf.getvalue()
+        pcm, sample_rate = self._synthesize_pcm(text)
+        if audio_processing.enabled():
+            pcm = audio_processing.process(pcm, sample_rate)
+        return audio_processing.to_wav(pcm, sample_rate)
+
+    def _synthesize_pcm(self, text: str) -> tuple[np.ndarray, int]:
+        """Raw int16 samples and their sample rate."""
+        sample_rate = self._voice.config.sample_rate
+        if self._batcher is not None:
+            pcm = self._batcher.synthesize(text)
+            if pcm is not None:
+                return pcm, sample_rate
+        if not hasattr(self._voice, "synthesize_wav"):
+            # piper-tts 1.2: synthesize() writes a WAV, raw PCM comes from synthesize_stream_raw()
+            raw = b"".join(self._voice.synthesize_stream_raw(text))
+            return np.frombuffer(raw, dtype="<i2"), sample_rate
+
+        # piper-tts >= 1.3: synthesize() yields one AudioChunk per sentence
+        chunks = [chunk.audio_int16_array for chunk in self._voice.synthesize(text)]
+        if not chunks:
+            return np.zeros(0, dtype=np.int16), sample_rate
+        return (chunks[0] if len(chunks) == 1 else np.concatenate(chunks)), sample_rate
+
+    def cached_url(self, text: str) -> str | None:
+        """URL of the cached clip for text, or None if it hasn't been synthesized yet."""
+        return audio_cache.cached_url(self._cache_path(text))
+
+    def cache_result(self, text: str, audio_url: str):
+        """Copy a clip produced with use_cache=False into the cache."""
+        shutil.copyfile(self.output_dir / Path(audio_url).name, self._cache_path(text))
+
+    def _cache_path(self, text: str) -> Path:
+        return self.cache_dir / f"{self._get_cache_key(text)}.{self.OUTPUT_EXT}"
 
     def _get_cache_key(self, text: str) -> str:
-        return hashlib.md5(f"piper:{text}".encode()).hexdigest()
+        return piper_cache_key(text, self.voice_name)
+
+
+def piper_cache_key(text: str, voice_name: str | None = None) -> str:
+    prefix = f"piper:{voice_name}" if voice_name else "piper"
+    tag = audio_processing.cache_tag()
+    content = f"{prefix}:{tag}:{text}" if tag else f"{prefix}:{text}"
+    return hashlib.md5(content.encode()).hexdigest()
 
 
 _piper_instance: PiperTTS | None = None
 _piper_unavailable: bool = False
+# Warm-up and listeners may ask for the model from several threads at once
+_piper_lock = threading.Lock()
+
+
+def loaded_piper_tts() -> PiperTTS | None:
+    """The default voice if it has been loaded already; never triggers a load."""
+    return _piper_instance
 
 
 def get_piper_tts() -> PiperTTS | None:
     """Returns the Piper TTS instance, or None if the model file is not available."""
     global _piper_instance, _piper_unavailable
-    if _piper_unavailable:
-        return None
-    if _piper_instance is None:
-        try:
-            _piper_instance = PiperTTS()
-        except (FileNotFoundError, Exception) as e:
-            logger.warning(f"Piper TTS unavailable: {e}")
-            _piper_unavailable = True
+    if _piper_instance is not None:
+        return _piper_instance
+    with _piper_lock:
+        if _piper_unavailable:
             return None
-    return _piper_instance
+        if _piper_instance is None:
+            try:
+                _piper_instance = PiperTTS()
+            except (FileNotFoundError, Exception) as e:
+                logger.warning(f"Piper TTS unavailable: {e}")
+                _piper_unavailable = True
+                return None
+        return _piper_instance
@@ -0,0 +1,235 @@
+"""
+Per-stream Piper voices.
+
+A stream's piper_voice names a model in PIPER_VOICES_DIR (<name>.onnx plus its
+.onnx.json). It comes from the streams API, so anything that would resolve
+outside that directory ("../x", "/abs/path.onnx") is rejected rather than
+loaded. Streams get a PiperVoiceTTS handle; the
+model behind it is loaded on first use by the shared PiperVoiceManager and
+kept in an LRU. When the estimated size of the loaded voices exceeds
+PIPER_VOICE_MEMORY_MB the least recently used one is dropped (the default
+PIPER_MODEL voice is never dropped) and reloaded when it is next needed.
+Voices in flight keep working: eviction only drops the manager's reference.
+
+At warm-up the PIPER_PRELOAD_VOICES voices used by the most streams are
+loaded ahead of their first message.
+
+The budget is per worker process: onnxruntime's Python API copies model bytes
+into each session, so weights can't be shared between workers through mmap.
+Keep the budget (times WORKERS) within the box's RAM.
+"""
+import os
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+
+from app.config import settings
+from app.logger import logger
+from app.metrics import TTS_SECONDS
+from app.services import audio_cache
+from app.services.piper_tts import PiperTTS, get_piper_tts, loaded_piper_tts, piper_cache_key
+
+# Loaded session size relative to the .onnx file (weights plus optimized graph and arena)
+MEMORY_PER_MODEL_BYTE = 2.0
+
+
+def resolve_voice(voice: str | None) -> Path | None:
+    """
+    Model path for a piper_voice value; empty means PIPER_MODEL.
+    None when the value points outside PIPER_VOICES_DIR.
+    """
+    if not voice:
+        return Path(settings.PIPER_MODEL)
+    directory = os.path.abspath(settings.PIPER_VOICES_DIR)
+    name = voice if voice.endswith(".onnx") else f"{voice}.onnx"
+    # normpath, not resolve(): ".." and absolute values are rejected, symlinks the admin put in the dir are kept
+    path = os.path.normpath(os.path.join(directory, name))
+    if os.path.dirname(path) != directory:
+        return None
+    return Path(path)
+
+
+def is_default_voice(voice: str | None) -> bool:
+    if not voice:
+        return True
+    path = resolve_voice(voice)
+    return path is not None and path.resolve() == Path(settings.PIPER_MODEL).resolve()
+
+
+def voice_exists(voice: str | None) -> bool:
+    path = resolve_voice(voice)
+    return path is not None and path.exists()
+
+
+def available_voices() -> list[str]:
+    directory = Path(settings.PIPER_VOICES_DIR)
+    if not directory.is_dir():
+        return []
+    return sorted(p.stem for p in directory.glob("*.onnx") if Path(f"{p}.json").exists())
+
+
+class PiperVoiceManager:
+    def __init__(self):
+        self._loaded: OrderedDict[str, PiperTTS] = OrderedDict()
+        self._lock = threading.Lock()
+        # One lock per voice, so a slow load doesn't hold up voices already loaded
+        self._load_locks: dict[str, threading.Lock] = {}
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, voice: str | None) -> PiperTTS:
+        """Loaded PiperTTS for voice; raises FileNotFoundError if the model is missing."""
+        if is_default_voice(voice):
+            piper = get_piper_tts()
+            if piper is None:
+                raise FileNotFoundError(f"Piper model not found: {settings.PIPER_MODEL}")
+            return piper
+        if resolve_voice(voice) is None:
+            raise FileNotFoundError(f"Piper voice '{voice}' is not in {settings.PIPER_VOICES_DIR}")
+
+        key = voice_key(voice)
+        with self._lock:
+            piper = self._loaded.get(key)
+            if piper is not None:
+                self._loaded.move_to_end(key)
+                return piper
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                piper = self._loaded.get(key)
+            if piper is None:
+                piper = PiperTTS(resolve_voice(voice), voice_name=key)
+                with self._lock:
+                    self._loaded[key] = piper
+                    self.loads += 1
+                    self._evict(keep=key)
+        return piper
+
+    def preload(self, streams: list[dict], warm_up_text: str | None = None) -> list[str]:
+        """Load (and warm up) the voices used by the most TTS-enabled streams, within the memory budget."""
+        usage = Counter(
+            s["piper_voice"]
+            for s in streams
+            if s.get("piper_voice") and s.get("tts_enabled", 1) == 1 and not is_default_voice(s["piper_voice"])
+        )
+        budget = settings.PIPER_VOICE_MEMORY_MB * 1024 * 1024
+        loaded = []
+        for voice, _ in usage.most_common(settings.PIPER_PRELOAD_VOICES):
+            path = resolve_voice(voice)
+            if path is None or not path.exists():
+                logger.warning(f"Not preloading Piper voice '{voice}': not found in {settings.PIPER_VOICES_DIR}")
+                continue
+            if budget and self.memory_bytes() + _estimated_bytes(path.stat().st_size) > budget:
+                break
+            try:
+                piper = self.get(voice)
+                if warm_up_text:
+                    piper.warm_up(warm_up_text)
+            except Exception as e:
+                logger.warning(f"Could not preload Piper voice '{voice}': {e}")
+                continue
+            loaded.append(voice)
+        return loaded
+
+    def loaded(self, voice: str | None) -> PiperTTS | None:
+        """The voice's PiperTTS if it is loaded right now; never loads it."""
+        if is_default_voice(voice):
+            return loaded_piper_tts()
+        with self._lock:
+            return self._loaded.get(voice_key(voice))
+
+    def memory_bytes(self) -> int:
+        with self._lock:
+            voices = list(self._loaded.values())
+        default = loaded_piper_tts()
+        if default is not None:
+            voices.append(default)
+        return sum(_estimated_bytes(v.model_bytes) for v in voices)
+
+    def _evict(self, keep: str):
+        """Drop least recently used voices until under budget. Called with _lock held."""
+        budget = settings.PIPER_VOICE_MEMORY_MB * 1024 * 1024
+        if not budget:
+            return
+        default = loaded_piper_tts()
+        used = sum(_estimated_bytes(v.model_bytes) for v in self._loaded.values())
+        used += _estimated_bytes(default.model_bytes) if default is not None else 0
+        for key in list(self._loaded):
+            if used <= budget:
+                break
+            if key == keep:
+                continue
+            piper = self._loaded.pop(key)
+            piper.close()
+            used -= _estimated_bytes(piper.model_bytes)
+            self.evictions += 1
+            logger.info(f"Evicted Piper voice '{key}' (over PIPER_VOICE_MEMORY_MB)")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            loaded = list(self._loaded)
+        return {
+            "loaded": loaded,
+            "memory_mb": round(self.memory_bytes() / 1024 / 1024, 1),
+            "budget_mb": settings.PIPER_VOICE_MEMORY_MB or None,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+
+class PiperVoiceTTS:
+    """A stream's Piper backend for a non-default voice; the model is fetched from the manager per call."""
+
+    BACKEND_NAME = "piper"
+    OUTPUT_EXT = "wav"
+    CASE_SENSITIVE = False
+
+    def __init__(self, voice: str):
+        self.voice = voice
+        self.voice_name = voice_key(voice)
+        self.cache_dir = settings.CACHE_DIR
+        self.output_dir = settings.AUDIO_OUTPUT_DIR
+
+    def generate(self, text: str, username: str = None, use_cache: bool = True) -> tuple[str, bool, float]:
+        start_time = time.time()
+        if use_cache:
+            # Cache hits never need the model loaded
+            cached_url = self.cached_url(text)
+            if cached_url:
+                elapsed = (time.time() - start_time) * 1000
+                TTS_SECONDS.labels(self.BACKEND_NAME, "hit").observe(elapsed / 1000)
+                return cached_url, True, elapsed
+        return piper_voices.get(self.voice).generate(text, username, use_cache)
+
+    @property
+    def concurrency(self) -> int:
+        piper = piper_voices.loaded(self.voice)
+        return piper.concurrency if piper is not None else 1
+
+    def warm_up(self, text: str):
+        piper_voices.get(self.voice).warm_up(text)
+
+    def cached_url(self, text: str) -> str | None:
+        return audio_cache.cached_url(self._cache_path(text))
+
+    def cache_result(self, text: str, audio_url: str):
+        shutil.copyfile(self.output_dir / Path(audio_url).name, self._cache_path(text))
+
+    def _cache_path(self, text: str) -> Path:
+        return self.cache_dir / f"{piper_cache_key(text, self.voice_name)}.{self.OUTPUT_EXT}"
+
+
+def voice_key(voice: str) -> str:
+    """Stable name for a voice: the model file's stem."""
+    path = resolve_voice(voice)
+    return path.stem if path is not None else voice
+
+
+def _estimated_bytes(model_bytes: int) -> int:
+    return int(model_bytes * MEMORY_PER_MODEL_BYTE)
+
+
+piper_voices = PiperVoiceManager()
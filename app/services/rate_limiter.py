@@ -0,0 +1,242 @@
+"""
+Shared rate and concurrency limiter for external TTS APIs.
+
+One limiter exists per API key, shared by every stream in the process, so a
+burst across several channels can't fan out into 429s. Callers block briefly
+(up to a timeout) for a token and a concurrency slot instead of failing. When
+the API answers 429, note_retry_after() pauses every caller on that key until
+the Retry-After delay has passed.
+
+With ENABLE_REDIS_CACHE the same limits are also enforced cluster-wide through
+Redis: a per-second request counter, an in-flight counter and a shared
+Retry-After pause. If Redis is unavailable the limiter falls back to the local
+limits only.
+"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from app.config import settings
+from app.logger import logger
+from app.metrics import (
+    RATE_LIMIT_REJECTIONS,
+    RATE_LIMIT_THROTTLED,
+    RATE_LIMIT_WAITS,
+    RATE_LIMIT_WAIT_SECONDS,
+)
+from app.services.cache_service import get_cache_service
+
+# Redis keys expire so a crashed worker can't leak in-flight slots forever
+_REDIS_SLOT_TTL = 60
+
+
+class RateLimitExceeded(RuntimeError):
+    """Raised when no slot became available within the queue timeout."""
+
+
+class APIRateLimiter:
+    """Token bucket + concurrency cap for a single API key (thread-safe)."""
+
+    def __init__(self, name: str, key_id: str, rate: float, burst: int, max_concurrency: int):
+        self.name = name
+        self.key_id = key_id
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.rejections = 0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        else:
+            self._tokens = float(self.burst)
+        self._refilled_at = now
+
+    @contextmanager
+    def acquire(self, timeout: float):
+        """Hold one request slot for the duration of the block."""
+        start = time.monotonic()
+        deadline = start + timeout
+        self._acquire_local(deadline)
+        try:
+            self._acquire_cluster(deadline)
+        except RateLimitExceeded:
+            self._release_local()
+            raise
+        waited = time.monotonic() - start
+        if waited > 0.001:
+            with self._cond:
+                self.waits += 1
+                self.wait_seconds += waited
+            RATE_LIMIT_WAITS.labels(self.name).inc()
+            RATE_LIMIT_WAIT_SECONDS.labels(self.name).inc(waited)
+        try:
+            yield
+        finally:
+            self._release_cluster()
+            self._release_local()
+
+    def _acquire_local(self, deadline: float):
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    delay = self._paused_until - now
+                elif self._in_flight >= self.max_concurrency:
+                    delay = None  # woken by a release
+                elif self._tokens < 1:
+                    delay = (1 - self._tokens) / self.rate
+                else:
+                    self._tokens -= 1
+                    self._in_flight += 1
+                    return
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self.rejections += 1
+                    RATE_LIMIT_REJECTIONS.labels(self.name).inc()
+                    raise RateLimitExceeded(f"{self.name} rate limit: no slot within queue timeout")
+                self._cond.wait(remaining if delay is None else min(delay, remaining))
+
+    def _release_local(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+
+    def note_retry_after(self, seconds: float):
+        """Pause every caller on this key (and cluster-wide, if shared) for `seconds`."""
+        with self._cond:
+            self.throttled += 1
+            RATE_LIMIT_THROTTLED.labels(self.name).inc()
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        client = _redis()
+        if client is not None:
+            try:
+                client.set(self._redis_key("paused"), "1", px=int(seconds * 1000))
+            except Exception as e:
+                logger.warning(f"Redis rate limiter error: {e}")
+        logger.warning(f"{self.name} returned 429, pausing requests for {seconds:.1f}s")
+
+    # --- cluster-wide limits (Redis) ---
+
+    def _redis_key(self, suffix: str) -> str:
+        return f"ratelimit:{self.name}:{self.key_id}:{suffix}"
+
+    def _acquire_cluster(self, deadline: float):
+        client = _redis()
+        if client is None:
+            return
+        try:
+            while True:
+                delay = self._cluster_delay(client)
+                if delay <= 0:
+                    return
+                if time.monotonic() + delay > deadline:
+                    with self._cond:
+                        self.rejections += 1
+                    RATE_LIMIT_REJECTIONS.labels(self.name).inc()
+                    raise RateLimitExceeded(f"{self.name} cluster rate limit: no slot within queue timeout")
+                time.sleep(delay)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.warning(f"Redis rate limiter error, using local limits only: {e}")
+
+    def _cluster_delay(self, client) -> float:
+        """
+        Try to take a cluster-wide slot; returns 0 on success or seconds to wait.
+        Increments made by an attempt that isn't admitted are taken back, so the
+        per-second window only counts requests that actually went out.
+        """
+        paused_ms = client.pttl(self._redis_key("paused"))
+        if paused_ms and paused_ms > 0:
+            return paused_ms / 1000
+
+        slots_key = self._redis_key("in_flight")
+        pipe = client.pipeline()
+        pipe.incr(slots_key)
+        pipe.expire(slots_key, _REDIS_SLOT_TTL)
+        in_flight, _ = pipe.execute()
+        if in_flight > self.max_concurrency:
+            client.decr(slots_key)
+            return 0.05
+
+        if self.rate > 0:
+            second = int(time.time())
+            window_key = self._redis_key(f"window:{second}")
+            pipe = client.pipeline()
+            pipe.incr(window_key)
+            pipe.expire(window_key, 2)
+            count, _ = pipe.execute()
+            if count > max(self.rate, 1):
+                pipe = client.pipeline()
+                pipe.decr(window_key)
+                pipe.decr(slots_key)
+                pipe.execute()
+                return (second + 1) - time.time()
+        return 0
+
+    def _release_cluster(self):
+        client = _redis()
+        if client is None:
+            return
+        try:
+            client.decr(self._redis_key("in_flight"))
+        except Exception as e:
+            logger.warning(f"Redis rate limiter error: {e}")
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            paused_for = max(0.0, self._paused_until - time.monotonic())
+            return {
+                "in_flight": self._in_flight,
+                "tokens": round(self._tokens, 2),
+                "paused_for_seconds": round(paused_for, 2),
+                "waits": self.waits,
+                "wait_seconds_total": round(self.wait_seconds, 3),
+                "rejections": self.rejections,
+                "throttled_429": self.throttled,
+            }
+
+
+def _redis():
+    cache = get_cache_service()
+    return cache.redis_client if cache.enabled else None
+
+
+_limiters: dict[tuple[str, str], APIRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_elevenlabs_limiter(api_key: str) -> APIRateLimiter:
+    key_id = hashlib.sha256(api_key.encode()).hexdigest()[:12]
+    with _limiters_lock:
+        limiter = _limiters.get(("elevenlabs", key_id))
+        if limiter is None:
+            limiter = APIRateLimiter(
+                "elevenlabs",
+                key_id,
+                rate=settings.ELEVEN_LABS_RATE_PER_SECOND,
+                burst=settings.ELEVEN_LABS_BURST,
+                max_concurrency=settings.ELEVEN_LABS_MAX_CONCURRENCY,
+            )
+            _limiters[("elevenlabs", key_id)] = limiter
+        return limiter
+
+
+def limiter_snapshot() -> dict:
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {f"{l.name}:{l.key_id}": l.snapshot() for l in limiters}
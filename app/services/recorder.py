@@ -0,0 +1,126 @@
+"""
+Optional recorder for raw Pusher frames (RECORD_FRAMES=true).
+
+Each stream writes gzip-compressed JSON lines to
+RECORD_DIR/<stream_id>/frames-<timestamp>.jsonl.gz:
+
+    {"t": <time.monotonic()>, "wall": <time.time()>, "frame": "<raw frame text>"}
+
+The listener only appends to an in-memory buffer; a background task hands the
+buffer to a worker thread once a second for compression and writing. Files
+rotate after RECORD_ROTATE_MB of uncompressed frames and only the newest
+RECORD_KEEP_FILES per stream are kept. bench/replay.py plays them back.
+"""
+import asyncio
+import gzip
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.config import settings
+from app.logger import logger
+
+FLUSH_INTERVAL_SECONDS = 1.0
+
+
+class FrameRecorder:
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+        self.directory = settings.RECORD_DIR / stream_id
+        self._buffer: list[tuple[float, float, str]] = []
+        self._file: gzip.GzipFile | None = None
+        self._file_bytes = 0
+        # stop() may run while a cancelled flush is still writing in its thread
+        self._write_lock = threading.Lock()
+        self._task: asyncio.Task | None = None
+        self.frames = 0
+
+    def start(self):
+        if self._task is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._task = asyncio.create_task(self._run(), name=f"recorder-{self.stream_id}")
+            logger.info(f"Recording raw frames for stream '{self.stream_id}' to {self.directory}")
+
+    def record(self, frame: str):
+        self._buffer.append((time.monotonic(), time.time(), frame))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await asyncio.to_thread(self._flush_and_close)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+            if self._buffer:
+                batch, self._buffer = self._buffer, []
+                try:
+                    await asyncio.to_thread(self._write, batch)
+                except Exception as e:
+                    logger.warning(f"Frame recorder for stream '{self.stream_id}' failed to write: {e}")
+
+    def _flush_and_close(self):
+        batch, self._buffer = self._buffer, []
+        if batch:
+            self._write(batch)
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write(self, batch: list[tuple[float, float, str]]):
+        data = "".join(
+            json.dumps({"t": t, "wall": wall, "frame": frame}, ensure_ascii=False) + "\n"
+            for t, wall, frame in batch
+        ).encode("utf-8")
+        with self._write_lock:
+            self._write_locked(data, len(batch))
+
+    def _write_locked(self, data: bytes, frames: int):
+        if self._file is None or self._file_bytes >= settings.RECORD_ROTATE_MB * 1024 * 1024:
+            self._rotate()
+        self._file.write(data)
+        # Sync flush: a crash loses at most the last batch and the file stays readable
+        self._file.flush()
+        self._file_bytes += len(data)
+        self.frames += frames
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+        name = f"frames-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.jsonl.gz"
+        self._file = gzip.open(self.directory / name, "wb")
+        self._file_bytes = 0
+
+        keep = settings.RECORD_KEEP_FILES
+        if keep > 0:
+            recordings = sorted(self.directory.glob("frames-*.jsonl.gz"))
+            for old in recordings[:-keep]:
+                old.unlink(missing_ok=True)
+
+
+def read_frames(paths):
+    """Yield (t, frame) from recording files in order; accepts files or stream directories."""
+    files = []
+    for path in map(Path, paths):
+        files.extend(sorted(path.glob("frames-*.jsonl.gz")) if path.is_dir() else [path])
+    for file in files:
+        try:
+            with gzip.open(file, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # truncated last line
+                    yield entry["t"], entry["frame"]
+        except EOFError:
+            pass  # file still being written (or the process died): keep what was flushed
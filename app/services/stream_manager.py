@@ -3,6 +3,7 @@ from typing import Dict
 
 from app.services.kick_listener import KickListener
 from app.logger import logger
+from app.metrics import CallbackGauge
 
 
 class StreamManager:
@@ -10,6 +11,7 @@ class StreamManager:
 
     def __init__(self):
         self._tasks: Dict[str, asyncio.Task] = {}
+        self._listeners: Dict[str, KickListener] = {}
 
     async def start_all(self, streams: list[dict]):
         for stream in streams:
@@ -18,6 +20,7 @@ class StreamManager:
                 stream["channel"],
                 tts_backend=stream.get("tts_backend", "elevenlabs"),
                 elevenlabs_voice_id=stream.get("elevenlabs_voice_id"),
+                piper_voice=stream.get("piper_voice"),
                 tts_enabled=stream.get("tts_enabled", 1) == 1,
             )
 
@@ -27,6 +30,7 @@ class StreamManager:
         channel: str,
         tts_backend: str = "elevenlabs",
         elevenlabs_voice_id: str | None = None,
+        piper_voice: str | None = None,
         tts_enabled: bool = True,
     ):
         existing = self._tasks.get(stream_id)
@@ -39,17 +43,39 @@ class StreamManager:
             stream_id=stream_id,
             tts_backend=tts_backend,
             elevenlabs_voice_id=elevenlabs_voice_id,
+            piper_voice=piper_voice,
             tts_enabled=tts_enabled,
         )
         task = asyncio.create_task(listener.start(), name=f"kick-{stream_id}")
         self._tasks[stream_id] = task
+        self._listeners[stream_id] = listener
         logger.info(
             f"Started listener for stream '{stream_id}' → channel '{channel}' "
             f"(tts={tts_backend})"
         )
 
+    async def reconfigure_stream(
+        self,
+        stream_id: str,
+        tts_backend: str = "elevenlabs",
+        elevenlabs_voice_id: str | None = None,
+        piper_voice: str | None = None,
+        tts_enabled: bool = True,
+    ) -> bool:
+        """
+        Apply new TTS settings to a running listener without reconnecting.
+        Returns False if there is no running listener to update.
+        """
+        task = self._tasks.get(stream_id)
+        listener = self._listeners.get(stream_id)
+        if listener is None or task is None or task.done():
+            return False
+        await listener.reconfigure(tts_backend, elevenlabs_voice_id, tts_enabled, piper_voice=piper_voice)
+        return True
+
     async def stop_stream(self, stream_id: str):
         task = self._tasks.pop(stream_id, None)
+        self._listeners.pop(stream_id, None)
         if task and not task.done():
             task.cancel()
             try:
@@ -58,8 +84,40 @@ class StreamManager:
                 pass
             logger.info(f"Stopped listener for stream '{stream_id}'")
 
+    def tts_status(self, stream_id: str) -> dict:
+        """The listener's TTS backend state, for API responses; empty if it has no listener."""
+        listener = self._listeners.get(stream_id)
+        if listener is None:
+            return {}
+        return {"tts_status": listener.tts_status, "tts_error": listener.tts_error}
+
+    async def wait_for_tts(self, stream_id: str, timeout: float) -> dict:
+        """Wait for a just-started listener's backend build, then return tts_status()."""
+        listener = self._listeners.get(stream_id)
+        if listener is not None:
+            await listener.wait_for_tts(timeout)
+        return self.tts_status(stream_id)
+
     def get_running_streams(self) -> list[str]:
         return [sid for sid, task in self._tasks.items() if not task.done()]
 
+    def diagnostics(self) -> dict[str, dict]:
+        """Per-stream listener counters, read from memory only."""
+        out = {}
+        for sid, listener in self._listeners.items():
+            stats = listener.stats()
+            stats["running"] = not self._tasks[sid].done()
+            out[sid] = stats
+        return out
+
 
 stream_manager = StreamManager()
+
+CallbackGauge(
+    "tts_queue_depth", "TTS jobs waiting in a stream's scheduler", ["stream"],
+    lambda: {(sid,): listener.scheduler.depth for sid, listener in stream_manager._listeners.items()},
+)
+CallbackGauge(
+    "tts_queue_backlog_seconds", "Estimated queued + unplayed TTS audio", ["stream"],
+    lambda: {(sid,): listener.scheduler.backlog_seconds() for sid, listener in stream_manager._listeners.items()},
+)
@@ -0,0 +1,135 @@
+"""
+In-memory stream config, loaded once at startup and kept in sync write-through.
+
+Reads (widget page, /health, /api/streams, /api/tts) are plain dict lookups;
+SQLite is only touched when a stream is added, updated or deleted.
+
+With ENABLE_REDIS_CACHE, each write is also published on a Redis channel so
+other gunicorn workers reload that one row instead of serving stale config.
+"""
+import asyncio
+import json
+import uuid
+
+from app.config import settings
+from app.database import get_all_streams, get_stream, add_stream, update_stream, delete_stream
+from app.logger import logger
+from app.services.cache_service import get_cache_service
+
+CHANGES_CHANNEL = "streams:changed"
+
+
+class StreamRegistry:
+    def __init__(self):
+        self._streams: dict[str, dict] = {}
+        self._origin = uuid.uuid4().hex  # ignore our own change notifications
+        self._sync_task: asyncio.Task | None = None
+
+    async def load(self):
+        rows = await get_all_streams()
+        self._streams = {row["stream_id"]: row for row in rows}
+
+    # --- reads (copies, so callers can annotate them freely) ---
+
+    def get(self, stream_id: str) -> dict | None:
+        stream = self._streams.get(stream_id)
+        return dict(stream) if stream else None
+
+    def all(self) -> list[dict]:
+        return [dict(s) for s in self._streams.values()]
+
+    def __contains__(self, stream_id: str) -> bool:
+        return stream_id in self._streams
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    # --- writes (DB first, then memory, then notify) ---
+
+    async def add(
+        self,
+        stream_id: str,
+        channel: str,
+        tts_backend: str = "elevenlabs",
+        elevenlabs_voice_id: str | None = None,
+        piper_voice: str | None = None,
+    ) -> dict:
+        await add_stream(
+            stream_id, channel, tts_backend=tts_backend,
+            elevenlabs_voice_id=elevenlabs_voice_id, piper_voice=piper_voice,
+        )
+        await self._reload(stream_id)
+        self._publish(stream_id)
+        return self.get(stream_id)
+
+    async def update(self, stream_id: str, **fields) -> dict | None:
+        if not await update_stream(stream_id, **fields):
+            return None
+        await self._reload(stream_id)
+        self._publish(stream_id)
+        return self.get(stream_id)
+
+    async def delete(self, stream_id: str) -> bool:
+        deleted = await delete_stream(stream_id)
+        self._streams.pop(stream_id, None)
+        if deleted:
+            self._publish(stream_id)
+        return deleted
+
+    async def _reload(self, stream_id: str):
+        row = await get_stream(stream_id)
+        if row is None:
+            self._streams.pop(stream_id, None)
+        else:
+            self._streams[stream_id] = row
+
+    # --- cross-worker change notification ---
+
+    def _publish(self, stream_id: str):
+        cache = get_cache_service()
+        if not cache.enabled:
+            return
+        try:
+            cache.redis_client.publish(
+                CHANGES_CHANNEL, json.dumps({"stream_id": stream_id, "origin": self._origin})
+            )
+        except Exception as e:
+            logger.warning(f"Could not publish stream change: {e}")
+
+    def start_sync(self):
+        """Follow other workers' writes through Redis (no-op without Redis)."""
+        if get_cache_service().enabled and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._follow_changes(), name="stream-registry-sync")
+
+    async def stop_sync(self):
+        if self._sync_task is None:
+            return
+        self._sync_task.cancel()
+        try:
+            await self._sync_task
+        except asyncio.CancelledError:
+            pass
+        self._sync_task = None
+
+    async def _follow_changes(self):
+        import redis.asyncio as aioredis
+
+        client = aioredis.Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB)
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(CHANGES_CHANNEL)
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    change = json.loads(message["data"])
+                    if change.get("origin") != self._origin:
+                        await self._reload(change["stream_id"])
+                except Exception as e:
+                    logger.warning(f"Bad stream change notification: {e}")
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+stream_registry = StreamRegistry()
@@ -0,0 +1,143 @@
+"""
+Synthetic TTS backend for load tests and capacity planning.
+
+Produces deterministic 16-bit mono WAV (a square-wave tone picked from the
+text hash, as long as the text would take to speak at TTS_CHARS_PER_SECOND)
+after a simulated delay drawn from a seeded log-normal distribution. Failure rate and
+a process-wide concurrency cap are configurable, so the scheduler, cache,
+fan-out and FallbackTTS failover can be exercised without a model file or an
+API key. Select it per stream with tts_backend='synthetic'.
+"""
+import hashlib
+import io
+import random
+import shutil
+import struct
+import threading
+import time
+import wave
+from datetime import datetime
+from pathlib import Path
+
+from app.config import settings
+from app.logger import tts_logger
+from app.metrics import TTS_SECONDS
+from app.services import audio_cache
+
+SAMPLE_RATE = 16000
+AMPLITUDE = 6000
+
+
+class SyntheticTTSError(RuntimeError):
+    """Injected failure (SYNTHETIC_TTS_FAILURE_RATE)."""
+
+
+class SyntheticTTS:
+    OUTPUT_EXT = "wav"
+
+    def __init__(self, name: str = "synthetic", failure_rate: float | None = None, seed: int | None = None):
+        self.BACKEND_NAME = name
+        self.failure_rate = settings.SYNTHETIC_TTS_FAILURE_RATE if failure_rate is None else failure_rate
+        self._rng = random.Random(settings.SYNTHETIC_TTS_SEED if seed is None else seed)
+        self._rng_lock = threading.Lock()
+        limit = settings.SYNTHETIC_TTS_MAX_CONCURRENCY
+        self._slots = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self.cache_dir = settings.CACHE_DIR
+        self.output_dir = settings.AUDIO_OUTPUT_DIR
+
+    def generate(
+        self,
+        text: str,
+        username: str = None,
+        use_cache: bool = True,
+    ) -> tuple[str, bool, float]:
+        start_time = time.time()
+
+        if use_cache:
+            cached_url = self.cached_url(text)
+            if cached_url:
+                elapsed = (time.time() - start_time) * 1000
+                TTS_SECONDS.labels(self.BACKEND_NAME, "hit").observe(elapsed / 1000)
+                return cached_url, True, elapsed
+
+        with self._rng_lock:
+            delay_ms = self._draw_latency_ms(text)
+            fail = self._rng.random() < self.failure_rate
+
+        if self._slots is not None:
+            self._slots.acquire()
+        try:
+            time.sleep(delay_ms / 1000)
+            if fail:
+                raise SyntheticTTSError(f"{self.BACKEND_NAME}: injected failure")
+            audio_bytes = render_wav(text)
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        filename = f"tts_{username or 'user'}_{timestamp}.{self.OUTPUT_EXT}"
+        (self.output_dir / filename).write_bytes(audio_bytes)
+        if use_cache:
+            self._cache_path(text).write_bytes(audio_bytes)
+
+        elapsed = (time.time() - start_time) * 1000
+        TTS_SECONDS.labels(self.BACKEND_NAME, "miss").observe(elapsed / 1000)
+        tts_logger.debug("Synthetic TTS generated in %.0fms: %s", elapsed, filename)
+        return f"/static/audio/{filename}", False, elapsed
+
+    def _draw_latency_ms(self, text: str) -> float:
+        base = settings.SYNTHETIC_TTS_LATENCY_MS
+        sigma = settings.SYNTHETIC_TTS_LATENCY_SIGMA
+        if sigma > 0:
+            base *= self._rng.lognormvariate(0, sigma)
+        return max(0.0, base + settings.SYNTHETIC_TTS_MS_PER_CHAR * len(text))
+
+    def warm_up(self, text: str):
+        render_wav(text)
+
+    def cached_url(self, text: str) -> str | None:
+        return audio_cache.cached_url(self._cache_path(text))
+
+    def cache_result(self, text: str, audio_url: str):
+        shutil.copyfile(self.output_dir / Path(audio_url).name, self._cache_path(text))
+
+    def _cache_path(self, text: str) -> Path:
+        return self.cache_dir / f"{self._get_cache_key(text)}.{self.OUTPUT_EXT}"
+
+    def _get_cache_key(self, text: str) -> str:
+        return hashlib.md5(f"synthetic:{text}".encode()).hexdigest()
+
+
+def render_wav(text: str) -> bytes:
+    """Deterministic tone for text: pitch from its hash, length from TTS_CHARS_PER_SECOND."""
+    digest = hashlib.md5(text.encode()).digest()
+    period = 40 + digest[0] % 60  # samples per cycle: ~160-400 Hz at 16 kHz
+    cycle = struct.pack(
+        f"<{period}h",
+        *(AMPLITUDE if i < period // 2 else -AMPLITUDE for i in range(period)),
+    )
+    seconds = max(0.3, len(text) / max(settings.TTS_CHARS_PER_SECOND, 1.0))
+    n_frames = int(seconds * SAMPLE_RATE)
+    pcm = (cycle * (n_frames // period + 1))[: n_frames * 2]
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(pcm)
+    return buf.getvalue()
+
+
+_synthetic_instance: SyntheticTTS | None = None
+_synthetic_lock = threading.Lock()
+
+
+def get_synthetic_tts() -> SyntheticTTS:
+    """Shared instance, so the concurrency cap and seeded sequence span every stream."""
+    global _synthetic_instance
+    with _synthetic_lock:
+        if _synthetic_instance is None:
+            _synthetic_instance = SyntheticTTS()
+        return _synthetic_instance
@@ -0,0 +1,214 @@
+"""
+Canonical form of chat text, used both for synthesis and the cache key.
+
+Without it "JAJAJA", "jajaja " and "jajajajaja" are three cache entries and
+three syntheses. TTS_NORMALIZE lists the steps to run; they always run in
+this order:
+
+- emotes: drop Kick emote tokens ([emote:37226:KEKW]) instead of rejecting
+  the message
+- urls: replace links with TTS_URL_TEXT. A link needs a scheme, "www." or a
+  path after the domain ("marca.es/futbol"); only .com/.net/.org count bare,
+  so Spanish chat like "esto.es" or "tu.me" is left alone
+- unicode: NFKC, so composed and decomposed accents, fullwidth characters and
+  "fancy font" letters all become the same text. Accents themselves are kept:
+  they change pronunciation
+- emoji: drop emoji and other pictographs
+- numbers: drop thousands separators ("1.000" -> "1000"), cut digit runs
+  longer than TTS_NORMALIZE_MAX_DIGITS and, with TTS_NUMBERS_LANG=es, spell
+  whole numbers out ("1000" and "mil" become one entry)
+- repeats: shorten a 1-3 character unit repeated more than
+  TTS_NORMALIZE_MAX_REPEATS times ("jajajajaja", "nooooo", "!!!!!") to that many
+- case: fold case, for backends whose CASE_SENSITIVE is False (Piper reads
+  "HOLA" and "hola" the same; ElevenLabs doesn't)
+- whitespace: collapse runs of whitespace and strip the ends
+
+Steps and patterns are rebuilt whenever the settings they come from change,
+so tests and runtime config changes take effect on the next call.
+
+The cache hit ratio is reported twice: as it is, and as keying on the raw
+text would have had it. A hit counts as a raw hit only when the same raw text
+was requested before (remembered for the last RAW_TEXTS_TRACKED texts, since
+the process started).
+"""
+import re
+import unicodedata
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.config import settings
+from app.logger import logger
+from app.metrics import TTS_CACHE_LOOKUPS
+
+STEPS = ("emotes", "urls", "unicode", "emoji", "numbers", "repeats", "case", "whitespace")
+RAW_TEXTS_TRACKED = 10000
+
+# Kick emotes: [emote:37226:KEKW]
+EMOTE_PATTERN = re.compile(r"\[emote:\d+:[^\]]+\]", re.IGNORECASE)
+URL_PATTERN = re.compile(
+    r"(?:https?://|www\.)\S+"
+    r"|\b[\w-]+(?:\.[\w-]+)*\.(?:com|net|org)\b(?:/\S*)?"
+    r"|\b[\w-]+(?:\.[\w-]+)*\.(?:tv|gg|io|me|ly|be|co|es|ar|mx)/\S*",
+    re.IGNORECASE,
+)
+EMOJI_PATTERN = re.compile(
+    "[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\u200D\uFE0E\uFE0F\u20E3\U000E0020-\U000E007F]+"
+)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+# "1.000" / "1 000.000": groups of exactly three digits, Spanish-style separators
+THOUSANDS_PATTERN = re.compile(r"(?<![\w.,])\d{1,3}(?:[. ]\d{3})+(?![\w]|[.,]\d)")
+# Whole numbers standing alone (not "x2", "mp3" or the parts of "3,5")
+INTEGER_PATTERN = re.compile(r"(?<![\w.,])\d+(?![\w]|[.,]\d)")
+
+_raw_seen: OrderedDict[int, None] = OrderedDict()
+
+
+@lru_cache(maxsize=8)
+def _enabled_steps(spec: str) -> frozenset[str]:
+    names = {name.strip().lower() for name in spec.split(",") if name.strip()}
+    for name in sorted(names - set(STEPS)):
+        logger.warning(f"Ignoring unknown TTS_NORMALIZE step: {name!r}")
+    return frozenset(names & set(STEPS))
+
+
+@lru_cache(maxsize=8)
+def _digits_pattern(max_digits: int) -> re.Pattern:
+    return re.compile(r"\d{%d,}" % (max_digits + 1))
+
+
+@lru_cache(maxsize=8)
+def _repeat_pattern(max_repeats: int) -> re.Pattern:
+    return re.compile(r"(\D{1,3}?)\1{%d,}" % max_repeats)
+
+
+def _steps() -> frozenset[str]:
+    return _enabled_steps(settings.TTS_NORMALIZE)
+
+
+def enabled(step: str) -> bool:
+    return step in _steps()
+
+
+def canonicalize(text: str, case_sensitive: bool = True) -> str:
+    """Text after the enabled TTS_NORMALIZE steps."""
+    steps = _steps()
+    if not steps:
+        return text
+    if "emotes" in steps:
+        text = EMOTE_PATTERN.sub(" ", text)
+    if "urls" in steps:
+        text = URL_PATTERN.sub(f" {settings.TTS_URL_TEXT} " if settings.TTS_URL_TEXT else " ", text)
+    if "unicode" in steps:
+        text = unicodedata.normalize("NFKC", text)
+    if "emoji" in steps:
+        text = EMOJI_PATTERN.sub(" ", text)
+    if "numbers" in steps:
+        text = _normalize_numbers(text)
+    if "repeats" in steps:
+        repeats = max(1, settings.TTS_NORMALIZE_MAX_REPEATS)
+        text = _repeat_pattern(repeats).sub(lambda m: m.group(1) * repeats, text)
+    if "case" in steps and not case_sensitive:
+        text = text.casefold()
+    if "whitespace" in steps:
+        text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return text
+
+
+def _normalize_numbers(text: str) -> str:
+    text = THOUSANDS_PATTERN.sub(lambda m: re.sub(r"[. ]", "", m.group()), text)
+    max_digits = settings.TTS_NORMALIZE_MAX_DIGITS
+    if max_digits > 0:
+        text = _digits_pattern(max_digits).sub(lambda m: m.group()[:max_digits], text)
+    if _numbers_lang(settings.TTS_NUMBERS_LANG) == "es":
+        text = INTEGER_PATTERN.sub(lambda m: spanish_number(int(m.group())) or m.group(), text)
+    return text
+
+
+@lru_cache(maxsize=8)
+def _numbers_lang(value: str) -> str:
+    lang = value.strip().lower()
+    if lang and lang != "es":
+        logger.warning(f"TTS_NUMBERS_LANG={lang!r} is not supported, numbers stay as digits")
+        return ""
+    return lang
+
+
+_UNITS = (
+    "cero uno dos tres cuatro cinco seis siete ocho nueve diez once doce trece catorce quince "
+    "dieciséis diecisiete dieciocho diecinueve veinte veintiuno veintidós veintitrés veinticuatro "
+    "veinticinco veintiséis veintisiete veintiocho veintinueve"
+).split()
+_TENS = ("", "", "", "treinta", "cuarenta", "cincuenta", "sesenta", "setenta", "ochenta", "noventa")
+_HUNDREDS = (
+    "", "ciento", "doscientos", "trescientos", "cuatrocientos",
+    "quinientos", "seiscientos", "setecientos", "ochocientos", "novecientos",
+)
+
+
+def _below_thousand(n: int, before_noun: bool = False) -> str:
+    if n == 100:
+        return "cien"
+    hundreds, rest = divmod(n, 100)
+    words = [_HUNDREDS[hundreds]] if hundreds else []
+    if rest >= 30:
+        tens, units = divmod(rest, 10)
+        words.append(f"{_TENS[tens]} y {_UNITS[units]}" if units else _TENS[tens])
+    elif rest:
+        words.append(_UNITS[rest])
+    text = " ".join(words)
+    if before_noun:
+        # "veintiún mil", "un millón"
+        if text.endswith("veintiuno"):
+            return text[: -len("veintiuno")] + "veintiún"
+        if text.endswith("uno"):
+            return text[:-1]
+    return text
+
+
+def spanish_number(n: int) -> str | None:
+    """Spanish words for 0 <= n < 10^9; None outside that range."""
+    if n == 0:
+        return "cero"
+    if not 0 < n < 1_000_000_000:
+        return None
+    millions, rest = divmod(n, 1_000_000)
+    thousands, units = divmod(rest, 1000)
+    words = []
+    if millions:
+        words.append("un millón" if millions == 1 else f"{_below_thousand(millions, before_noun=True)} millones")
+    if thousands:
+        words.append("mil" if thousands == 1 else f"{_below_thousand(thousands, before_noun=True)} mil")
+    if units:
+        words.append(_below_thousand(units))
+    return " ".join(words)
+
+
+def for_backend(text: str, tts) -> str:
+    """canonicalize() with case folding decided by the backend."""
+    return canonicalize(text, case_sensitive=getattr(tts, "CASE_SENSITIVE", True))
+
+
+def record_lookup(raw_text: str, hit: bool) -> bool:
+    """Count a cache lookup made with the canonical text; returns whether the raw text would have hit too."""
+    key = hash(raw_text)
+    raw_hit = hit and key in _raw_seen
+    _raw_seen[key] = None
+    _raw_seen.move_to_end(key)
+    if len(_raw_seen) > RAW_TEXTS_TRACKED:
+        _raw_seen.popitem(last=False)
+    TTS_CACHE_LOOKUPS.labels("normalized", "hit" if hit else "miss").inc()
+    TTS_CACHE_LOOKUPS.labels("raw", "hit" if raw_hit else "miss").inc()
+    return raw_hit
+
+
+def normalization_snapshot() -> dict:
+    """Enabled steps and the cache hit ratio with and without them."""
+    hits = TTS_CACHE_LOOKUPS.value("normalized", "hit")
+    lookups = hits + TTS_CACHE_LOOKUPS.value("normalized", "miss")
+    raw_hits = TTS_CACHE_LOOKUPS.value("raw", "hit")
+    return {
+        "steps": [step for step in STEPS if step in _steps()],
+        "lookups": int(lookups),
+        "raw_hit_ratio": round(raw_hits / lookups, 3) if lookups else None,
+        "hit_ratio": round(hits / lookups, 3) if lookups else None,
+    }
@@ -0,0 +1,137 @@
+"""
+Per-message latency tracing from Kick frame to widget playback.
+
+KickListener starts a Trace for every App\\Events frame and sets it as the
+current trace (a contextvar), so handlers and the TTS scheduler can pick it up
+without threading it through every call. The broadcast payload carries
+`trace_id`; the widget acks "received" and "playback" over its websocket.
+
+Each mark records the time since the previous mark, so the stages read as:
+
+    queued       frame arrival -> job accepted by the TTS scheduler
+    dequeued     waiting in the scheduler queue
+    synthesized  TTS generate()
+    broadcast    websocket fan-out (for non-TTS events: frame -> fan-out)
+    received     network + widget parse
+    playback     widget audio queue + audio start
+
+Per stream and message type the last samples of each stage are kept in a
+rolling LatencyHistogram (GET /api/streams/{stream_id}/latency).
+"""
+import time
+import uuid
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from app.metrics import Histogram
+from app.services.circuit_breaker import LatencyHistogram
+
+ACK_STAGES = ("received", "playback")
+
+# Broadcast traces waiting for widget acks; old ones are forgotten first
+MAX_PENDING_TRACES = 512
+
+E2E_STAGE_SECONDS = Histogram(
+    "e2e_stage_seconds",
+    "Per-message latency of each pipeline stage, frame to widget playback",
+    ["stream", "kind", "stage"],
+)
+
+_current: ContextVar["Trace | None"] = ContextVar("trace", default=None)
+
+
+class Trace:
+    __slots__ = ("trace_id", "stream_id", "kind", "started", "marks")
+
+    def __init__(self, stream_id: str):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.stream_id = stream_id
+        self.kind: str | None = None
+        self.started = time.monotonic()
+        self.marks: dict[str, float] = {}  # stage -> ms since frame arrival
+
+    def mark(self, stage: str) -> float | None:
+        """Record a stage; returns ms since the previous mark, or None if already marked."""
+        if stage in self.marks:
+            return None
+        elapsed = (time.monotonic() - self.started) * 1000
+        previous = next(reversed(self.marks.values()), 0.0)
+        self.marks[stage] = elapsed
+        return elapsed - previous
+
+
+def start_trace(stream_id: str) -> Trace:
+    trace = Trace(stream_id)
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> Trace | None:
+    return _current.get()
+
+
+class StreamLatency:
+    """Rolling per-stage percentiles and pending traces for one stream."""
+
+    def __init__(self, stream_id: str):
+        self.stream_id = stream_id
+        self._pending: OrderedDict[str, Trace] = OrderedDict()
+        self._stages: dict[tuple[str, str], LatencyHistogram] = {}
+
+    def mark(self, trace: Trace, stage: str):
+        delta = trace.mark(stage)
+        if delta is None:
+            return
+        kind = trace.kind or "tts_message"
+        self._record(kind, stage, delta)
+        if stage == "playback":
+            self._record(kind, "total", trace.marks[stage])
+            self._pending.pop(trace.trace_id, None)
+
+    def _record(self, kind: str, stage: str, ms: float):
+        histogram = self._stages.get((kind, stage))
+        if histogram is None:
+            histogram = self._stages[(kind, stage)] = LatencyHistogram()
+        histogram.record(ms)
+        E2E_STAGE_SECONDS.labels(self.stream_id, kind, stage).observe(ms / 1000)
+
+    def broadcast(self, trace: Trace, kind: str):
+        """Mark the fan-out and keep the trace around for the widget's acks."""
+        trace.kind = kind
+        self.mark(trace, "broadcast")
+        self._pending[trace.trace_id] = trace
+        self._pending.move_to_end(trace.trace_id)
+        while len(self._pending) > MAX_PENDING_TRACES:
+            self._pending.popitem(last=False)
+
+    def ack(self, trace_id: str, stage: str):
+        """Widget ack; the first widget to ack a stage wins, unknown ids are ignored."""
+        if stage not in ACK_STAGES:
+            return
+        trace = self._pending.get(trace_id)
+        if trace is not None:
+            self.mark(trace, stage)
+
+    def histograms(self) -> dict[tuple[str, str], LatencyHistogram]:
+        """(message type, stage) -> rolling histogram."""
+        return dict(self._stages)
+
+    def snapshot(self) -> dict:
+        view: dict[str, dict] = {}
+        for (kind, stage), histogram in list(self._stages.items()):
+            view.setdefault(kind, {})[stage] = histogram.snapshot()
+        return {"pending_acks": len(self._pending), "stages": view}
+
+
+_streams: dict[str, StreamLatency] = {}
+
+
+def stream_latency(stream_id: str) -> StreamLatency:
+    tracker = _streams.get(stream_id)
+    if tracker is None:
+        tracker = _streams[stream_id] = StreamLatency(stream_id)
+    return tracker
+
+
+def forget_stream(stream_id: str):
+    _streams.pop(stream_id, None)
@@ -3,45 +3,213 @@ TTS factory.
 Default backend: ElevenLabs (optional voice_id per stream).
 Fallback: Piper (local, runs when ElevenLabs fails or has no credits).
 """
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+from app.config import settings
 from app.logger import logger
+from app.metrics import TTS_HEDGES, TTS_SECONDS
+from app.services.circuit_breaker import get_breaker
+from app.services.rate_limiter import RateLimitExceeded
+
+# Hedged calls need their own threads: FallbackTTS.generate already runs in
+# asyncio's default pool and blocks waiting on these futures. Fallbacks get a
+# pool of their own, so primaries hung on a stalled API can't keep the hedge
+# from starting.
+_hedge_pool = ThreadPoolExecutor(max_workers=settings.TTS_HEDGE_WORKERS, thread_name_prefix="tts-hedge")
+_fallback_pool = ThreadPoolExecutor(max_workers=settings.TTS_HEDGE_WORKERS, thread_name_prefix="tts-hedge-fallback")
+
+
+def _count_hedge(event: str):
+    TTS_HEDGES.labels(event).inc()
+
+
+def hedge_snapshot() -> dict:
+    """Hedging counters: calls that hit the budget and which backend won them."""
+    snapshot = {"budget_ms": settings.TTS_HEDGE_AFTER_MS}
+    for event in ("hedged", "primary_won", "fallback_won", "late_primary_cached"):
+        snapshot[event] = int(TTS_HEDGES.value(event))
+    return snapshot
 
 
 class FallbackTTS:
     """
     Tries the primary TTS backend first.
     On any exception falls back to Piper silently so the stream keeps working.
+
+    Each backend call goes through that backend's circuit breaker: while the
+    primary's breaker is open (out of credits, timing out, too slow) messages
+    go straight to Piper instead of paying a failed round-trip first.
+
+    With TTS_HEDGE_AFTER_MS > 0, Piper is also started if the primary hasn't
+    answered within that budget; whichever finishes first is used.
     """
 
     def __init__(self, primary, fallback):
         self._primary = primary
         self._fallback = fallback
 
+    @property
+    def CASE_SENSITIVE(self) -> bool:
+        # Text is canonicalized once, for the voice the stream normally uses
+        return getattr(self._primary, "CASE_SENSITIVE", True)
+
+    @property
+    def OUTPUT_EXT(self) -> str | None:
+        return getattr(self._primary, "OUTPUT_EXT", None)
+
+    @property
+    def concurrency(self) -> int:
+        return getattr(self._primary, "concurrency", 1)
+
+    def cached_url(self, text: str) -> str | None:
+        return self._primary.cached_url(text)
+
     def generate(
         self,
         text: str,
         username: str = None,
         use_cache: bool = True,
     ) -> tuple[str, bool, float]:
+        if use_cache:
+            # Checked before the breaker: a cache hit says nothing about the backend's
+            # health, so it must never take the half-open probe
+            start = time.perf_counter()
+            cached_url = self._primary.cached_url(text)
+            if cached_url:
+                elapsed = (time.perf_counter() - start) * 1000
+                TTS_SECONDS.labels(self._primary.BACKEND_NAME, "hit").observe(elapsed / 1000)
+                return cached_url, True, elapsed
+
+        breaker = get_breaker(self._primary.BACKEND_NAME)
+        if breaker.allow():
+            if settings.TTS_HEDGE_AFTER_MS > 0:
+                return self._generate_hedged(breaker, text, username, use_cache)
+            try:
+                return _call_with_breaker(self._primary, breaker, text, username, use_cache)
+            except Exception as e:
+                logger.warning(f"Primary TTS failed ({e}), falling back to Piper")
+        else:
+            logger.debug("%s circuit is %s, using Piper", self._primary.BACKEND_NAME, breaker.state)
+
+        return self._generate_fallback(text, username, use_cache)
+
+    def _generate_fallback(self, text: str, username: str, use_cache: bool):
+        fallback_breaker = get_breaker(self._fallback.BACKEND_NAME)
+        return _call_with_breaker(self._fallback, fallback_breaker, text, username, use_cache)
+
+    def _generate_hedged(self, breaker, text: str, username: str, use_cache: bool):
+        start = time.perf_counter()
+        # The primary runs uncached so a result that loses the race is only
+        # cached when TTS_HEDGE_KEEP_LATE_PRIMARY allows it.
+        primary = _hedge_pool.submit(_call_with_breaker, self._primary, breaker, text, username, False)
         try:
-            return self._primary.generate(text, username, use_cache)
+            result = primary.result(timeout=settings.TTS_HEDGE_AFTER_MS / 1000)
+        except FutureTimeout:
+            pass
         except Exception as e:
             logger.warning(f"Primary TTS failed ({e}), falling back to Piper")
-            return self._fallback.generate(text, username, use_cache)
+            return self._generate_fallback(text, username, use_cache)
+        else:
+            if use_cache:
+                self._cache_primary(text, result[0])
+            return result
+
+        _count_hedge("hedged")
+        logger.info("Primary TTS over %.0fms budget, hedging with Piper", settings.TTS_HEDGE_AFTER_MS)
+        fallback = _fallback_pool.submit(self._generate_fallback, text, username, use_cache)
+
+        pending = {primary, fallback}
+        error: Exception | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            # Prefer the primary's voice when both land together
+            for future in sorted(done, key=lambda f: f is not primary):
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                url, cached, _ = future.result()
+                if future is primary:
+                    _count_hedge("primary_won")
+                    if use_cache:
+                        self._cache_primary(text, url)
+                    fallback.cancel()
+                else:
+                    _count_hedge("fallback_won")
+                    # Can't interrupt an in-flight SDK call; just stop caring about it
+                    if not primary.cancel() and use_cache and settings.TTS_HEDGE_KEEP_LATE_PRIMARY:
+                        primary.add_done_callback(lambda f: self._cache_late_primary(text, f))
+                return url, cached, (time.perf_counter() - start) * 1000
+
+        raise error
+
+    def _cache_primary(self, text: str, audio_url: str):
+        try:
+            self._primary.cache_result(text, audio_url)
+        except OSError as e:
+            logger.warning(f"Could not cache primary TTS result: {e}")
 
+    def _cache_late_primary(self, text: str, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._cache_primary(text, future.result()[0])
+        _count_hedge("late_primary_cached")
 
-def build_tts(backend: str = "elevenlabs", elevenlabs_voice_id: str | None = None):
+
+def _call_with_breaker(backend, breaker, text: str, username: str, use_cache: bool):
+    """Run backend.generate and feed the outcome into its breaker (cache hits are not health signals)."""
+    start = time.perf_counter()
+    try:
+        result = backend.generate(text, username, use_cache)
+    except RateLimitExceeded:
+        # Turned away by our own limiter before reaching the API: not a health signal
+        breaker.release_probe()
+        raise
+    except Exception as e:
+        breaker.record_failure(e, _backend_ms(backend, start))
+        raise
+    if result[1]:
+        # A clip cached since the caller looked: hand the probe to the next call
+        breaker.release_probe()
+    else:
+        breaker.record_success(_backend_ms(backend, start))
+    return result
+
+
+def _backend_ms(backend, start: float) -> float:
+    """Time spent in the backend itself; rate-limited backends report it without their queueing."""
+    api_ms = backend.api_ms() if hasattr(backend, "api_ms") else None
+    return api_ms if api_ms is not None else (time.perf_counter() - start) * 1000
+
+
+def build_tts(
+    backend: str = "elevenlabs",
+    elevenlabs_voice_id: str | None = None,
+    piper_voice: str | None = None,
+):
     """
     Build a TTS instance for a stream.
 
     Args:
-        backend: 'elevenlabs' (default) or 'piper'
+        backend: 'elevenlabs' (default), 'piper' or 'synthetic' (benchmarks)
         elevenlabs_voice_id: optional per-stream voice override; falls back to
                              global ELEVEN_LABS_VOICE_ID from config if not set.
+        piper_voice: optional per-stream Piper voice (name in PIPER_VOICES_DIR),
+                     used for 'piper' and as the local fallback.
     """
     backend = (backend or "elevenlabs").strip().lower()
 
     from app.services.piper_tts import get_piper_tts
+    from app.services.piper_voices import PiperVoiceTTS, is_default_voice, voice_exists
     piper = get_piper_tts()  # None if model file is missing
+    if piper_voice and not is_default_voice(piper_voice):
+        if voice_exists(piper_voice):
+            # Loaded on first use by the voice manager
+            piper = PiperVoiceTTS(piper_voice)
+        else:
+            logger.warning(
+                f"Piper voice '{piper_voice}' not found in {settings.PIPER_VOICES_DIR}, using PIPER_MODEL"
+            )
 
     if backend == "piper":
         if piper is not None:
@@ -50,7 +218,6 @@ def build_tts(backend: str = "elevenlabs", elevenlabs_voice_id: str | None = Non
             "Piper backend requested but unavailable (install piper-tts and set PIPER_MODEL). "
             "Falling back to ElevenLabs if configured."
         )
-        from app.config import settings
         if settings.ELEVEN_LABS_API_KEY:
             from app.services.elevenlabs_tts import ElevenLabsTTS
             return ElevenLabsTTS(voice_id=elevenlabs_voice_id)
@@ -60,7 +227,6 @@ def build_tts(backend: str = "elevenlabs", elevenlabs_voice_id: str | None = Non
         )
 
     if backend == "elevenlabs":
-        from app.config import settings
         if not settings.ELEVEN_LABS_API_KEY:
             logger.warning("ELEVEN_LABS_API_KEY not set — using Piper only")
             if piper is None:
@@ -76,4 +242,13 @@ def build_tts(backend: str = "elevenlabs", elevenlabs_voice_id: str | None = Non
         logger.warning("Piper model not found — ElevenLabs will run without local fallback")
         return elevenlabs
 
-    raise ValueError(f"Unknown TTS backend: '{backend}'. Use 'elevenlabs' or 'piper'.")
+    if backend == "synthetic":
+        from app.services.synthetic_tts import SyntheticTTS, get_synthetic_tts
+        # Fail over like ElevenLabs does; without a Piper model use a synthetic
+        # backend that never fails, so failover stays testable offline.
+        fallback = piper or SyntheticTTS(
+            "synthetic_fallback", failure_rate=0.0, seed=settings.SYNTHETIC_TTS_SEED + 1
+        )
+        return FallbackTTS(primary=get_synthetic_tts(), fallback=fallback)
+
+    raise ValueError(f"Unknown TTS backend: '{backend}'. Use 'elevenlabs', 'piper' or 'synthetic'.")
@@ -0,0 +1,464 @@
+"""
+Per-stream TTS job scheduler.
+
+Chat handlers submit jobs here instead of synthesizing inline. One worker per
+stream pops the best job (badge priority first, then arrival order), drops it
+if it waited longer than TTS_QUEUE_MAX_AGE_SECONDS, synthesizes it off the
+event loop and broadcasts the result to the stream's widgets.
+
+When the backend can synthesize several texts at once (batched Piper reports
+a `concurrency` above 1), the worker takes up to that many jobs at a time and
+synthesizes them concurrently, so a burst on one stream fills a batch. The
+results are still broadcast in the order the jobs were taken.
+
+The audio still waiting to be heard — queued jobs plus clips already sent to
+the widget that haven't finished playing — is capped at TTS_QUEUE_MAX_SECONDS.
+When a new job doesn't fit, the lowest-priority queued job is shed (or the new
+one, if nothing queued ranks below it).
+
+The chat handler also counts every !s phrase in `phrases` (HeavyHitters).
+Once no job has been synthesized anywhere for TTS_PRERENDER_IDLE_SECONDS,
+the worker synthesizes the most frequent phrases that aren't cached yet, one
+at a time, re-checking for real jobs between each. Phrases are cached without
+the per-user TTS_PREFIX: a job whose phrase is cached gets its (short, also
+cached per user) prefix clip joined in front of it, so a frequent phrase is
+instant for every sender. The joined clip is cached too, keyed by both clips,
+so repeats reuse it and the cache janitor evicts it like any other clip. That
+needs WAV output, so only WAV backends pre-render.
+
+The idle check is deliberately process-wide, not per stream: every stream's
+Piper synthesis shares the same CPU, so pre-rendering for a quiet stream while
+another stream is busy would only slow the busy one down.
+"""
+import asyncio
+import contextvars
+import hashlib
+import heapq
+import itertools
+import time
+import wave
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from app.config import settings
+from app.logger import logger, tts_logger
+from app.metrics import TTS_PRERENDERS, TTS_QUEUE_DROPS
+from app.routes.websocket import broadcast_to_stream, inline_audio_limit
+from app.services import audio_cache, audio_processing, text_normalize
+from app.services.chat_state import HeavyHitters
+from app.services.tracing import Trace, current_trace, stream_latency
+
+# Priority for senders without any ranked badge (lower number = served first)
+DEFAULT_PRIORITY = 9
+
+# Shared by every stream's scheduler on purpose (see the module docstring):
+# syntheses (jobs and pre-renders) running across all streams
+_active_syntheses = 0
+# Monotonic time the last job synthesis (not pre-render) finished, across all streams
+_last_synthesis_at = 0.0
+# Silence between a prefix clip and a cached phrase clip
+SEGMENT_GAP_MS = 120
+
+AUDIO_TYPES = {".wav": "audio/wav", ".mp3": "audio/mpeg", ".ogg": "audio/ogg"}
+
+
+def parse_badge_priority(spec: str) -> dict[str, int]:
+    """Parse 'broadcaster:0,moderator:1,...' into {badge_type: priority}."""
+    priorities = {}
+    for item in spec.split(","):
+        name, _, value = item.partition(":")
+        name = name.strip().lower()
+        if not name:
+            continue
+        try:
+            priorities[name] = int(value)
+        except ValueError:
+            logger.warning(f"Ignoring invalid TTS_BADGE_PRIORITY entry: {item!r}")
+    return priorities
+
+
+def estimate_seconds(text: str) -> float:
+    """Rough spoken duration of text, used before the clip exists."""
+    cps = settings.TTS_CHARS_PER_SECOND
+    return len(text) / cps if cps > 0 else 0.0
+
+
+@dataclass(order=True)
+class TTSJob:
+    priority: int
+    seq: int
+    text: str = field(compare=False)      # what the backend speaks (prefix included)
+    content: str = field(compare=False)   # original chat text shown in the widget
+    username: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    est_seconds: float = field(compare=False)
+    trace: Trace | None = field(default=None, compare=False)
+    raw_text: str | None = field(default=None, compare=False)  # text before canonicalization
+    phrase: str | None = field(default=None, compare=False)    # text minus the prefix, when it is a suffix of text
+
+
+class TTSScheduler:
+    """Priority queue + single synthesis worker for one stream."""
+
+    def __init__(self, stream_id: str, tts):
+        self.stream_id = stream_id
+        self.tts = tts
+        self._heap: list[TTSJob] = []
+        self._seq = itertools.count()
+        self._queued_seconds = 0.0
+        # Monotonic time at which the widget should have played everything sent so far
+        self._playback_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self.phrases = HeavyHitters(
+            settings.TTS_PRERENDER_TOP_K, half_life_seconds=settings.TTS_PRERENDER_HALF_LIFE_SECONDS
+        )
+        # Spoken texts already pre-rendered (or found cached) for this stream's backend
+        self._prerendered: set[str] = set()
+        self._prerendered_for = None
+
+        self.dropped_stale = 0
+        self.dropped_overflow = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.raw_cache_hits = 0  # hits keying on the raw text would also have had
+        self.prerendered = 0
+        self.prerender_hits = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def backlog_seconds(self) -> float:
+        pending_playback = max(0.0, self._playback_until - time.monotonic())
+        return self._queued_seconds + pending_playback
+
+    def submit(
+        self,
+        text: str,
+        content: str,
+        username: str,
+        priority: int = DEFAULT_PRIORITY,
+        raw_text: str | None = None,
+        phrase: str | None = None,
+    ) -> bool:
+        """Queue a job. Returns False if it was rejected because the backlog is full."""
+        job = TTSJob(
+            priority=priority,
+            seq=next(self._seq),
+            text=text,
+            content=content,
+            username=username,
+            enqueued_at=time.monotonic(),
+            est_seconds=estimate_seconds(text),
+            trace=current_trace(),
+            raw_text=raw_text,
+            phrase=phrase if phrase and text.endswith(phrase) else None,
+        )
+
+        if not self._make_room(job):
+            self.dropped_overflow += 1
+            TTS_QUEUE_DROPS.labels(self.stream_id, "overflow").inc()
+            tts_logger.info(
+                "TTS backlog full on stream '%s' (%.0fs), dropping message from %s",
+                self.stream_id, self.backlog_seconds(), username,
+            )
+            return False
+
+        if job.trace is not None:
+            stream_latency(self.stream_id).mark(job.trace, "queued")
+        heapq.heappush(self._heap, job)
+        self._queued_seconds += job.est_seconds
+        self._ensure_worker()
+        self._wakeup.set()
+        return True
+
+    def _make_room(self, job: TTSJob) -> bool:
+        cap = settings.TTS_QUEUE_MAX_SECONDS
+        if cap <= 0:
+            return True
+
+        while self.backlog_seconds() + job.est_seconds > cap:
+            if not self._heap:
+                # Nothing to shed; only accept when the widget is idle so a single
+                # long message can still play. An empty queue holds nothing, whatever
+                # float leftovers the running sum kept.
+                self._queued_seconds = 0.0
+                return self.backlog_seconds() <= 0
+            worst = max(self._heap)
+            if worst.priority <= job.priority:
+                return False
+            self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            self._queued_seconds = max(0.0, self._queued_seconds - worst.est_seconds)
+            self.dropped_overflow += 1
+            TTS_QUEUE_DROPS.labels(self.stream_id, "overflow").inc()
+            tts_logger.info(
+                "TTS backlog full on stream '%s', shedding lower-priority message from %s",
+                self.stream_id, worst.username,
+            )
+        return True
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            # Fresh context: the worker must not inherit the trace of the message that started it
+            self._worker = asyncio.create_task(
+                self._run(), name=f"tts-{self.stream_id}", context=contextvars.Context()
+            )
+
+    async def _run(self):
+        while True:
+            while not self._heap:
+                self._wakeup.clear()
+                if not self._prerender_enabled():
+                    await self._wakeup.wait()
+                    continue
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.TTS_PRERENDER_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    await self._prerender_next()
+
+            jobs = self._take_jobs(getattr(self.tts, "concurrency", 1))
+            if len(jobs) == 1:
+                await self._deliver(jobs[0], await self._synthesize(jobs[0]))
+                continue
+            tasks = [asyncio.create_task(self._synthesize(job)) for job in jobs]
+            try:
+                for job, task in zip(jobs, tasks):
+                    await self._deliver(job, await task)
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    def _take_jobs(self, limit: int) -> list[TTSJob]:
+        """Pop up to limit jobs in priority order, dropping stale ones on the way."""
+        jobs = []
+        max_age = settings.TTS_QUEUE_MAX_AGE_SECONDS
+        while self._heap and len(jobs) < max(1, limit):
+            job = heapq.heappop(self._heap)
+            self._queued_seconds = max(0.0, self._queued_seconds - job.est_seconds)
+
+            age = time.monotonic() - job.enqueued_at
+            if max_age > 0 and age > max_age:
+                self.dropped_stale += 1
+                TTS_QUEUE_DROPS.labels(self.stream_id, "stale").inc()
+                tts_logger.info("Dropping stale TTS from %s (waited %.1fs)", job.username, age)
+                continue
+
+            if job.trace is not None:
+                stream_latency(self.stream_id).mark(job.trace, "dequeued")
+            jobs.append(job)
+        return jobs
+
+    async def _synthesize(self, job: TTSJob) -> tuple[str, bool, float] | None:
+        """Audio for a job as (audio_url, cached, generation_time_ms); None if it failed."""
+        global _active_syntheses, _last_synthesis_at
+        if self.tts is None:
+            return None
+        _active_syntheses += 1
+        try:
+            tts_logger.info("Generating TTS for %s: %.50s...", job.username, job.content)
+            result = await asyncio.to_thread(self._generate_joined, job)
+            if result is not None and job.phrase in self._prerendered:
+                self.prerender_hits += 1
+            if result is None:
+                result = await asyncio.to_thread(self.tts.generate, job.text, job.username)
+            cached = result[1]
+
+            if text_normalize.record_lookup(job.raw_text or job.text, cached):
+                self.raw_cache_hits += 1
+            if cached:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+            if job.trace is not None:
+                stream_latency(self.stream_id).mark(job.trace, "synthesized")
+            return result
+
+        except Exception as e:
+            logger.error(f"TTS generation error: {e}", exc_info=True)
+            return None
+        finally:
+            _active_syntheses -= 1
+            _last_synthesis_at = time.monotonic()
+
+    async def _deliver(self, job: TTSJob, result: tuple[str, bool, float] | None):
+        """Broadcast a synthesized job to the stream's widgets."""
+        if result is None:
+            return
+        audio_url, cached, gen_time = result
+        try:
+            now = time.monotonic()
+            self._playback_until = max(now, self._playback_until) + job.est_seconds
+
+            audio = None
+            limit = inline_audio_limit(self.stream_id)
+            if limit:
+                audio = await asyncio.to_thread(_read_clip, audio_url, limit)
+
+            await broadcast_to_stream(self.stream_id, {
+                'type': 'tts_message',
+                'username': job.username,
+                'text': job.content,
+                'audio_url': audio_url,
+                'cached': cached,
+                'generation_time_ms': gen_time,
+            }, trace=job.trace, audio=audio, audio_type=AUDIO_TYPES.get(Path(audio_url).suffix))
+
+            tts_logger.info("TTS generated: %s (%.0fms, cached=%s)", audio_url, gen_time, cached)
+
+        except Exception as e:
+            logger.error(f"TTS delivery error: {e}", exc_info=True)
+
+    def _generate_joined(self, job: TTSJob) -> tuple[str, bool, float] | None:
+        """
+        The job's prefix clip followed by the cached clip of its phrase, or None
+        when there's no prefix, the phrase isn't cached or the clips can't be joined.
+        The joined clip is cached under both clips' names; counts as cached when
+        it was already there or the prefix clip was.
+        """
+        if not job.phrase or getattr(self.tts, "OUTPUT_EXT", None) != "wav":
+            return None
+        prefix = job.text[: len(job.text) - len(job.phrase)].strip()
+        cached_url = getattr(self.tts, "cached_url", None)
+        phrase_url = cached_url(job.phrase) if prefix and cached_url is not None else None
+        if phrase_url is None:
+            return None
+
+        started = time.perf_counter()
+        prefix_cached_url = cached_url(prefix)
+        if prefix_cached_url is not None:
+            joined_url = audio_cache.cached_url(_joined_path(prefix_cached_url, phrase_url))
+            if joined_url is not None:
+                return joined_url, True, (time.perf_counter() - started) * 1000
+
+        prefix_url, prefix_cached, _ = self.tts.generate(prefix, job.username)
+        prefix_path, phrase_path = _clip_path(prefix_url), _clip_path(phrase_url)
+        if prefix_path is None or phrase_path is None:
+            return None
+        try:
+            joined = audio_processing.concat_wav(
+                [prefix_path.read_bytes(), phrase_path.read_bytes()], gap_ms=SEGMENT_GAP_MS
+            )
+        except (OSError, EOFError, wave.Error):
+            return None  # evicted or unreadable: synthesize the whole text instead
+        if joined is None:
+            return None
+        path = _joined_path(cached_url(prefix) or prefix_url, phrase_url)
+        # Concurrent jobs may join the same pair: never let one read a half-written file
+        tmp = path.with_name(f"{path.name}.{job.seq}.tmp")
+        tmp.write_bytes(joined)
+        tmp.replace(path)
+        return f"/static/cache/{path.name}", prefix_cached, (time.perf_counter() - started) * 1000
+
+    def _prerender_enabled(self) -> bool:
+        if settings.TTS_PRERENDER_TOP_K <= 0 or self.tts is None:
+            return False
+        # Cached phrases are joined to per-user prefixes, which needs WAV
+        if getattr(self.tts, "OUTPUT_EXT", None) != "wav":
+            return False
+        # Local voices only cost idle CPU; anything else may be a paid API
+        return settings.TTS_PRERENDER_PAID or getattr(self.tts, "BACKEND_NAME", None) == "piper"
+
+    def _next_prerender(self) -> str | None:
+        """Most frequent phrase worth pre-rendering that hasn't been yet."""
+        if self._prerendered_for is not self.tts:
+            # Backend changed (stream reconfigured): its cache is a different one
+            self._prerendered.clear()
+            self._prerendered_for = self.tts
+        top = self.phrases.top()
+        # Forget phrases that dropped out of the top, so the set stays bounded
+        self._prerendered.intersection_update(text for _, _, text in top)
+        for _, count, text in top:
+            if count < settings.TTS_PRERENDER_MIN_COUNT:
+                break
+            if text in self._prerendered:
+                continue
+            cached_url = getattr(self.tts, "cached_url", None)
+            if cached_url is not None and cached_url(text):
+                self._prerendered.add(text)
+                continue
+            return text
+        return None
+
+    async def _prerender_next(self):
+        """Synthesize one frequent phrase into the cache once TTS has been idle long enough."""
+        global _active_syntheses
+        if self._heap or _active_syntheses or not self._prerender_enabled():
+            return
+        if time.monotonic() - _last_synthesis_at < settings.TTS_PRERENDER_IDLE_SECONDS:
+            return
+        text = self._next_prerender()
+        if text is None:
+            return
+        _active_syntheses += 1
+        try:
+            _, cached, gen_time = await asyncio.to_thread(self.tts.generate, text, None)
+        except Exception as e:
+            logger.warning(f"Pre-rendering failed on stream '{self.stream_id}': {e}")
+            # Don't retry it on every idle tick
+            self._prerendered.add(text)
+            return
+        finally:
+            _active_syntheses -= 1
+        self._prerendered.add(text)
+        if not cached:
+            self.prerendered += 1
+            TTS_PRERENDERS.labels(self.stream_id).inc()
+            tts_logger.info("Pre-rendered frequent phrase on '%s' (%.0fms): %.50s", self.stream_id, gen_time, text)
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "depth": self.depth,
+            "backlog_seconds": round(self.backlog_seconds(), 1),
+            "dropped_stale": self.dropped_stale,
+            "dropped_overflow": self.dropped_overflow,
+            "cache_hit_ratio": round(self.cache_hits / lookups, 3) if lookups else None,
+            "raw_cache_hit_ratio": round(self.raw_cache_hits / lookups, 3) if lookups else None,
+            "tracked_phrases": len(self.phrases),
+            "prerendered": self.prerendered,
+            "prerender_hits": self.prerender_hits,
+        }
+
+    async def stop(self):
+        """Cancel the worker and discard anything still queued."""
+        self._heap.clear()
+        self._queued_seconds = 0.0
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+
+
+def _clip_path(audio_url: str) -> Path | None:
+    """File behind a generated (/static/audio) or cached (/static/cache) clip URL."""
+    name = Path(audio_url).name
+    if audio_url.startswith("/static/cache/"):
+        return settings.CACHE_DIR / name
+    if audio_url.startswith("/static/audio/"):
+        return settings.AUDIO_OUTPUT_DIR / name
+    return None
+
+
+def _joined_path(prefix_url: str, phrase_url: str) -> Path:
+    """Cache file for a prefix clip joined to a phrase clip, named after both."""
+    key = f"{Path(prefix_url).name}+{Path(phrase_url).name}+{SEGMENT_GAP_MS}"
+    return settings.CACHE_DIR / f"joined_{hashlib.md5(key.encode()).hexdigest()}.wav"
+
+
+def _read_clip(audio_url: str, max_bytes: int) -> bytes | None:
+    """Bytes of a generated or cached clip for inline delivery; None if missing or over max_bytes."""
+    path = _clip_path(audio_url)
+    if path is None:
+        return None
+    try:
+        if path.stat().st_size > max_bytes:
+            return None
+        return path.read_bytes()
+    except OSError:
+        return None
@@ -0,0 +1,122 @@
+"""
+Startup timing and background model warm-up.
+
+The app starts serving as soon as the DB and stream registry are ready; the
+Piper model load, a first throwaway inference (ONNX Runtime optimizes the graph
+on its first run), preloading the most used per-stream Piper voices, a short
+real-time-factor benchmark and the ElevenLabs SDK import all happen afterwards
+in a worker thread. /readyz reports not-ready
+until warm-up has finished, and shows the benchmark result.
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+
+from app.config import settings
+from app.logger import logger
+
+WARMUP_TEXT = "Hola."
+BENCHMARK_TEXTS = [
+    "Hola a todos, gracias por el follow.",
+    "Saludos desde Lima, que buen stream el de hoy, sigan así.",
+]
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class StartupTimer:
+    """Collects named startup phases (ms) and logs them as one breakdown line."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    def record(self, name: str, ms: float):
+        self.phases[name] = round(ms, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def log_summary(self, title: str, names: list[str] | None = None):
+        items = [(n, self.phases[n]) for n in (names or self.phases) if n in self.phases]
+        breakdown = ", ".join(f"{name}={ms:.0f}ms" for name, ms in items)
+        logger.info(f"{title}: {breakdown}")
+
+
+startup_timer = StartupTimer()
+
+
+class ModelWarmup:
+    def __init__(self):
+        self.state = PENDING
+        self.error: str | None = None
+        self.piper_benchmark: dict | None = None
+        self.preloaded_voices: list[str] = []
+        self._task: asyncio.Task | None = None
+
+    @property
+    def done(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="model-warmup")
+
+    async def _run(self):
+        self.state = RUNNING
+        try:
+            await asyncio.to_thread(self._warm_up)
+            self.state = DONE
+        except Exception as e:
+            # Warm-up is an optimization; listeners still build their backends lazily
+            self.error = str(e)
+            self.state = FAILED
+            logger.error(f"Model warm-up failed: {e}", exc_info=True)
+        startup_timer.log_summary(
+            "Model warm-up",
+            ["piper_load", "piper_first_inference", "piper_benchmark", "piper_preload_voices", "elevenlabs_import"],
+        )
+
+    def _warm_up(self):
+        from app.services.piper_tts import get_piper_tts
+        from app.services.piper_voices import piper_voices
+        from app.services.stream_registry import stream_registry
+
+        with startup_timer.phase("piper_load"):
+            piper = get_piper_tts()
+        if piper is not None:
+            with startup_timer.phase("piper_first_inference"):
+                piper.warm_up(WARMUP_TEXT)
+            if settings.PIPER_BENCHMARK_RUNS > 0:
+                with startup_timer.phase("piper_benchmark"):
+                    self.piper_benchmark = piper.benchmark(BENCHMARK_TEXTS, settings.PIPER_BENCHMARK_RUNS)
+                logger.info(
+                    f"Piper real-time factor: {self.piper_benchmark['realtime_factor']} "
+                    f"({self.piper_benchmark['audio_seconds']}s of audio in "
+                    f"{self.piper_benchmark['synthesis_seconds']}s, session {self.piper_benchmark['session']})"
+                )
+
+        with startup_timer.phase("piper_preload_voices"):
+            self.preloaded_voices = piper_voices.preload(stream_registry.all(), warm_up_text=WARMUP_TEXT)
+
+        if settings.ELEVEN_LABS_API_KEY:
+            with startup_timer.phase("elevenlabs_import"):
+                import elevenlabs.client  # noqa: F401
+
+    def snapshot(self) -> dict:
+        return {
+            "state": self.state,
+            "error": self.error,
+            "preloaded_voices": self.preloaded_voices,
+            "piper_benchmark": self.piper_benchmark,
+        }
+
+
+model_warmup = ModelWarmup()
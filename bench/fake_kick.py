@@ -0,0 +1,211 @@
+"""
+Local stand-ins for Kick: a Pusher-compatible websocket and the REST lookups.
+
+One aiohttp server provides:
+    GET /api/v2/channels/{channel}   -> {"chatroom": {"id": ...}}
+    GET /api/v2/users/{user_id}      -> {"username": ...}
+    WS  /app/{key}                   -> Pusher protocol 7 (subscribe, ping/pong)
+
+Every subscribed chatroom gets a replay task that sends chat frames at
+`rate` messages/sec with a deterministic mix of plain chat, !s TTS, sound
+commands, emotes and the occasional follow/subscription event.
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from aiohttp import WSMsgType, web
+
+CHAT_LINES = [
+    "hola a todos",
+    "que buen stream",
+    "jajaja no puede ser",
+    "saludos desde Lima",
+    "alguien sabe a que hora termina?",
+    "ese juego esta buenisimo",
+    "gg wp",
+    "primera vez por aqui",
+    "vamos vamos vamos",
+    "eso fue epico",
+]
+TTS_LINES = [
+    "hola que tal el stream de hoy",
+    "saludos a todo el chat",
+    "eso estuvo increible",
+    "cuando juegas con nosotros",
+    "buenas noches desde Mexico",
+    "que cancion es esta",
+]
+EMOTE_LINES = ["[emote:37226:KEKW] [emote:37226:KEKW]", "jaja [emote:39261:LULW]"]
+
+
+def chat_frame(chatroom_id: int, username: str, content: str, badges: list[str], sent_at: float) -> str:
+    data = {
+        "id": f"{chatroom_id}-{sent_at}",
+        "chatroom_id": chatroom_id,
+        "content": content,
+        "type": "message",
+        "created_at": sent_at,
+        "sender": {
+            "id": abs(hash(username)) % 10_000_000,
+            "username": username,
+            "slug": username.lower(),
+            "identity": {"color": "#75FD46", "badges": [{"type": b, "text": b} for b in badges]},
+        },
+    }
+    return json.dumps({
+        "event": "App\\Events\\ChatMessageEvent",
+        "data": json.dumps(data),
+        "channel": f"chatrooms.{chatroom_id}.v2",
+    })
+
+
+class MessageMix:
+    """Deterministic stream of (content, badges) following the configured ratios."""
+
+    def __init__(self, seed: int, tts_ratio: float, sound_ratio: float, emote_ratio: float, sounds: list[str]):
+        self._rng = random.Random(seed)
+        self.tts_ratio = tts_ratio
+        self.sound_ratio = sound_ratio
+        self.emote_ratio = emote_ratio
+        self.sounds = sounds or ["alan"]
+        self._n = itertools.count()
+
+    def next(self) -> tuple[str, list[str]]:
+        roll = self._rng.random()
+        n = next(self._n)
+        badges = self._rng.choice([[], ["subscriber"], ["vip"], ["og", "subscriber"], []])
+        if roll < self.tts_ratio:
+            # Suffix keeps texts unique so the duplicate filter doesn't hide load
+            return f"!s {self._rng.choice(TTS_LINES)} {n}", badges
+        roll -= self.tts_ratio
+        if roll < self.sound_ratio:
+            return f"!{self._rng.choice(self.sounds)}", badges
+        roll -= self.sound_ratio
+        if roll < self.emote_ratio:
+            return f"!s {self._rng.choice(EMOTE_LINES)}", badges
+        return self._rng.choice(CHAT_LINES), badges
+
+
+class FakeKick:
+    def __init__(
+        self,
+        rate: float,
+        users: int = 500,
+        tts_ratio: float = 0.3,
+        sound_ratio: float = 0.1,
+        emote_ratio: float = 0.05,
+        follow_every: int = 0,
+        sounds: list[str] | None = None,
+        seed: int = 1,
+    ):
+        self.rate = rate
+        self.users = [f"viewer{i}" for i in range(users)]
+        self.tts_ratio = tts_ratio
+        self.sound_ratio = sound_ratio
+        self.emote_ratio = emote_ratio
+        self.follow_every = follow_every
+        self.sounds = sounds or []
+        self.seed = seed
+
+        self.chatrooms: dict[str, int] = {}
+        self.sent = 0
+        self.rest_calls = 0
+        self._replays: list[asyncio.Task] = []
+        self._runner: web.AppRunner | None = None
+        self.port: int | None = None
+        self.running = True
+
+    def chatroom_id(self, channel: str) -> int:
+        if channel not in self.chatrooms:
+            self.chatrooms[channel] = 1000 + len(self.chatrooms)
+        return self.chatrooms[channel]
+
+    @property
+    def api_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/v2"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}/app/fakekey"
+
+    async def start(self, port: int = 0):
+        app = web.Application()
+        app.router.add_get("/api/v2/channels/{channel}", self._channel)
+        app.router.add_get("/api/v2/users/{user_id}", self._user)
+        app.router.add_get("/app/{key}", self._pusher)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.running = False
+        for task in self._replays:
+            task.cancel()
+        await asyncio.gather(*self._replays, return_exceptions=True)
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _channel(self, request: web.Request):
+        self.rest_calls += 1
+        channel = request.match_info["channel"]
+        return web.json_response({"slug": channel, "chatroom": {"id": self.chatroom_id(channel)}})
+
+    async def _user(self, request: web.Request):
+        self.rest_calls += 1
+        return web.json_response({"username": f"sub{request.match_info['user_id']}"})
+
+    async def _pusher(self, request: web.Request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        await ws.send_str(json.dumps({
+            "event": "pusher:connection_established",
+            "data": json.dumps({"socket_id": f"{id(ws)}.1", "activity_timeout": 120}),
+        }))
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            frame = json.loads(msg.data)
+            event = frame.get("event")
+            if event == "pusher:ping":
+                await ws.send_str(json.dumps({"event": "pusher:pong", "data": "{}"}))
+            elif event == "pusher:subscribe":
+                channel = frame["data"]["channel"]
+                await ws.send_str(json.dumps({
+                    "event": "pusher_internal:subscription_succeeded", "data": "{}", "channel": channel,
+                }))
+                chatroom_id = int(channel.split(".")[1])
+                self._replays.append(asyncio.create_task(self._replay(ws, chatroom_id)))
+        return ws
+
+    async def _replay(self, ws: web.WebSocketResponse, chatroom_id: int):
+        """Send chat to one chatroom at self.rate msg/s, catching up if the loop falls behind."""
+        mix = MessageMix(self.seed + chatroom_id, self.tts_ratio, self.sound_ratio, self.emote_ratio, self.sounds)
+        rng = random.Random(self.seed * 31 + chatroom_id)
+        interval = 1.0 / self.rate
+        next_at = time.monotonic()
+        n = 0
+        while self.running and not ws.closed:
+            now = time.monotonic()
+            if next_at > now:
+                await asyncio.sleep(next_at - now)
+            next_at += interval
+            n += 1
+            if self.follow_every and n % self.follow_every == 0:
+                frame = json.dumps({
+                    "event": "App\\Events\\FollowEvent",
+                    "data": json.dumps({"follower": {"username": rng.choice(self.users)}}),
+                    "channel": f"chatrooms.{chatroom_id}.v2",
+                })
+            else:
+                content, badges = mix.next()
+                frame = chat_frame(chatroom_id, rng.choice(self.users), content, badges, time.time())
+            try:
+                await ws.send_str(frame)
+            except ConnectionError:
+                return
+            self.sent += 1
@@ -0,0 +1,276 @@
+"""
+End-to-end load test: fake Kick -> StreamManager/KickListener -> widget sockets.
+
+Runs fully offline on one box. A FakeKick server (bench/fake_kick.py) stands in
+for Pusher and the Kick REST API, the app's widget websocket router is served
+by an in-process uvicorn, and simulated widgets connect to every stream and ack
+each traced message ("received", then "playback" straight away; they don't
+queue audio like the real widget does).
+
+    python -m bench.loadtest --streams 20 --rate 5 --duration 30 --widgets 2
+
+Reports offered/processed/delivered messages per second, per-stage latency
+percentiles from app.services.tracing, scheduler drops, event-loop lag, CPU
+and memory. Pass --output to also write the JSON report to a file.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import statistics
+import time
+
+import uvicorn
+import websockets
+from fastapi import FastAPI
+
+from app.config import settings
+from app.logger import logger
+from app.routes import websocket as widget_ws
+from app.services import tracing
+from app.services.circuit_breaker import breaker_snapshot
+from app.services.stream_manager import stream_manager
+from bench.fake_kick import FakeKick
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"samples": 0}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], 3)
+
+    return {
+        "samples": len(ordered),
+        "p50_ms": pick(50),
+        "p90_ms": pick(90),
+        "p99_ms": pick(99),
+        "max_ms": round(ordered[-1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def _proc_status_kb(field: str) -> int | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class WidgetClient:
+    """Simulated widget: counts messages by type and acks traced ones."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.received: dict[str, int] = {}
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    @property
+    def total(self) -> int:
+        return sum(self.received.values())
+
+    async def _run(self):
+        async with websockets.connect(self.url) as ws:
+            async for raw in ws:
+                data = json.loads(raw)
+                kind = data.get("type", "unknown")
+                self.received[kind] = self.received.get(kind, 0) + 1
+                trace_id = data.get("trace_id")
+                if trace_id:
+                    await ws.send(json.dumps({"type": "ack", "trace_id": trace_id, "stage": "received"}))
+                    await ws.send(json.dumps({"type": "ack", "trace_id": trace_id, "stage": "playback"}))
+
+
+class LoopLag:
+    """Measures how late a 10ms sleep wakes up: a proxy for event-loop saturation."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append((time.perf_counter() - started - self.interval) * 1000)
+
+
+def _counters(fake: FakeKick, widgets: list[WidgetClient]) -> dict:
+    listeners = stream_manager._listeners.values()
+    cpu = os.times()
+    return {
+        "at": time.perf_counter(),
+        "cpu": cpu.user + cpu.system,
+        "sent": fake.sent,
+        "frames": sum(l.frames for l in listeners),
+        "delivered": sum(w.total for w in widgets),
+    }
+
+
+def _stage_report() -> dict:
+    pooled: dict[str, dict[str, list[float]]] = {}
+    for stream_id in list(stream_manager._listeners):
+        for (kind, stage), histogram in tracing.stream_latency(stream_id).histograms().items():
+            pooled.setdefault(kind, {}).setdefault(stage, []).extend(histogram.samples())
+    return {kind: {stage: _percentiles(s) for stage, s in stages.items()} for kind, stages in pooled.items()}
+
+
+async def run(args) -> dict:
+    sounds = sorted(p.stem for p in settings.SOUNDS_DIR.glob("*.mp3"))[:20]
+    fake = FakeKick(
+        rate=args.rate,
+        users=args.users,
+        tts_ratio=args.tts_ratio,
+        sound_ratio=args.sound_ratio if settings.ENABLE_SOUNDS else 0.0,
+        follow_every=args.follow_every,
+        sounds=sounds,
+        seed=args.seed,
+    )
+    await fake.start()
+    settings.KICK_WEBSOCKET_URL = fake.ws_url
+    settings.KICK_API_URL = fake.api_url
+
+    app = FastAPI()
+    app.include_router(widget_ws.router)
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    tts_enabled = args.tts_backend != "none"
+    stream_ids = [f"bench{i}" for i in range(args.streams)]
+    widgets = [
+        WidgetClient(f"ws://127.0.0.1:{port}/{sid}/events")
+        for sid in stream_ids
+        for _ in range(args.widgets)
+    ]
+    for w in widgets:
+        w.start()
+    for i, sid in enumerate(stream_ids):
+        await stream_manager.start_stream(
+            sid, f"benchchannel{i}",
+            tts_backend=args.tts_backend if tts_enabled else "synthetic",
+            tts_enabled=tts_enabled,
+        )
+
+    lag = LoopLag()
+    lag.start()
+    await asyncio.sleep(args.warmup)
+
+    # Measure only the steady state
+    for sid in stream_ids:
+        tracing.forget_stream(sid)
+    lag.samples.clear()
+    before = _counters(fake, widgets)
+    await asyncio.sleep(args.duration)
+    after = _counters(fake, widgets)
+    stages = _stage_report()
+    scheduler_stats = {sid: l.scheduler.stats() for sid, l in stream_manager._listeners.items()}
+
+    elapsed = after["at"] - before["at"]
+    report = {
+        "config": {
+            "streams": args.streams,
+            "rate_per_stream": args.rate,
+            "widgets_per_stream": args.widgets,
+            "tts_backend": args.tts_backend,
+            "tts_ratio": args.tts_ratio,
+            "duration_s": args.duration,
+        },
+        "throughput": {
+            "offered_msgs_per_s": round((after["sent"] - before["sent"]) / elapsed, 1),
+            "processed_frames_per_s": round((after["frames"] - before["frames"]) / elapsed, 1),
+            "widget_msgs_per_s": round((after["delivered"] - before["delivered"]) / elapsed, 1),
+        },
+        "latency_ms": stages,
+        "event_loop_lag_ms": _percentiles(lag.samples),
+        "scheduler": {
+            "dropped_stale": sum(s["dropped_stale"] for s in scheduler_stats.values()),
+            "dropped_overflow": sum(s["dropped_overflow"] for s in scheduler_stats.values()),
+            "max_depth": max((s["depth"] for s in scheduler_stats.values()), default=0),
+        },
+        "resources": {
+            "cpu_percent": round((after["cpu"] - before["cpu"]) / elapsed * 100, 1),
+            "rss_mb": round((_proc_status_kb("VmRSS") or 0) / 1024, 1),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "kick_rest_calls": fake.rest_calls,
+        "tts_backends": breaker_snapshot(),
+    }
+
+    await lag.stop()
+    for sid in stream_ids:
+        await stream_manager.stop_stream(sid)
+    for w in widgets:
+        await w.stop()
+    server.should_exit = True
+    await server_task
+    await fake.stop()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=5.0, help="chat messages/sec per stream")
+    parser.add_argument("--widgets", type=int, default=1, help="widget clients per stream")
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds before measuring")
+    parser.add_argument("--users", type=int, default=500, help="distinct chatters per channel")
+    parser.add_argument(
+        "--tts-backend", default="synthetic", help="synthetic, piper, elevenlabs or none (TTS disabled)"
+    )
+    parser.add_argument("--tts-ratio", type=float, default=0.3, help="share of messages that are !s TTS")
+    parser.add_argument("--sound-ratio", type=float, default=0.1, help="share of messages that are sound commands")
+    parser.add_argument("--follow-every", type=int, default=0, help="send a follow event every N frames (0 = off)")
+    parser.add_argument("--cooldown", type=float, default=None, help="override COOLDOWN_SECONDS")
+    parser.add_argument("--log-level", default="WARNING", help="app log level during the run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    logger.setLevel(args.log_level.upper())
+    if args.cooldown is not None:
+        settings.COOLDOWN_SECONDS = args.cooldown
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
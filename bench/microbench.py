@@ -0,0 +1,362 @@
+"""
+Microbenchmarks for the per-message chat hot path.
+
+    python -m bench.microbench                    # run, save bench/results/<commit>.json
+    python -m bench.microbench --only handle      # cases whose name contains 'handle'
+    python -m bench.microbench --compare a1b2c3d  # compare a saved run with the latest one
+    python -m bench.microbench --compare a1b2c3d f4e5d6c --threshold 1.15
+
+Each case is timed in several rounds (sync cases with timeit, async ones by
+awaiting them in a tight loop inside one event loop); the median per-op time
+is what gets stored and compared. --compare exits with status 1 when any case
+got slower than --threshold times its baseline, so it can gate CI.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+from pathlib import Path
+from typing import Awaitable, Callable
+
+from app.config import settings
+from app.logger import logger
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+_cases: dict[str, Callable[[], Callable]] = {}
+
+
+def case(name: str):
+    """Register a setup function returning the callable (sync or async) to time."""
+    def register(setup):
+        _cases[name] = setup
+        return setup
+    return register
+
+
+# --- fixtures ---
+
+class _NullScheduler:
+    """Accepts jobs without synthesizing, so handler cost is measured alone."""
+
+    tts = object()
+
+    def __init__(self):
+        from app.services.chat_state import HeavyHitters
+
+        self.submitted = 0
+        self.phrases = HeavyHitters(
+            settings.TTS_PRERENDER_TOP_K, half_life_seconds=settings.TTS_PRERENDER_HALF_LIFE_SECONDS
+        )
+
+    def submit(self, text, content, username, priority=0, raw_text=None, phrase=None) -> bool:
+        self.submitted += 1
+        return True
+
+
+class _FakeSocket:
+    """Stands in for a widget WebSocket: serializes like Starlette's send_json, sends nowhere."""
+
+    async def send_json(self, message: dict):
+        json.dumps(message, separators=(",", ":"))
+
+
+def _chat_event(content: str, username: str = "viewer1") -> dict:
+    return {
+        "id": "0f6b1c6e",
+        "chatroom_id": 1000,
+        "content": content,
+        "type": "message",
+        "sender": {
+            "id": 42,
+            "username": username,
+            "slug": username,
+            "identity": {"color": "#75FD46", "badges": [{"type": "subscriber", "text": "Subscriber"}]},
+        },
+    }
+
+
+def _chat_handler():
+    from app.events.chat import ChatEventHandler
+
+    return ChatEventHandler(scheduler=_NullScheduler(), tts_enabled=True)
+
+
+def _rotating(template: str, n: int = 4096) -> Callable[[], str]:
+    """Distinct texts so the duplicate filter doesn't short-circuit the path."""
+    texts = [template.format(i=i) for i in range(n)]
+    counter = iter(range(sys.maxsize))
+    return lambda: texts[next(counter) % n]
+
+
+def _handle_case(template: str):
+    handler = _chat_handler()
+    next_text = _rotating(template)
+    users = [f"viewer{i}" for i in range(4096)]
+    counter = iter(range(sys.maxsize))
+
+    async def run():
+        i = next(counter)
+        await handler.handle(_chat_event(next_text(), users[i % len(users)]), "bench")
+
+    return run
+
+
+# --- cases ---
+
+@case("process_message.decode")
+def _process_message():
+    from app.services.kick_listener import KickListener
+
+    listener = KickListener("bench", "bench", tts_enabled=False)
+    listener._handlers = {}  # decode + routing only, no handler work
+    frame = json.dumps({
+        "event": "App\\Events\\ChatMessageEvent",
+        "data": json.dumps(_chat_event("hola a todos, que buen stream")),
+        "channel": "chatrooms.1000.v2",
+    })
+
+    async def run():
+        await listener._process_message(frame)
+
+    return run
+
+
+@case("handle.plain")
+def _handle_plain():
+    return _handle_case("hola a todos que buen stream {i}")
+
+
+@case("handle.tts")
+def _handle_tts():
+    command = settings.TTS_COMMAND.lstrip("!")
+    return _handle_case(f"!{command} saludos desde Lima numero {{i}}")
+
+
+@case("handle.sound")
+def _handle_sound():
+    sounds = sorted(settings.SOUNDS_DIR.glob("*.mp3"))
+    name = sounds[0].stem if sounds else "missing"
+    return _handle_case(f"!{name}")
+
+
+@case("handle.sticker")
+def _handle_sticker():
+    stickers = []
+    if settings.STICKERS_DIR.exists():
+        stickers = sorted(p.name for p in settings.STICKERS_DIR.iterdir() if p.is_dir())
+    name = stickers[0] if stickers else "missing"
+    return _handle_case(f"!sticker {name}")
+
+
+@case("emote_pattern.search")
+def _emote_pattern():
+    from app.events.chat import EMOTE_PATTERN
+
+    texts = [
+        "hola a todos que buen stream, saludos desde Lima",
+        "jajaja [emote:37226:KEKW] no puede ser",
+        "x" * 200,
+    ]
+
+    def run():
+        for text in texts:
+            EMOTE_PATTERN.search(text)
+
+    return run
+
+
+@case("cache_key.piper")
+def _cache_key_piper():
+    from app.services.piper_tts import PiperTTS
+
+    tts = object.__new__(PiperTTS)  # skip model loading; only the key is timed
+    return lambda: tts._get_cache_key("saludos desde Lima, que buen stream")
+
+
+@case("cache_key.elevenlabs")
+def _cache_key_elevenlabs():
+    from app.services.elevenlabs_tts import ElevenLabsTTS
+
+    tts = object.__new__(ElevenLabsTTS)  # skip SDK client setup
+    tts.voice_id = settings.ELEVEN_LABS_VOICE_ID
+    tts._voice_settings = {
+        "stability": settings.ELEVEN_LABS_STABILITY,
+        "similarity_boost": settings.ELEVEN_LABS_SIMILARITY_BOOST,
+        "style": settings.ELEVEN_LABS_STYLE,
+        "speed": settings.ELEVEN_LABS_SPEED,
+    }
+    return lambda: tts._get_cache_key("saludos desde Lima, que buen stream")
+
+
+@case("audio_postprocess.3s_clip")
+def _audio_postprocess():
+    import numpy as np
+
+    from app.services import audio_processing
+
+    sample_rate = 22050
+    rng = np.random.default_rng(1)
+    speech = (rng.normal(0, 3000, sample_rate) * np.sin(np.arange(sample_rate) / 40)).astype(np.int16)
+    silence = rng.normal(0, 20, sample_rate // 2).astype(np.int16)
+    pcm = np.concatenate([silence, speech, silence, speech, silence])
+    return lambda: audio_processing.process(pcm, sample_rate)
+
+
+def _broadcast_case(sockets: int):
+    from app.routes import websocket
+
+    websocket._connections[f"bench{sockets}"] = [_FakeSocket() for _ in range(sockets)]
+    message = {
+        "type": "tts_message",
+        "username": "viewer1",
+        "text": "saludos desde Lima",
+        "audio_url": "/static/cache/0123456789abcdef.wav",
+        "cached": True,
+        "generation_time_ms": 1.2,
+    }
+
+    async def run():
+        await websocket.broadcast_to_stream(f"bench{sockets}", message)
+
+    return run
+
+
+for _n in (1, 10, 100):
+    case(f"broadcast.{_n}_sockets")(lambda n=_n: _broadcast_case(n))
+
+
+# --- runner ---
+
+def _time_sync(fn: Callable, rounds: int, min_time: float) -> list[float]:
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return [t / number for t in timer.repeat(repeat=rounds, number=number)]
+
+
+async def _time_async(fn: Callable[[], Awaitable], rounds: int, min_time: float) -> list[float]:
+    number = 1
+    while True:  # autorange, like timeit
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        if time.perf_counter() - started >= min_time:
+            break
+        number *= 2
+    results = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            await fn()
+        results.append((time.perf_counter() - started) / number)
+    return results
+
+
+def run_cases(only: str | None, rounds: int, min_time: float) -> dict:
+    results = {}
+    for name, setup in _cases.items():
+        if only and only not in name:
+            continue
+        fn = setup()
+        if asyncio.iscoroutinefunction(fn):
+            per_op = asyncio.run(_time_async(fn, rounds, min_time))
+        else:
+            per_op = _time_sync(fn, rounds, min_time)
+        results[name] = {
+            "median_us": round(statistics.median(per_op) * 1e6, 3),
+            "min_us": round(min(per_op) * 1e6, 3),
+            "rounds": rounds,
+        }
+        print(f"{name:32s} {results[name]['median_us']:>10.3f} us/op (min {results[name]['min_us']:.3f})")
+    return results
+
+
+def _git(*args: str) -> str:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def save(results: dict) -> Path:
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    path.write_text(json.dumps({
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }, indent=2) + "\n")
+    return path
+
+
+def _load(ref: str) -> dict:
+    path = Path(ref)
+    if not path.exists():
+        path = RESULTS_DIR / f"{ref}.json"
+    if not path.exists():
+        matches = sorted(RESULTS_DIR.glob(f"{ref}*.json"))
+        if not matches:
+            raise SystemExit(f"No saved results for '{ref}' in {RESULTS_DIR}")
+        path = matches[0]
+    return json.loads(path.read_text())
+
+
+def _latest() -> str:
+    runs = sorted(RESULTS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    if not runs:
+        raise SystemExit(f"No saved results in {RESULTS_DIR}")
+    return str(runs[-1])
+
+
+def compare(base_ref: str, head_ref: str, threshold: float) -> int:
+    base, head = _load(base_ref), _load(head_ref)
+    print(f"{'case':32s} {base['commit']:>12s} {head['commit']:>12s}   ratio")
+    regressions = 0
+    for name, result in head["results"].items():
+        before = base["results"].get(name)
+        if before is None:
+            print(f"{name:32s} {'-':>12s} {result['median_us']:>12.3f}   new")
+            continue
+        ratio = result["median_us"] / before["median_us"] if before["median_us"] else float("inf")
+        flag = "  SLOWER" if ratio > threshold else ""
+        regressions += ratio > threshold
+        print(f"{name:32s} {before['median_us']:>12.3f} {result['median_us']:>12.3f}   {ratio:.2f}x{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="run only cases whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per round")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", nargs="+", metavar="REF", help="BASE [HEAD]: commit, file or prefix")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio that counts as a regression")
+    parser.add_argument("--log-level", default="WARNING", help="app log level while timing")
+    args = parser.parse_args()
+
+    if args.compare:
+        base = args.compare[0]
+        head = args.compare[1] if len(args.compare) > 1 else _latest()
+        sys.exit(compare(base, head, args.threshold))
+
+    logger.setLevel(args.log_level.upper())
+    settings.COOLDOWN_SECONDS = 0  # every timed message must reach its command handler
+    results = run_cases(args.only, args.rounds, args.min_time)
+    if not args.no_save:
+        print(f"Saved {save(results)}")
+
+
+if __name__ == "__main__":
+    main()
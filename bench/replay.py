@@ -0,0 +1,121 @@
+"""
+Replay recorded Kick frames (RECORD_FRAMES=true) through the real handlers.
+
+    python -m bench.replay data/recordings/mystream                  # 1x, original pacing
+    python -m bench.replay data/recordings/mystream --speed 10       # 10x faster
+    python -m bench.replay frames-20260101-120000-000000.jsonl.gz --speed max
+
+Frames go through KickListener._process_message, i.e. JSON decoding, tracing
+and handle_event, with the stream's TTS scheduler attached to the chosen
+backend (synthetic by default, so runs are deterministic and offline). No
+widgets are connected, so broadcasts are skipped. Gaps longer than --max-gap
+seconds (idle chat, process restarts) are shortened to --max-gap.
+
+Prints a JSON report: frames replayed, achieved frames/sec, how far behind
+schedule frames were handled, per-stage latency and scheduler stats, CPU time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.config import settings
+from app.logger import logger
+from app.services import tracing
+from app.services.kick_listener import KickListener
+from app.services.recorder import read_frames
+from app.services.tts import build_tts
+from bench.loadtest import _percentiles
+
+
+async def replay(args) -> dict:
+    tts_enabled = args.tts_backend != "none"
+    listener = KickListener("replay", args.stream_id, tts_backend=args.tts_backend, tts_enabled=tts_enabled)
+    if tts_enabled:
+        listener.scheduler.tts = await asyncio.to_thread(build_tts, args.tts_backend, None)
+
+    speed = None if args.speed == "max" else float(args.speed)
+    lateness_ms: list[float] = []
+    frames = 0
+    cpu_before = os.times()
+    started = time.perf_counter()
+    schedule = 0.0  # seconds into the recording, gaps capped at --max-gap
+    previous_t = None
+
+    for t, frame in read_frames(args.paths):
+        if previous_t is not None:
+            schedule += min(max(0.0, t - previous_t), args.max_gap)
+        previous_t = t
+
+        if speed is not None:
+            due = started + schedule / speed
+            now = time.perf_counter()
+            if due > now:
+                await asyncio.sleep(due - now)
+            lateness_ms.append(max(0.0, time.perf_counter() - due) * 1000)
+
+        listener.frames += 1
+        try:
+            await listener._process_message(frame)
+        except Exception as e:
+            logger.error(f"Error replaying frame: {e}")
+        frames += 1
+        if args.limit and frames >= args.limit:
+            break
+        if speed is None and frames % 256 == 0:
+            await asyncio.sleep(0)  # let the TTS worker run
+
+    replay_seconds = time.perf_counter() - started
+    if args.drain:
+        while listener.scheduler.depth:
+            await asyncio.sleep(0.05)
+    cpu_after = os.times()
+    await listener.scheduler.stop()
+
+    stages: dict[str, dict] = {}
+    for (kind, stage), histogram in tracing.stream_latency(args.stream_id).histograms().items():
+        stages.setdefault(kind, {})[stage] = _percentiles(histogram.samples())
+    return {
+        "frames": frames,
+        "recording_seconds": round(schedule, 3),
+        "replay_seconds": round(replay_seconds, 3),
+        "speed": args.speed,
+        "frames_per_s": round(frames / replay_seconds, 1) if replay_seconds else None,
+        "lateness_ms": _percentiles(lateness_ms) if speed is not None else None,
+        "latency_ms": stages,
+        "scheduler": listener.scheduler.stats(),
+        "cpu_seconds": round((cpu_after.user + cpu_after.system) - (cpu_before.user + cpu_before.system), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="recording files or a stream's recording directory")
+    parser.add_argument("--speed", default="1", help="playback speed multiplier, or 'max'")
+    parser.add_argument("--max-gap", type=float, default=5.0, help="longest pause kept between frames (s)")
+    parser.add_argument("--stream-id", default="replay")
+    parser.add_argument("--tts-backend", default="synthetic", help="synthetic, piper, elevenlabs or none")
+    parser.add_argument("--drain", action="store_true", help="wait for the TTS queue to empty before reporting")
+    parser.add_argument("--fresh-cache", action="store_true", help="synthesize into an empty temp cache dir")
+    parser.add_argument("--limit", type=int, default=0, help="stop after N frames (0 = all)")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+
+    logger.setLevel(args.log_level.upper())
+    if args.fresh_cache:
+        # Same cache hits on every run, whatever earlier runs left in static/cache
+        settings.CACHE_DIR = Path(tempfile.mkdtemp(prefix="replay-cache-"))
+    report = asyncio.run(replay(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
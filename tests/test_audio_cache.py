@@ -0,0 +1,32 @@
+import os
+
+from app.services import audio_cache
+from app.services.audio_cache import AudioCacheJanitor
+
+
+def _clip(directory, name, size, mtime):
+    path = directory / name
+    path.write_bytes(b"\0" * size)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_eviction_is_lru_and_skips_non_audio(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_cache.settings, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(audio_cache.settings, "TTS_CACHE_MAX_MB", 1)
+    keep = _clip(tmp_path, ".gitkeep", 0, 1)
+    notes = _clip(tmp_path, "README.txt", 600 * 1024, 2)
+    old = _clip(tmp_path, "old.wav", 600 * 1024, 3)
+    new = _clip(tmp_path, "new.mp3", 600 * 1024, 4)
+
+    assert audio_cache.cached_url(old) == "/static/cache/old.wav"  # a hit makes it the newest
+    janitor = AudioCacheJanitor()
+    janitor.scan()
+
+    assert old.exists() and not new.exists()
+    assert keep.exists() and notes.exists()
+    assert (janitor.files, janitor.bytes) == (1, 600 * 1024)
+
+
+def test_cached_url_misses_absent_clip(tmp_path):
+    assert audio_cache.cached_url(tmp_path / "missing.wav") is None
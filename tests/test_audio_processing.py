@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from app.services import audio_processing
+from app.services.audio_processing import process
+
+RATE = 16000
+
+
+def _tone(seconds, amplitude):
+    t = np.arange(int(RATE * seconds)) / RATE
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+def _silence(seconds):
+    return np.zeros(int(RATE * seconds), dtype=np.int16)
+
+
+def _lufs(pcm):
+    mean_square = np.mean(pcm.astype(np.float64) ** 2) / 32768.0 ** 2
+    return -0.691 + 10 * np.log10(mean_square)
+
+
+@pytest.fixture(autouse=True)
+def defaults(monkeypatch):
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_SILENCE_DB", -45.0)
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_SILENCE_PAD_MS", 60)
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_MAX_PAUSE_MS", 0)
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_TARGET_LUFS", 0)
+
+
+def test_trims_edge_silence_keeping_the_pad():
+    pcm = np.concatenate([_silence(0.5), _tone(1.0, 8000), _silence(0.7)])
+    out = process(pcm, RATE)
+    assert len(out) == int(RATE * (1.0 + 2 * 0.06))
+    assert out.base is not None  # trim-only is a view, not a copy
+
+
+def test_shortens_long_pauses_only_when_asked(monkeypatch):
+    pcm = np.concatenate([_tone(0.5, 8000), _silence(1.0), _tone(0.5, 8000)])
+    assert len(process(pcm, RATE)) == len(pcm)
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_MAX_PAUSE_MS", 200)
+    assert len(process(pcm, RATE)) == int(RATE * (0.5 + 0.2 + 0.5))
+
+
+def test_normalizes_towards_target_lufs(monkeypatch):
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_TARGET_LUFS", -18.0)
+    quiet = process(_tone(2.0, 1000), RATE)
+    assert abs(_lufs(quiet) - -18.0) < 0.5
+
+
+def test_gain_is_limited_by_the_peak_ceiling(monkeypatch):
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_TARGET_LUFS", -3.0)
+    # Speech-like: mostly quiet with one loud spike, so the loudness gain would clip it
+    pcm = np.concatenate([_tone(2.0, 500), _tone(0.05, 20000)])
+    out = process(pcm, RATE)
+    assert np.abs(out.astype(np.int32)).max() <= audio_processing.PEAK_CEILING + 1
+
+
+def test_silent_clip_is_left_alone():
+    pcm = _silence(1.0)
+    assert process(pcm, RATE) is pcm
+
+
+def test_cache_tag_follows_settings(monkeypatch):
+    tag = audio_processing.cache_tag()
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_TARGET_LUFS", -16.0)
+    assert audio_processing.cache_tag() != tag
+    monkeypatch.setattr(audio_processing.settings, "AUDIO_POSTPROCESS", False)
+    assert audio_processing.cache_tag() == ""
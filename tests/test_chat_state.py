@@ -0,0 +1,69 @@
+import pytest
+
+from app.services import chat_state
+from app.services.chat_state import CooldownTracker, RecentTextWindow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(chat_state, "time", fake)
+    return fake
+
+
+def test_cooldown_blocks_until_ttl_passes(clock):
+    cooldowns = CooldownTracker(10)
+    assert cooldowns.allow("ana")
+    clock.now += 9
+    assert not cooldowns.allow("ana")
+    assert cooldowns.allow("bob")
+    clock.now += 1
+    assert cooldowns.allow("ana")
+
+
+def test_cooldown_holds_across_bucket_rotation(clock):
+    cooldowns = CooldownTracker(10)
+    clock.now += 8
+    assert cooldowns.allow("ana")
+    clock.now += 3  # bucket rotated, ana now lives in the previous one
+    assert not cooldowns.allow("ana")
+
+
+def test_cooldown_forgets_users_after_two_ttls(clock):
+    cooldowns = CooldownTracker(10)
+    for i in range(1000):
+        cooldowns.allow(f"user{i}")
+    assert len(cooldowns) == 1000
+    clock.now += 25
+    cooldowns.allow("late")
+    assert len(cooldowns) == 1
+
+
+def test_recent_texts_expire_after_window(clock):
+    window = RecentTextWindow(60, 100)
+    window.add("copypasta")
+    for i in range(10):
+        window.add(f"other {i}")
+    assert window.contains("copypasta")
+    clock.now += 60
+    assert not window.contains("copypasta")
+    assert len(window) == 0
+
+
+def test_recent_texts_capped_at_max_items(clock):
+    window = RecentTextWindow(60, 3)
+    for text in ("a", "b", "a", "c"):
+        window.add(text)
+    assert len(window) == 3
+    # The oldest "a" fell out, the newer one still counts
+    assert window.contains("a") and window.contains("b") and window.contains("c")
+    window.add("d")
+    assert not window.contains("b")
@@ -0,0 +1,136 @@
+import pytest
+
+from app.services import circuit_breaker
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from app.services.tts import FallbackTTS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeBackend:
+    def __init__(self, name: str, fail: bool = False):
+        self.BACKEND_NAME = name
+        self.fail = fail
+        self.cached: set[str] = set()
+        self.calls = 0
+
+    def cached_url(self, text: str):
+        return f"/static/cache/{self.BACKEND_NAME}-{text}" if text in self.cached else None
+
+    def generate(self, text: str, username: str = None, use_cache: bool = True):
+        if use_cache and text in self.cached:
+            return self.cached_url(text), True, 0.0
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError(f"{self.BACKEND_NAME} down")
+        return f"/static/audio/{self.BACKEND_NAME}-{text}", False, 1.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_HEDGE_AFTER_MS", 0)
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_BREAKER_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_BREAKER_SLOW_CALL_MS", 0)
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_BREAKER_RESET_SECONDS", 30)
+
+
+def test_closed_open_half_open_closed(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, slow_call_ms=0, reset_seconds=30)
+    assert breaker.state == CLOSED
+
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == CLOSED
+    breaker.record_failure(RuntimeError("boom"))
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+
+    breaker.record_success(5.0)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, slow_call_ms=0, reset_seconds=30)
+    breaker.record_failure(RuntimeError("boom"))
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record_failure(RuntimeError("still down"))
+    assert breaker.state == OPEN
+
+
+def test_slow_call_counts_as_failure(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, slow_call_ms=100, reset_seconds=30)
+    breaker.record_success(150.0)
+    assert breaker.state == OPEN
+
+
+def test_released_probe_can_be_retaken(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, slow_call_ms=0, reset_seconds=30)
+    breaker.record_failure(RuntimeError("boom"))
+    clock.now += 30
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_cache_hit_during_half_open_does_not_strand_the_probe(clock):
+    primary = FakeBackend("primary", fail=True)
+    fallback = FakeBackend("fallback")
+    tts = FallbackTTS(primary, fallback)
+    breaker = circuit_breaker.get_breaker("primary")
+
+    tts.generate("a")
+    tts.generate("b")
+    assert breaker.state == OPEN
+
+    clock.now += 30
+    primary.cached.add("hit")
+    url, cached, _ = tts.generate("hit")
+    assert cached and url.startswith("/static/cache/primary")
+    assert breaker.state == HALF_OPEN
+
+    # The primary recovered: the next uncached call must probe it and close the breaker
+    primary.fail = False
+    url, cached, _ = tts.generate("fresh")
+    assert not cached and url.startswith("/static/audio/primary")
+    assert breaker.state == CLOSED
+
+
+def test_probe_that_races_into_a_cache_hit_releases_it(clock):
+    primary = FakeBackend("primary", fail=True)
+    tts = FallbackTTS(primary, FakeBackend("fallback"))
+    breaker = circuit_breaker.get_breaker("primary")
+    tts.generate("a")
+    tts.generate("b")
+    clock.now += 30
+
+    # Cached between FallbackTTS's own lookup and the primary call
+    original_cached_url = primary.cached_url
+    primary.cached_url = lambda text: None
+    primary.cached.add("late")
+    _, cached, _ = tts.generate("late")
+    assert cached
+    primary.cached_url = original_cached_url
+
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.events import chat
+from app.events.chat import ChatEventHandler
+from app.events.commands import CommandRouter
+
+
+async def _noop(ctx):
+    pass
+
+
+async def _other(ctx):
+    pass
+
+
+def test_router_dispatches_by_name_case_insensitively():
+    router = CommandRouter()
+    router.register("!s", _noop)
+    assert router.resolve("!S  hola   mundo ") == (_noop, "S", "hola   mundo")
+    assert router.resolve("!s") == (_noop, "s", "")
+    assert router.commands == ["s"]
+
+
+@pytest.mark.parametrize("content", ["hola !s", "!", "!  ", "!unknown"])
+def test_router_without_fallback_ignores_non_commands(content):
+    router = CommandRouter()
+    router.register("s", _noop)
+    assert router.resolve(content) is None
+
+
+def test_unknown_commands_go_to_the_fallback():
+    router = CommandRouter(fallback=_other)
+    router.register("s", _noop)
+    assert router.resolve("!Airhorn now") == (_other, "Airhorn", "now")
+    assert router.resolve("no command") is None
+
+
+class StubScheduler:
+    tts = None
+
+
+@pytest.fixture
+def handler(monkeypatch, tmp_path):
+    broadcasts = []
+
+    async def record(stream_id, message, **kwargs):
+        broadcasts.append((stream_id, message))
+
+    monkeypatch.setattr(chat, "broadcast_to_stream", record)
+    monkeypatch.setattr(chat.settings, "SOUNDS_DIR", tmp_path)
+    monkeypatch.setattr(chat.settings, "ENABLE_SOUNDS", True)
+    monkeypatch.setattr(chat.settings, "COOLDOWN_SECONDS", 0)
+    (tmp_path / "airhorn.mp3").write_bytes(b"")
+    return ChatEventHandler(StubScheduler(), tts_enabled=False), broadcasts
+
+
+def _message(content, username="ana"):
+    return {"content": content, "sender": {"username": username}}
+
+
+def test_sound_fallback_plays_existing_sounds_only(handler):
+    handler, broadcasts = handler
+
+    async def scenario():
+        await handler.handle(_message("!airhorn"), "s1")
+        await handler.handle(_message("!missing"), "s1")
+        await handler.handle(_message("airhorn"), "s1")
+
+    asyncio.run(scenario())
+    assert broadcasts == [("s1", {
+        "type": "sound_effect",
+        "sound_name": "airhorn",
+        "audio_url": "/static/sounds/airhorn.mp3",
+        "username": "ana",
+    })]
+
+
+def test_registered_commands_win_over_the_sound_fallback(handler, monkeypatch):
+    handler, broadcasts = handler
+    seen = []
+
+    async def record_tts(ctx):
+        seen.append(ctx.args)
+
+    handler.router.register("airhorn", record_tts)
+    asyncio.run(handler.handle(_message("!airhorn fuerte"), "s1"))
+    assert seen == ["fuerte"]
+    assert broadcasts == []
@@ -0,0 +1,51 @@
+import asyncio
+
+import aiosqlite
+
+from app import database
+
+
+async def _connect(path):
+    conn = await aiosqlite.connect(path)
+    for pragma in database._PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+
+def test_workers_migrating_together_all_start(tmp_path):
+    path = tmp_path / "streams.db"
+
+    async def scenario():
+        conns = [await _connect(path) for _ in range(5)]
+        try:
+            await asyncio.gather(*(database._run_migrations(conn) for conn in conns))
+            async with conns[0].execute("SELECT version FROM schema_migrations ORDER BY version") as cursor:
+                versions = [row[0] for row in await cursor.fetchall()]
+            columns = await database._column_names(conns[0], "streams")
+        finally:
+            for conn in conns:
+                await conn.close()
+        return versions, columns
+
+    versions, columns = asyncio.run(scenario())
+    assert versions == [version for version, _, _ in database.MIGRATIONS]
+    assert {"tts_backend", "elevenlabs_voice_id", "tts_enabled", "piper_voice"} <= columns
+
+
+def test_rerun_on_migrated_db_is_a_noop(tmp_path):
+    path = tmp_path / "streams.db"
+
+    async def scenario():
+        conn = await _connect(path)
+        try:
+            await database._run_migrations(conn)
+            # A worker that read an empty schema_migrations before another one committed
+            await conn.execute("DELETE FROM schema_migrations WHERE version = 3")
+            await conn.commit()
+            await database._run_migrations(conn)
+            async with conn.execute("SELECT COUNT(*) FROM schema_migrations") as cursor:
+                return (await cursor.fetchone())[0]
+        finally:
+            await conn.close()
+
+    assert asyncio.run(scenario()) == len(database.MIGRATIONS)
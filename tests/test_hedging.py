@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.services import circuit_breaker, tts
+from app.services.tts import FallbackTTS
+
+
+class HangingBackend:
+    BACKEND_NAME = "hanging"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def cached_url(self, text):
+        return None
+
+    def generate(self, text, username=None, use_cache=True):
+        self.release.wait(5)
+        return f"/static/audio/late-{text}", False, 5000.0
+
+
+class LocalBackend:
+    BACKEND_NAME = "local"
+
+    def cached_url(self, text):
+        return None
+
+    def generate(self, text, username=None, use_cache=True):
+        return f"/static/audio/local-{text}", False, 1.0
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(tts.settings, "TTS_HEDGE_AFTER_MS", 50)
+    monkeypatch.setattr(tts.settings, "TTS_HEDGE_KEEP_LATE_PRIMARY", False)
+    monkeypatch.setattr(tts.settings, "TTS_BREAKER_FAILURE_THRESHOLD", 100)
+    monkeypatch.setattr(tts.settings, "TTS_BREAKER_SLOW_CALL_MS", 0)
+    monkeypatch.setattr(tts, "_hedge_pool", ThreadPoolExecutor(max_workers=2))
+    primary = HangingBackend()
+    yield primary
+    primary.release.set()
+    tts._hedge_pool.shutdown(wait=True)
+
+
+def test_hedge_returns_while_hung_primaries_fill_the_pool(hedging):
+    backend = FallbackTTS(hedging, LocalBackend())
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        # Two messages hang the primary and occupy every hedge pool thread
+        stuck = [callers.submit(backend.generate, f"stuck{i}") for i in range(2)]
+        for future in stuck:
+            assert future.result(timeout=1)[0].startswith("/static/audio/local-")
+
+        started = time.perf_counter()
+        url, cached, _ = backend.generate("next")
+        elapsed = time.perf_counter() - started
+
+    assert url == "/static/audio/local-next"
+    assert not cached
+    assert elapsed < 0.5
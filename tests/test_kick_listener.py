@@ -0,0 +1,45 @@
+import asyncio
+
+from app.services import kick_listener
+from app.services.kick_listener import KickListener
+from app.services.stream_manager import StreamManager
+
+
+def _failing_build(*args):
+    raise RuntimeError("No TTS backend available")
+
+
+def test_failed_build_is_reported_per_stream(monkeypatch):
+    monkeypatch.setattr(kick_listener, "build_tts", _failing_build)
+
+    async def hang(self):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(KickListener, "_get_chatroom_id", hang)
+
+    async def scenario():
+        manager = StreamManager()
+        await manager.start_stream("s1", "chan", tts_backend="piper")
+        status = await manager.wait_for_tts("s1", timeout=1)
+        stats = manager.diagnostics()["s1"]
+        await manager.stop_stream("s1")
+        return status, stats
+
+    status, stats = asyncio.run(scenario())
+    assert status == {"tts_status": "error", "tts_error": "No TTS backend available"}
+    assert stats["tts_status"] == "error"
+    assert stats["running"]
+
+
+def test_reconfigure_clears_the_error(monkeypatch):
+    monkeypatch.setattr(kick_listener, "build_tts", _failing_build)
+
+    async def scenario():
+        listener = KickListener("chan", "s1")
+        await listener._build_tts()
+        before = listener.tts_status
+        monkeypatch.setattr(kick_listener, "build_tts", lambda *args: object())
+        await listener.reconfigure("piper", None, True)
+        return before, listener.tts_status, listener.tts_error
+
+    assert asyncio.run(scenario()) == ("error", "ready", None)
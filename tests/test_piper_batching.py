@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.services import tts_scheduler
+from app.services.piper_batcher import PiperBatcher, supports_batching
+from app.services.tts_scheduler import TTSScheduler
+
+HOP = 4
+
+
+class FakeSession:
+    """Each phoneme id lasts `id` frames; padded rows are filled with loud noise."""
+
+    def __init__(self, with_durations=True):
+        self.with_durations = with_durations
+        self.batch_sizes: list[int] = []
+
+    def get_outputs(self):
+        return ["output", "durations"] if self.with_durations else ["output"]
+
+    def run(self, _, args):
+        ids, lengths = args["input"], args["input_lengths"]
+        self.batch_sizes.append(len(ids))
+        durations = np.where(np.arange(ids.shape[1]) < lengths[:, None], ids, 0).astype(np.float32)
+        frames = int(ids.sum(axis=1).max())
+        audio = np.ones((len(ids), 1, frames * HOP), dtype=np.float32)
+        for row, n in enumerate(durations.sum(axis=1).astype(int)):
+            audio[row, 0, n * HOP:] = 0.9  # what trimming by loudness could not tell apart
+            audio[row, 0, 0] = 1.0
+        return [audio, durations]
+
+
+class FakeVoice:
+    def __init__(self, session):
+        self.session = session
+        self.config = SimpleNamespace(
+            sample_rate=16000, hop_length=HOP, phoneme_id_map={"_": [0]},
+            noise_scale=0.667, length_scale=1.0, noise_w=0.8, num_speakers=1,
+        )
+
+    def phonemize(self, text):
+        return [list(text)]
+
+    def phonemes_to_ids(self, phonemes):
+        return [int(p) for p in phonemes]
+
+
+def test_rows_cut_to_model_durations():
+    session = FakeSession()
+    batcher = PiperBatcher(FakeVoice(session), max_size=4, wait_ms=50)
+    results = {}
+
+    def synthesize(text):
+        results[text] = batcher.synthesize(text)
+
+    threads = [threading.Thread(target=synthesize, args=(t,)) for t in ("12", "3333", "1")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    batcher.close()
+
+    assert session.batch_sizes == [3]
+    assert {text: len(pcm) for text, pcm in results.items()} == {"12": 3 * HOP, "3333": 12 * HOP, "1": HOP}
+
+
+def test_models_without_durations_are_not_batched():
+    assert supports_batching(FakeVoice(FakeSession()))
+    assert not supports_batching(FakeVoice(FakeSession(with_durations=False)))
+
+
+class SlowBackend:
+    """Finishes earlier jobs last, and records how many calls overlap."""
+
+    BACKEND_NAME = "piper"
+    concurrency = 3
+
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def generate(self, text, username=None, use_cache=True):
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05 * (4 - int(text)))
+        with self._lock:
+            self.running -= 1
+        return f"/static/audio/{text}.wav", False, 1.0
+
+
+def test_worker_synthesizes_a_burst_concurrently_in_order(monkeypatch):
+    broadcasts = []
+
+    async def record(stream_id, message, **kwargs):
+        broadcasts.append(message["text"])
+
+    monkeypatch.setattr(tts_scheduler, "broadcast_to_stream", record)
+    monkeypatch.setattr(tts_scheduler, "inline_audio_limit", lambda stream_id: 0)
+    backend = SlowBackend()
+
+    async def scenario():
+        scheduler = TTSScheduler("s", backend)
+        scheduler.submit("3", "low", "ana", priority=5)
+        scheduler.submit("1", "first", "bob", priority=1)
+        scheduler.submit("2", "second", "eva", priority=1)
+        await asyncio.sleep(0.4)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert backend.max_running == 3
+    assert broadcasts == ["first", "second", "low"]
@@ -0,0 +1,29 @@
+import pytest
+
+from app.services import piper_voices
+from app.services.piper_voices import resolve_voice, voice_exists
+
+
+@pytest.fixture
+def voices_dir(monkeypatch, tmp_path):
+    directory = tmp_path / "voices"
+    directory.mkdir()
+    (directory / "es_MX-ald-medium.onnx").write_bytes(b"")
+    (tmp_path / "secret.onnx").write_bytes(b"")
+    monkeypatch.setattr(piper_voices.settings, "PIPER_VOICES_DIR", directory)
+    return directory
+
+
+def test_names_resolve_inside_voices_dir(voices_dir):
+    assert resolve_voice("es_MX-ald-medium") == voices_dir / "es_MX-ald-medium.onnx"
+    assert resolve_voice("es_MX-ald-medium.onnx") == voices_dir / "es_MX-ald-medium.onnx"
+    assert voice_exists("es_MX-ald-medium")
+    assert not voice_exists("missing")
+
+
+@pytest.mark.parametrize("voice", ["../secret", "../secret.onnx", "/etc/passwd", "sub/../../secret"])
+def test_paths_outside_voices_dir_are_rejected(voices_dir, voice):
+    assert resolve_voice(voice) is None
+    assert not voice_exists(voice)
+    with pytest.raises(FileNotFoundError):
+        piper_voices.piper_voices.get(voice)
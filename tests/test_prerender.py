@@ -0,0 +1,129 @@
+import asyncio
+import wave
+
+import numpy as np
+import pytest
+
+from app.services import audio_processing, tts_scheduler
+from app.services.tts_scheduler import TTSScheduler
+
+
+class WavBackend:
+    """Caches by exact text and writes one 10 ms tone per character."""
+
+    BACKEND_NAME = "piper"
+    OUTPUT_EXT = "wav"
+
+    def __init__(self, cache_dir, output_dir):
+        self.cache_dir = cache_dir
+        self.output_dir = output_dir
+        self.synthesized: list[str] = []
+
+    def _path(self, text):
+        return self.cache_dir / f"{abs(hash(text))}.wav"
+
+    def cached_url(self, text):
+        path = self._path(text)
+        return f"/static/cache/{path.name}" if path.exists() else None
+
+    def generate(self, text, username=None, use_cache=True):
+        url = self.cached_url(text) if use_cache else None
+        if url:
+            return url, True, 0.0
+        self.synthesized.append(text)
+        pcm = np.full(160 * len(text), 1000, dtype=np.int16)
+        self._path(text).write_bytes(audio_processing.to_wav(pcm, 16000))
+        return self.cached_url(text), False, 1.0
+
+
+@pytest.fixture
+def backend(monkeypatch, tmp_path):
+    cache_dir, output_dir = tmp_path / "cache", tmp_path / "audio"
+    cache_dir.mkdir()
+    output_dir.mkdir()
+    monkeypatch.setattr(tts_scheduler.settings, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(tts_scheduler.settings, "AUDIO_OUTPUT_DIR", output_dir)
+    monkeypatch.setattr(tts_scheduler.settings, "TTS_PRERENDER_TOP_K", 5)
+    monkeypatch.setattr(tts_scheduler.settings, "TTS_PRERENDER_MIN_COUNT", 2)
+    monkeypatch.setattr(tts_scheduler.settings, "TTS_PRERENDER_IDLE_SECONDS", 0.05)
+    monkeypatch.setattr(tts_scheduler, "broadcast_to_stream", _no_broadcast)
+    monkeypatch.setattr(tts_scheduler, "_last_synthesis_at", 0.0)
+    return WavBackend(cache_dir, output_dir)
+
+
+async def _no_broadcast(*args, **kwargs):
+    pass
+
+
+def test_prerendered_phrase_serves_every_sender(backend):
+    async def scenario():
+        scheduler = TTSScheduler("s", backend)
+        for _ in range(3):
+            scheduler.phrases.add("buenas", "buenas")
+        scheduler.submit("ana dice: primero", "primero", "ana", phrase="primero")
+        await asyncio.sleep(0.5)
+        assert "buenas" in backend.synthesized  # pre-rendered on its own
+
+        scheduler.submit("bob dice: buenas", "buenas", "bob", phrase="buenas")
+        await asyncio.sleep(0.2)
+        synthesized = len(backend.synthesized)
+        scheduler.submit("bob dice: buenas", "buenas", "bob", phrase="buenas")
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+        return scheduler, synthesized
+
+    scheduler, synthesized = asyncio.run(scenario())
+    assert "bob dice: buenas" not in backend.synthesized
+    assert "bob dice:" in backend.synthesized
+    assert len(backend.synthesized) == synthesized  # the repeat reused the joined clip
+    assert scheduler.prerender_hits == 2
+    assert scheduler.cache_hits == 1
+
+    # Joined clips live in the LRU-managed cache, one per prefix/phrase pair
+    assert list(backend.output_dir.iterdir()) == []
+    joined = sorted(backend.cache_dir.glob("joined_*.wav"))
+    assert len(joined) == 1
+    with wave.open(str(joined[0])) as wav_file:
+        gap = int(16000 * tts_scheduler.SEGMENT_GAP_MS / 1000)
+        assert wav_file.getnframes() == 160 * (len("bob dice:") + len("buenas")) + gap
+
+
+def test_no_prerender_until_idle(backend, monkeypatch):
+    async def scenario():
+        scheduler = TTSScheduler("s", backend)
+        for _ in range(3):
+            scheduler.phrases.add("buenas", "buenas")
+        tts_scheduler._last_synthesis_at = tts_scheduler.time.monotonic() + 60  # a job just ran
+        scheduler._ensure_worker()
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+    assert backend.synthesized == []
+
+
+def test_busy_stream_holds_back_prerender_on_others(backend):
+    async def scenario():
+        quiet = TTSScheduler("quiet", backend)
+        busy = TTSScheduler("busy", backend)
+        for _ in range(3):
+            quiet.phrases.add("buenas", "buenas")
+        quiet._ensure_worker()
+        # Another stream keeps synthesizing more often than the idle threshold
+        for i in range(6):
+            busy.submit(f"ana dice: mensaje {i}", f"mensaje {i}", "ana")
+            await asyncio.sleep(0.03)
+        held_back = "buenas" not in backend.synthesized
+        await asyncio.sleep(0.3)
+        await quiet.stop()
+        await busy.stop()
+        return held_back
+
+    assert asyncio.run(scenario())
+    assert "buenas" in backend.synthesized  # once every stream went idle
+
+
+def test_concat_wav_rejects_mismatched_rates():
+    a = audio_processing.to_wav(np.zeros(10, dtype=np.int16), 16000)
+    b = audio_processing.to_wav(np.zeros(10, dtype=np.int16), 22050)
+    assert audio_processing.concat_wav([a, b]) is None
@@ -0,0 +1,131 @@
+import time
+
+import pytest
+
+from app.services import circuit_breaker, rate_limiter
+from app.services.circuit_breaker import CLOSED, get_breaker
+from app.services.elevenlabs_tts import ElevenLabsTTS
+from app.services.rate_limiter import APIRateLimiter, RateLimitExceeded
+from app.services.tts import FallbackTTS
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values: dict[str, int] = {}
+
+    def pttl(self, key):
+        return -2
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def decr(self, key):
+        self.values[key] = self.values.get(key, 0) - 1
+        return self.values[key]
+
+    def expire(self, key, seconds):
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.ops = []
+
+    def __getattr__(self, name):
+        def queue(*args):
+            self.ops.append((name, args))
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args) for name, args in self.ops]
+
+
+class Piper:
+    BACKEND_NAME = "piper"
+
+    def cached_url(self, text):
+        return None
+
+    def generate(self, text, username=None, use_cache=True):
+        return "/static/audio/piper.wav", False, 1.0
+
+
+def make_elevenlabs(monkeypatch, limiter, convert):
+    monkeypatch.setattr(rate_limiter.settings, "ELEVEN_LABS_API_KEY", "test-key")
+    tts = ElevenLabsTTS()
+    tts._limiter = limiter
+    tts._client.text_to_speech.convert = convert
+    tts.cached_url = lambda text: None
+    return tts
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch, tmp_path):
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_HEDGE_AFTER_MS", 0)
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_BREAKER_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(circuit_breaker.settings, "TTS_BREAKER_SLOW_CALL_MS", 100)
+    monkeypatch.setattr(circuit_breaker.settings, "AUDIO_OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(rate_limiter, "_redis", lambda: None)
+
+
+def test_local_rejection_does_not_open_the_breaker(monkeypatch):
+    limiter = APIRateLimiter("elevenlabs", "k", rate=0.001, burst=1, max_concurrency=1)
+    limiter._tokens = 0
+    monkeypatch.setattr(rate_limiter.settings, "ELEVEN_LABS_QUEUE_TIMEOUT_SECONDS", 0.01)
+    elevenlabs = make_elevenlabs(monkeypatch, limiter, lambda **kwargs: b"mp3")
+    tts = FallbackTTS(elevenlabs, Piper())
+
+    url, _, _ = tts.generate("hola", use_cache=False)
+    assert url == "/static/audio/piper.wav"
+    assert get_breaker("elevenlabs").state == CLOSED
+
+
+def test_limiter_queueing_is_not_a_slow_call(monkeypatch):
+    limiter = APIRateLimiter("elevenlabs", "k", rate=5, burst=1, max_concurrency=1)
+    limiter._tokens = 0  # next token in 200ms, over the 100ms slow-call threshold
+    monkeypatch.setattr(rate_limiter.settings, "ELEVEN_LABS_QUEUE_TIMEOUT_SECONDS", 5)
+    elevenlabs = make_elevenlabs(monkeypatch, limiter, lambda **kwargs: b"mp3")
+    tts = FallbackTTS(elevenlabs, Piper())
+
+    started = time.perf_counter()
+    url, _, _ = tts.generate("hola", use_cache=False)
+    assert time.perf_counter() - started >= 0.15
+    assert url.startswith("/static/audio/tts_")
+    assert get_breaker("elevenlabs").state == CLOSED
+    assert elevenlabs.api_ms() < 100
+
+
+def test_cluster_window_counts_only_admitted_requests():
+    client = FakeRedis()
+    limiter = APIRateLimiter("elevenlabs", "k", rate=100, burst=1, max_concurrency=1)
+
+    assert limiter._cluster_delay(client) == 0
+    for _ in range(5):
+        assert limiter._cluster_delay(client) == 0.05  # waiting on the concurrency slot
+
+    window = [v for k, v in client.values.items() if ":window:" in k]
+    assert window == [1]
+    assert client.values[limiter._redis_key("in_flight")] == 1
+
+
+def test_cluster_rate_rejection_gives_back_its_slot(monkeypatch):
+    class FrozenTime:
+        @staticmethod
+        def time():
+            return 1000.5
+
+    client = FakeRedis()
+    limiter = APIRateLimiter("elevenlabs", "k", rate=1, burst=1, max_concurrency=5)
+    monkeypatch.setattr(rate_limiter, "time", FrozenTime)
+
+    assert limiter._cluster_delay(client) == 0
+    assert limiter._cluster_delay(client) == pytest.approx(0.5)
+    assert limiter._cluster_delay(client) == pytest.approx(0.5)
+    assert client.values[limiter._redis_key("window:1000")] == 1
+    assert client.values[limiter._redis_key("in_flight")] == 1
@@ -0,0 +1,132 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+import redis.asyncio
+
+from app import database
+from app.services import stream_registry as registry_module
+from app.services.stream_registry import CHANGES_CHANNEL, StreamRegistry
+
+
+class FakeRedis:
+    def __init__(self):
+        self.published: list[tuple[str, dict]] = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+
+
+@pytest.fixture
+def redis_cache(monkeypatch):
+    client = FakeRedis()
+    cache = SimpleNamespace(enabled=True, redis_client=client)
+    monkeypatch.setattr(registry_module, "get_cache_service", lambda: cache)
+    return client
+
+
+def _with_db(tmp_path, monkeypatch, scenario):
+    monkeypatch.setattr(database.settings, "DATABASE_PATH", tmp_path / "streams.db")
+
+    async def run():
+        await database.init_db()
+        try:
+            return await scenario()
+        finally:
+            await database.close_db()
+
+    return asyncio.run(run())
+
+
+def test_writes_go_through_to_db_and_memory(tmp_path, monkeypatch, redis_cache):
+    registry = StreamRegistry()
+
+    async def scenario():
+        added = await registry.add("s1", "chan", tts_backend="piper")
+        updated = await registry.update("s1", channel="other", tts_enabled=False)
+        stored = await database.get_stream("s1")
+        missing = await registry.update("nope", channel="x")
+        deleted = await registry.delete("s1")
+        return added, updated, stored, missing, deleted, await database.get_stream("s1")
+
+    added, updated, stored, missing, deleted, gone = _with_db(tmp_path, monkeypatch, scenario)
+    assert added["channel"] == "chan" and added["tts_backend"] == "piper"
+    assert updated["channel"] == "other" and updated["tts_enabled"] == 0
+    assert stored == updated
+    assert missing is None
+    assert deleted and gone is None and "s1" not in registry
+    # One change notification per successful write, tagged with this worker's origin
+    assert [change["stream_id"] for _, change in redis_cache.published] == ["s1", "s1", "s1"]
+    assert {channel for channel, _ in redis_cache.published} == {CHANGES_CHANNEL}
+    assert {change["origin"] for _, change in redis_cache.published} == {registry._origin}
+
+
+def test_reads_are_copies(tmp_path, monkeypatch, redis_cache):
+    registry = StreamRegistry()
+
+    async def scenario():
+        await registry.add("s1", "chan")
+        registry.get("s1")["channel"] = "mutated"
+        registry.all()[0]["running"] = True
+        return registry.get("s1")
+
+    stream = _with_db(tmp_path, monkeypatch, scenario)
+    assert stream["channel"] == "chan" and "running" not in stream
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = messages
+        self.subscribed = []
+
+    async def subscribe(self, channel):
+        self.subscribed.append(channel)
+
+    async def listen(self):
+        for message in self.messages:
+            yield message
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        pass
+
+
+def test_follows_other_workers_changes(tmp_path, monkeypatch, redis_cache):
+    other, registry = StreamRegistry(), StreamRegistry()
+    messages = []
+    pubsub = FakePubSub(messages)
+
+    class FakeAsyncRedis:
+        def __init__(self, **kwargs):
+            pass
+
+        def pubsub(self):
+            return pubsub
+
+        async def aclose(self):
+            pass
+
+    monkeypatch.setattr(redis.asyncio, "Redis", FakeAsyncRedis)
+
+    async def scenario():
+        await registry.load()
+        await other.add("s1", "chan")
+        await registry.add("s2", "mine")
+        await database.update_stream("s2", channel="changed-behind-our-back")
+        messages.extend([
+            {"type": "subscribe", "data": 1},
+            {"type": "message", "data": json.dumps({"stream_id": "s1", "origin": other._origin})},
+            # Our own notification is skipped: s2 keeps what this worker wrote
+            {"type": "message", "data": json.dumps({"stream_id": "s2", "origin": registry._origin})},
+            {"type": "message", "data": b"not json"},
+        ])
+        registry.start_sync()
+        await asyncio.sleep(0.05)
+        await registry.stop_sync()
+        return registry.get("s1"), registry.get("s2")
+
+    s1, s2 = _with_db(tmp_path, monkeypatch, scenario)
+    assert pubsub.subscribed == [CHANGES_CHANNEL]
+    assert s1["channel"] == "chan"
+    assert s2["channel"] == "mine"
@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.routes import streams
+
+ROW = {
+    "stream_id": "s1", "channel": "chan", "tts_backend": "piper",
+    "elevenlabs_voice_id": None, "piper_voice": None, "tts_enabled": 1,
+}
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.row = dict(ROW)
+        self.fail = False
+        self.writes: list[str] = []
+
+    def get(self, stream_id):
+        return dict(self.row) if stream_id == self.row["stream_id"] else None
+
+    async def update(self, stream_id, **fields):
+        if self.fail:
+            raise RuntimeError("database is locked")
+        # The first write is the slow one, so an unserialized second request would overtake it
+        await asyncio.sleep(0.05 if not self.writes else 0)
+        self.row.update({k: v for k, v in fields.items() if v is not None})
+        self.writes.append(self.row["tts_backend"])
+        return dict(self.row)
+
+
+class FakeManager:
+    def __init__(self):
+        self.applied: list[str] = []
+        self.restarts = 0
+
+    async def reconfigure_stream(self, stream_id, tts_backend, **kwargs):
+        self.applied.append(tts_backend)
+        return True
+
+    async def stop_stream(self, stream_id):
+        pass
+
+    async def start_stream(self, stream_id, channel, **kwargs):
+        self.restarts += 1
+
+    def tts_status(self, stream_id):
+        return {"tts_status": "ready", "tts_error": None}
+
+    async def wait_for_tts(self, stream_id, timeout):
+        return self.tts_status(stream_id)
+
+
+@pytest.fixture
+def fakes(monkeypatch):
+    registry, manager = FakeRegistry(), FakeManager()
+    monkeypatch.setattr(streams, "stream_registry", registry)
+    monkeypatch.setattr(streams, "stream_manager", manager)
+    monkeypatch.setattr(streams, "_update_locks", {})
+    app = FastAPI()
+    app.include_router(streams.router, prefix="/api")
+    return app, registry, manager
+
+
+def _client(app):
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+def test_failed_write_leaves_listener_untouched(fakes):
+    app, registry, manager = fakes
+    registry.fail = True
+
+    async def scenario():
+        async with _client(app) as client:
+            return await client.put("/api/streams/s1", json={"tts_backend": "elevenlabs"})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 500
+    assert manager.applied == [] and manager.restarts == 0
+
+
+def test_concurrent_updates_reach_listener_in_write_order(fakes):
+    app, registry, manager = fakes
+
+    async def scenario():
+        async with _client(app) as client:
+            first = asyncio.create_task(client.put("/api/streams/s1", json={"tts_backend": "elevenlabs"}))
+            await asyncio.sleep(0.01)
+            second = asyncio.create_task(client.put("/api/streams/s1", json={"tts_backend": "synthetic"}))
+            return await first, await second
+
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200, 200]
+    assert registry.writes == ["elevenlabs", "synthetic"]
+    assert manager.applied == registry.writes
+    assert responses[1].json()["tts_backend"] == "synthetic"
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services import text_normalize
+from app.services.text_normalize import canonicalize, spanish_number
+
+
+@pytest.fixture(autouse=True)
+def all_steps(monkeypatch):
+    monkeypatch.setattr(text_normalize.settings, "TTS_NORMALIZE", ",".join(text_normalize.STEPS))
+    monkeypatch.setattr(text_normalize.settings, "TTS_URL_TEXT", "link")
+    monkeypatch.setattr(text_normalize.settings, "TTS_NORMALIZE_MAX_DIGITS", 9)
+    monkeypatch.setattr(text_normalize.settings, "TTS_NUMBERS_LANG", "es")
+
+
+@pytest.mark.parametrize("text", [
+    "esto.es genial", "tu.me gusta", "lo hizo.co", "vamos.ar", "que.mx", "ya.be",
+    "jaja.gg", "bien.tv",
+])
+def test_spanish_chat_is_not_a_link(text):
+    assert canonicalize(text) == text
+
+
+@pytest.mark.parametrize("text", [
+    "mira https://kick.com/x", "mira www.marca.es", "mira marca.es/futbol", "mira kick.com",
+])
+def test_links_are_replaced(text):
+    assert canonicalize(text) == "mira link"
+
+
+@pytest.mark.parametrize("a, b", [
+    ("son 1000 pesos", "son 1.000 pesos"),
+    ("son 1000 pesos", "son mil pesos"),
+    ("tengo 2 gatos", "tengo dos gatos"),
+])
+def test_number_spellings_share_a_key(a, b):
+    assert canonicalize(a) == canonicalize(b)
+
+
+def test_numbers_inside_words_and_decimals_are_kept():
+    assert canonicalize("mp3 x2 3,5") == "mp3 x2 3,5"
+
+
+@pytest.mark.parametrize("n, words", [
+    (16, "dieciséis"), (21, "veintiuno"), (31, "treinta y uno"), (100, "cien"), (101, "ciento uno"),
+    (21000, "veintiún mil"), (1000000, "un millón"), (2500000, "dos millones quinientos mil"),
+])
+def test_spanish_number(n, words):
+    assert spanish_number(n) == words
+
+
+def test_settings_changes_apply_without_reimport(monkeypatch):
+    assert canonicalize("JAJAJAJAJA  ", case_sensitive=False) == "jajaja"
+    monkeypatch.setattr(text_normalize.settings, "TTS_NORMALIZE", "whitespace")
+    assert canonicalize("JAJAJAJAJA  ", case_sensitive=False) == "JAJAJAJAJA"
+    assert text_normalize.normalization_snapshot()["steps"] == ["whitespace"]
+    monkeypatch.setattr(text_normalize.settings, "TTS_NORMALIZE", "repeats")
+    monkeypatch.setattr(text_normalize.settings, "TTS_NORMALIZE_MAX_REPEATS", 2)
+    assert canonicalize("jajajaja") == "jaja"
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app.services import tts_scheduler
+from app.services.tts_scheduler import TTSScheduler
+
+
+@pytest.fixture(autouse=True)
+def backlog_cap(monkeypatch):
+    # 10 chars per second: a 20-char message is 2s of audio, the cap holds 3 of them
+    monkeypatch.setattr(tts_scheduler.settings, "TTS_CHARS_PER_SECOND", 10)
+    monkeypatch.setattr(tts_scheduler.settings, "TTS_QUEUE_MAX_SECONDS", 6.5)
+
+
+def _queued(scheduler):
+    return sorted((job.priority, job.username) for job in scheduler._heap)
+
+
+def _run(scenario):
+    async def wrapper():
+        scheduler = TTSScheduler("s", None)
+        # No worker: these tests look at admission only
+        scheduler._ensure_worker = lambda: None
+        return scenario(scheduler)
+    return asyncio.run(wrapper())
+
+
+MESSAGE = "x" * 20
+
+
+def test_full_backlog_sheds_lowest_priority_first():
+    def scenario(scheduler):
+        assert scheduler.submit(MESSAGE, "", "viewer", priority=9)
+        assert scheduler.submit(MESSAGE, "", "sub", priority=3)
+        assert scheduler.submit(MESSAGE, "", "vip", priority=5)
+        assert scheduler.submit(MESSAGE, "", "mod", priority=1)
+        return scheduler
+
+    scheduler = _run(scenario)
+    assert _queued(scheduler) == [(1, "mod"), (3, "sub"), (5, "vip")]
+    assert scheduler.dropped_overflow == 1
+
+
+def test_full_backlog_rejects_when_nothing_ranks_lower():
+    def scenario(scheduler):
+        for name in ("a", "b", "c"):
+            assert scheduler.submit(MESSAGE, "", name, priority=1)
+        return scheduler, scheduler.submit(MESSAGE, "", "late", priority=1)
+
+    scheduler, accepted = _run(scenario)
+    assert not accepted
+    assert _queued(scheduler) == [(1, "a"), (1, "b"), (1, "c")]
+    assert scheduler.dropped_overflow == 1
+
+
+def test_empty_queue_admits_an_oversized_message_despite_float_leftovers():
+    def scenario(scheduler):
+        # What popping jobs can leave behind in the running sum
+        scheduler._queued_seconds = 1e-12
+        return scheduler.submit("x" * 100, "", "long")
+
+    assert _run(scenario)
+
+
+def test_empty_queue_rejects_oversized_message_while_audio_still_plays():
+    def scenario(scheduler):
+        scheduler._playback_until = tts_scheduler.time.monotonic() + 5
+        return scheduler.submit("x" * 100, "", "long")
+
+    assert not _run(scenario)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import websocket
+from app.routes.websocket import _handle_widget_message, broadcast_to_stream
+
+
+class FakeWidget:
+    def __init__(self):
+        self.sent: list = []
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def send_bytes(self, data):
+        self.sent.append(bytes(data))
+
+
+@pytest.fixture(autouse=True)
+def fresh_connections(monkeypatch):
+    monkeypatch.setattr(websocket, "_connections", {})
+    monkeypatch.setattr(websocket, "_inline_limits", {})
+    monkeypatch.setattr(websocket.settings, "WS_INLINE_AUDIO_MAX_KB", 1)
+
+
+def _parse_frame(frame: bytes) -> tuple[str, bytes]:
+    id_length = frame[0]
+    return frame[1:1 + id_length].decode("ascii"), frame[1 + id_length:]
+
+
+@pytest.mark.parametrize("requested, agreed", [
+    (None, 1024), (100, 100), (10 ** 6, 1024), (0, 0), (-5, 1024), (True, 1024), ("big", 1024),
+])
+def test_hello_agrees_on_the_smaller_limit(requested, agreed):
+    widget = FakeWidget()
+    raw = json.dumps({"type": "hello", "inline_audio_max_bytes": requested})
+    asyncio.run(_handle_widget_message(widget, "s1", raw))
+    assert widget.sent == [{"type": "hello", "inline_audio_max_bytes": agreed}]
+    assert websocket._inline_limits.get(widget, 0) == agreed
+
+
+def test_inline_frame_layout_and_fallback_to_urls():
+    inline, small, legacy = FakeWidget(), FakeWidget(), FakeWidget()
+    websocket._connections["s1"] = [inline, small, legacy]
+    websocket._inline_limits[inline] = 1024
+    websocket._inline_limits[small] = 10
+    audio = b"RIFF" + bytes(range(256)) * 2
+    message = {"type": "tts_message", "audio_url": "/static/cache/a.wav"}
+
+    asyncio.run(broadcast_to_stream("s1", message, audio=audio, audio_type="audio/wav"))
+
+    frame, announced = inline.sent
+    audio_id, payload = _parse_frame(frame)
+    assert payload == audio
+    assert announced == {**message, "audio_id": audio_id, "audio_type": "audio/wav"}
+    # Over their limit, or never negotiated: the plain message with the URL
+    assert small.sent == [message]
+    assert legacy.sent == [message]
+    assert websocket.inline_audio_limit("s1") == 1024
+
+
+def test_audio_ids_are_unique_per_frame():
+    widget = FakeWidget()
+    websocket._connections["s1"] = [widget]
+    websocket._inline_limits[widget] = 1024
+
+    async def scenario():
+        for _ in range(2):
+            await broadcast_to_stream("s1", {"type": "tts_message"}, audio=b"x", audio_type="audio/wav")
+
+    asyncio.run(scenario())
+    ids = [_parse_frame(item)[0] for item in widget.sent if isinstance(item, bytes)]
+    assert len(set(ids)) == 2
+
+
+def test_hello_over_the_real_socket():
+    app = FastAPI()
+    app.include_router(websocket.router)
+    with TestClient(app).websocket_connect("/s1/events") as ws:
+        ws.send_json({"type": "hello", "inline_audio_max_bytes": 512})
+        assert ws.receive_json() == {"type": "hello", "inline_audio_max_bytes": 512}
+        assert websocket.inline_audio_limit("s1") == 512
+    assert websocket.inline_audio_limit("s1") == 0